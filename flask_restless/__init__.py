@@ -19,5 +19,9 @@
 __version__ = '0.10.0-dev'
 
 # make the following names available as part of the public API
+from .counting import StatementCounter
 from .manager import APIManager
+from .profiling import RequestProfiler
+from .routing import ReplicaRouter
+from .sharding import ShardResolver
 from .views import ProcessingException
@@ -0,0 +1,203 @@
+"""
+    flask.ext.restless.counting
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Provides :class:`StatementCounter`, which counts and times the SQL
+    statements executed while handling each request, and warns about requests
+    which execute too many of them or which execute the same statement over and
+    over (as when related instances are loaded one at a time, the "N+1 queries"
+    problem).
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+import threading
+from timeit import default_timer
+
+from flask import current_app
+from flask import has_request_context
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#: The key in the WSGI environment of a request under which the
+#: :class:`RequestStatements` of that request are stored.
+STATEMENTS_ENVIRON_KEY = 'flask_restless.statements'
+
+#: The header of a response which contains the number of SQL statements
+#: executed while handling the request.
+STATEMENTS_HEADER = 'X-SQL-Statements'
+
+#: The header of a response which contains the total time in milliseconds
+#: spent executing SQL statements while handling the request.
+TIME_HEADER = 'X-SQL-Time'
+
+#: The engines on which the listeners of :func:`_listen` have been registered;
+#: ``None`` stands for all engines.
+_listened = set()
+
+#: Protects :data:`_listened`.
+_listened_lock = threading.Lock()
+
+
+def _current(engine):
+    """Returns the :class:`RequestStatements` of the current request, or
+    ``None`` if the statements of the current request are not being counted
+    by a :class:`StatementCounter` created for `engine`.
+
+    """
+    if not has_request_context():
+        return None
+    statements = request.environ.get(STATEMENTS_ENVIRON_KEY)
+    if statements is None or statements.counter.engine is not engine:
+        return None
+    return statements
+
+
+def _listen(engine):
+    """Registers the listeners which count the statements executed on `engine`
+    (or on all engines, if `engine` is ``None``) for the
+    :class:`StatementCounter` objects created for it, unless they have already
+    been registered.
+
+    SQLAlchemy 0.7 cannot remove listeners, so the listeners are shared by all
+    of the counters for an engine instead of being registered for each one;
+    they count the statements of a request for the counter stored in the
+    environment of that request.
+
+    """
+    _listened_lock.acquire()
+    try:
+        if engine in _listened:
+            return
+        _listened.add(engine)
+    finally:
+        _listened_lock.release()
+
+    def before_execute(conn, cursor, statement, parameters, context,
+                       executemany):
+        if _current(engine) is not None:
+            conn.info.setdefault(STATEMENTS_ENVIRON_KEY, []).append(
+                default_timer())
+
+    def after_execute(conn, cursor, statement, parameters, context,
+                      executemany):
+        statements = _current(engine)
+        if statements is None:
+            return
+        starts = conn.info.get(STATEMENTS_ENVIRON_KEY)
+        if starts:
+            statements.add(statement, default_timer() - starts.pop())
+
+    def dbapi_error(conn, cursor, statement, parameters, context, exception):
+        # a statement which fails is counted too, and its start time must not
+        # be left behind on the connection
+        after_execute(conn, cursor, statement, parameters, context, False)
+
+    target = Engine if engine is None else engine
+    event.listen(target, 'before_cursor_execute', before_execute)
+    event.listen(target, 'after_cursor_execute', after_execute)
+    event.listen(target, 'dbapi_error', dbapi_error)
+
+
+class RequestStatements(object):
+    """The SQL statements executed while handling a single request, as counted
+    by `counter`.
+
+    """
+
+    def __init__(self, counter):
+        self.counter = counter
+        #: The number of statements executed.
+        self.count = 0
+        #: The total time spent executing them, in seconds.
+        self.duration = 0
+        #: Maps the text of each statement to the number of times it was
+        #: executed. Since parameters are not part of the text, this counts
+        #: the executions of each *shape* of statement.
+        self.statements = {}
+
+    def add(self, statement, duration):
+        """Records an execution of `statement` which took `duration`
+        seconds.
+
+        """
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] = self.statements.get(statement, 0) + 1
+
+    def most_repeated(self):
+        """Returns a pair whose left element is the statement executed the
+        most times and whose right element is that number of times, or
+        ``(None, 0)`` if no statements were executed.
+
+        """
+        if not self.statements:
+            return None, 0
+        return max(self.statements.iteritems(), key=lambda item: item[1])
+
+
+class StatementCounter(object):
+    """Counts the SQL statements executed on `engine` (or on all engines, if
+    `engine` is ``None``) while handling each request on the APIs to which
+    this object is given.
+
+    If `max_statements` is not ``None`` and a request executes more than that
+    many statements, or if `max_repeats` is not ``None`` and a request
+    executes the same statement (with any parameters) more than that many
+    times, a warning is logged by the logger of the application. If `headers`
+    is ``True``, the response to each request has the headers
+    :data:`STATEMENTS_HEADER` and :data:`TIME_HEADER`.
+
+    Only statements executed on a thread which is handling the request are
+    counted; statements executed on the threads of a pool without a request
+    context (for example, by a `query_executor`) are not.
+
+    Instances of this class may be shared by several APIs. Creating many of
+    them (for example, one for each application created by an application
+    factory) does not slow down the execution of statements, since all of the
+    counters for an engine share the same event listeners.
+
+    """
+
+    def __init__(self, engine=None, max_statements=None, max_repeats=None,
+                 headers=False):
+        self.engine = engine
+        self.max_statements = max_statements
+        self.max_repeats = max_repeats
+        self.headers = headers
+        _listen(engine)
+
+    def begin(self):
+        """Begins counting the statements of the current request."""
+        request.environ[STATEMENTS_ENVIRON_KEY] = RequestStatements(self)
+
+    def end(self, response):
+        """Stops counting the statements of the current request, logs any
+        warnings, adds the headers to `response` if requested, and returns the
+        :class:`RequestStatements` of the request.
+
+        `response` is ``None`` if handling the request raised an exception, in
+        which case the warnings are logged all the same.
+
+        """
+        statements = request.environ.pop(STATEMENTS_ENVIRON_KEY, None)
+        if statements is None or statements.counter is not self:
+            return None
+        logger = current_app.logger
+        if self.max_statements is not None and \
+                statements.count > self.max_statements:
+            logger.warning('%s %s executed %d SQL statements in %.3f ms',
+                           request.method, request.path, statements.count,
+                           statements.duration * 1000)
+        statement, repeats = statements.most_repeated()
+        if self.max_repeats is not None and repeats > self.max_repeats:
+            logger.warning('%s %s executed the same SQL statement %d times,'
+                           ' which may be an N+1 query problem: %s',
+                           request.method, request.path, repeats, statement)
+        if self.headers and response is not None:
+            response.headers[STATEMENTS_HEADER] = str(statements.count)
+            response.headers[TIME_HEADER] = '%.3f' % \
+                (statements.duration * 1000)
+        return statements
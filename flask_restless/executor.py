@@ -0,0 +1,101 @@
+"""
+    flask.ext.restless.executor
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Provides :class:`ExecutorAPI` and :class:`ExecutorFunctionAPI`, versions of
+    :class:`~flask.ext.restless.views.API` and
+    :class:`~flask.ext.restless.views.FunctionAPI` which handle each request on
+    a thread of a pool instead of on the thread which received it.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+from flask import _request_ctx_stack
+from flask import request
+
+from .views import API
+from .views import BATCH_ENVIRON_KEY
+from .views import FunctionAPI
+
+
+class ExecutorView(object):
+    """Mixin for :class:`~flask.ext.restless.views.ModelView` classes which
+    dispatches each request to a thread of the pool `executor`.
+
+    `executor` is an object with an ``apply(func, args, kwds)`` method which
+    calls ``func(*args, **kwds)`` on one of its threads, blocks until it
+    returns, and returns its result or raises its exception, such as a
+    :class:`multiprocessing.pool.ThreadPool` or, under `gevent
+    <http://www.gevent.org>`_, a :class:`gevent.threadpool.ThreadPool`. If
+    `executor` is ``None``, requests are handled on the current thread.
+
+    The request is handled in a copy of the current request context which
+    shares its request object, its :data:`~flask.g` object, and its session.
+    The SQLAlchemy session of this view must be a
+    :class:`~sqlalchemy.orm.scoping.scoped_session`, so that each thread of
+    the pool has a session of its own; it is removed after each request.
+    :meth:`~flask.Flask.teardown_request` functions run only on the thread
+    which received the request.
+
+    Operations of batch requests are handled on the current thread, since they
+    share the session of the batch.
+
+    """
+
+    def __init__(self, *args, **kw):
+        self.executor = kw.pop('executor', None)
+        super(ExecutorView, self).__init__(*args, **kw)
+
+    def dispatch_request(self, *args, **kw):
+        if self.executor is None or request.environ.get(BATCH_ENVIRON_KEY):
+            return super(ExecutorView, self).dispatch_request(*args, **kw)
+        context = _request_ctx_stack.top
+        return self.executor.apply(self._dispatch_in_context,
+                                   (context, args, kw))
+
+    def _dispatch_in_context(self, context, args, kw):
+        """Dispatches the request with positional arguments `args` and keyword
+        arguments `kw` in a copy of the request context `context` on the
+        current thread, then removes the session of the current thread.
+
+        """
+        app = context.app
+        # push an application context explicitly, so that this thread's
+        # teardown_appcontext functions (which remove the Flask-SQLAlchemy
+        # session, for example) run when it is popped
+        app_context = app.app_context()
+        app_context.push()
+        copy = app.request_context(context.request.environ)
+        copy.request = context.request
+        copy.g = context.g
+        copy.push()
+        copy.session = context.session
+        try:
+            try:
+                return super(ExecutorView, self).dispatch_request(*args, **kw)
+            except:
+                self.session.rollback()
+                raise
+        finally:
+            self.session.remove()
+            # pop the request context without running the teardown_request
+            # functions, which run when the original context is popped
+            _request_ctx_stack.pop()
+            app_context.pop()
+
+
+class ExecutorAPI(ExecutorView, API):
+    """A :class:`~flask.ext.restless.views.API` which handles requests on the
+    threads of a pool; see :class:`ExecutorView`.
+
+    """
+    pass
+
+
+class ExecutorFunctionAPI(ExecutorView, FunctionAPI):
+    """A :class:`~flask.ext.restless.views.FunctionAPI` which handles requests
+    on the threads of a pool; see :class:`ExecutorView`.
+
+    """
+    pass
@@ -8,6 +8,9 @@
     :license: GNU AGPLv3+ or BSD
 
 """
+from collections import deque
+import threading
+
 from sqlalchemy.orm import RelationshipProperty as RelProperty
 from sqlalchemy.ext.associationproxy import AssociationProxy
 
@@ -17,6 +20,84 @@ BLACKLIST = ('query', 'query_class', '_sa_class_manager',
              '_decl_class_registry')
 
 
+class MissingInstanceCache(object):
+    """A bounded set of primary key values for which no instance of a model
+    exists in the database.
+
+    This is used to answer repeated requests for nonexistent instances without
+    querying the database. Once `maxsize` keys have been remembered, adding a
+    new key forgets the oldest one.
+
+    Keys are compared by their unicode representation, so the integer ``1``
+    and the string ``'1'`` (as it appears in a URL) are the same key. A tuple
+    (the value of a composite primary key) is represented by its elements
+    separated by commas, so ``(1, 'foo')`` and ``'1,foo'`` are the same key.
+
+    Instances of this class are safe to share among threads.
+
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._keys = set()
+        self._order = deque()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(key):
+        """Returns the unicode representation of `key` used for comparisons.
+        """
+        if isinstance(key, tuple):
+            return u','.join(unicode(k) for k in key)
+        return unicode(key)
+
+    def __contains__(self, key):
+        return self._normalize(key) in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key):
+        """Remembers that no instance with primary key `key` exists."""
+        key = self._normalize(key)
+        self._lock.acquire()
+        try:
+            if key in self._keys:
+                return
+            if len(self._order) >= self.maxsize:
+                self._keys.discard(self._order.popleft())
+            self._keys.add(key)
+            self._order.append(key)
+        finally:
+            self._lock.release()
+
+    def discard(self, key):
+        """Forgets `key`, for example because an instance with that primary
+        key has just been created.
+
+        """
+        key = self._normalize(key)
+        # the common case, in which the key is not cached, needs no lock
+        if key not in self._keys:
+            return
+        self._lock.acquire()
+        try:
+            if key in self._keys:
+                self._keys.remove(key)
+                self._order.remove(key)
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        """Forgets all keys."""
+        self._lock.acquire()
+        try:
+            self._keys.clear()
+            self._order.clear()
+        finally:
+            self._lock.release()
+
+
 def unicode_keys_to_strings(dictionary):
     """Returns a new dictionary with the same mappings as `dictionary`, but
     with each of the keys coerced to a string (by calling :func:`str(key)`).
@@ -13,11 +13,25 @@
 """
 
 from flask import Blueprint
+from flask import request
+from sqlalchemy.orm import scoped_session
+from sqlalchemy.orm.scoping import ScopedSession
 
+from .executor import ExecutorAPI
+from .executor import ExecutorFunctionAPI
 from .helpers import get_related_model
 from .helpers import get_relations
+from .helpers import MissingInstanceCache
+from .helpers import upper_keys
+from .sharding import ShardedAPI
 from .views import API
+from .views import BATCH_ENVIRON_KEY
+from .views import BatchAPI
 from .views import FunctionAPI
+from .views import ImportAPI
+from .views import JobAPI
+from .writer import BatchWriter
+from .writer import CommitCoordinator
 
 #: The set of methods which are allowed by default when creating an API
 READONLY_METHODS = frozenset(('GET', ))
@@ -58,7 +72,8 @@ class APIManager(object):
     #:    has been registered.
     BLUEPRINTNAME_FORMAT = '%s%s'
 
-    def __init__(self, app=None, session=None, flask_sqlalchemy_db=None):
+    def __init__(self, app=None, session=None, flask_sqlalchemy_db=None,
+                 session_factory=None, replica_router=None):
         """Stores the specified :class:`flask.Flask` application object on
         which API endpoints will be registered.
 
@@ -80,6 +95,16 @@ class APIManager(object):
 
         If `flask_sqlalchemy_db` is not ``None``, `session` will be ignored.
 
+        `session_factory` is a :func:`~sqlalchemy.orm.sessionmaker` (or a
+        :func:`~sqlalchemy.orm.scoped_session`) from which a session is
+        created for each thread. If it is not ``None``, `session` and
+        `flask_sqlalchemy_db` will be ignored, and the session of the current
+        thread is removed at the end of each request; see :meth:`init_app`.
+
+        `replica_router` is a :class:`~flask.ext.restless.routing.ReplicaRouter`
+        which sends the queries of read-only requests to read replicas; see
+        :meth:`init_app`.
+
         For example, to use this class with models defined in pure SQLAlchemy::
 
             from flask import Flask
@@ -104,7 +129,8 @@ class APIManager(object):
             apimanager = APIManager(app, flask_sqlalchemy_db=db)
 
         """
-        self.init_app(app, session, flask_sqlalchemy_db)
+        self.init_app(app, session, flask_sqlalchemy_db, session_factory,
+                      replica_router)
 
     def _next_blueprint_name(self, basename):
         """Returns the next name for a blueprint with the specified base name.
@@ -133,7 +159,8 @@ class APIManager(object):
             next_number = max(existing_numbers) + 1
         return APIManager.BLUEPRINTNAME_FORMAT % (basename, next_number)
 
-    def init_app(self, app, session=None, flask_sqlalchemy_db=None):
+    def init_app(self, app, session=None, flask_sqlalchemy_db=None,
+                 session_factory=None, replica_router=None):
         """Stores the specified :class:`flask.Flask` application object on
         which API endpoints will be registered and the
         :class:`sqlalchemy.orm.session.Session` object in which all database
@@ -148,6 +175,24 @@ class APIManager(object):
 
         If `flask_sqlalchemy_db` is not ``None``, `session` will be ignored.
 
+        `session_factory` is a :func:`~sqlalchemy.orm.sessionmaker` (or a
+        :func:`~sqlalchemy.orm.scoped_session`) from which sessions are created.
+        If it is not ``None``, `session` and `flask_sqlalchemy_db` will be
+        ignored. Each thread then makes its changes in a session of its own,
+        which is closed (and its connection returned to the pool) at the end
+        of each request, after being rolled back if the request raised an
+        exception. For more information, see :ref:`sessions`.
+
+        `replica_router` is a :class:`~flask.ext.restless.routing.ReplicaRouter`
+        which executes the queries of :http:method:`get` requests on read
+        replicas of the database and all other queries on the primary
+        database. If `session_factory` is ``None``, sessions are created by
+        :meth:`~flask.ext.restless.routing.ReplicaRouter.sessionmaker`;
+        otherwise `session_factory` must create
+        :class:`~flask.ext.restless.routing.RoutingSession` objects. In either
+        case, sessions are managed as described above. For more information,
+        see :ref:`replicas`.
+
         This is for use in the situation in which this class must be
         instantiated before the :class:`~flask.Flask` application has been
         created.
@@ -185,15 +230,56 @@ class APIManager(object):
 
         """
         self.app = app
-        self.session = session or getattr(flask_sqlalchemy_db, 'session', None)
+        if replica_router is not None:
+            if session_factory is None:
+                session_factory = replica_router.sessionmaker()
+            if app is not None:
+                app.after_request(replica_router.after_request)
+        if session_factory is not None:
+            if not isinstance(session_factory, ScopedSession):
+                session_factory = scoped_session(session_factory)
+            self.session = session_factory
+            if app is not None:
+                app.teardown_request(self._remove_session)
+        else:
+            self.session = session or getattr(flask_sqlalchemy_db, 'session',
+                                              None)
+
+    def _remove_session(self, exception=None):
+        """Closes the session of the current thread at the end of a request,
+        first rolling back its transaction if the request raised `exception`.
+
+        The session is left alone at the end of each operation of a batch
+        request, since it is shared by all of the operations; see
+        :meth:`create_batch_api`.
+
+        """
+        if request.environ.get(BATCH_ENVIRON_KEY):
+            return
+        if exception is not None:
+            self.session.rollback()
+        self.session.remove()
 
     def create_api_blueprint(self, model, methods=READONLY_METHODS,
                              url_prefix='/api', collection_name=None,
-                             allow_patch_many=False, allow_functions=False,
+                             allow_patch_many=False, allow_post_many=False,
+                             allow_delete_many=False, allow_functions=False,
                              validation_exceptions=None, results_per_page=10,
                              max_results_per_page=100,
                              post_form_preprocessor=None,
-                             preprocessors=None, postprocessors=None):
+                             preprocessors=None, postprocessors=None,
+                             missing_cache_size=0, return_minimal=False,
+                             select_for_update=False, write_behind_queue_size=0,
+                             write_behind_batch_size=100,
+                             write_behind_queue=None, write_behind_jobs=None,
+                             group_commit_window=None,
+                             group_commit_size=50, group_commit_timeout=30,
+                             allow_import=False,
+                             import_chunk_size=1000,
+                             read_only_transactions=False, executor=None,
+                             query_executor=None, shard_resolver=None,
+                             timing_hook=None, server_timing=False,
+                             statement_counter=None, profiler=None):
         """Creates an returns a ReSTful API interface as a blueprint, but does
         not register it on any :class:`flask.Flask` application.
 
@@ -228,10 +314,17 @@ class APIManager(object):
           and updating a subset of all instances of the model specified using
           search parameters.
         * If :http:method:`delete` is in this list, the API will allow deletion
-          of a single instance of the model per request.
+          of a single instance of the model per request (or of all instances
+          matching search parameters, if `allow_delete_many` is ``True``).
         * If :http:method:`post` is in this list, the API will allow posting a
           new instance of the model per request.
 
+        Individual instances are accessed at
+        ``<url_prefix>/<collection_name>/<instid>``, where ``instid`` is the
+        value of the primary key of the instance. If `model` has a composite
+        primary key, ``instid`` is the value of each column of the primary key
+        separated by commas; see :ref:`compositekeys`.
+
         The default set of methods provides a read-only interface (that is,
         only :http:method:`get` requests are allowed).
 
@@ -248,6 +341,18 @@ class APIManager(object):
         information on the search query parameter ``q``, see
         :ref:`searchformat`.
 
+        If `allow_post_many` is ``True``, then :http:method:`post` requests to
+        :http:post:`/api/<collection_name>` may contain a list of objects
+        instead of a single object, and an instance of the model will be
+        created for each of them in a single transaction. This is ``False`` by
+        default. For more information, see :ref:`allowpostmany`.
+
+        If `allow_delete_many` is ``True``, then requests to
+        :http:delete:`/api/<collection_name>?q=<searchjson>` will delete all
+        instances of the model which match the specified search query, using a
+        single SQL ``DELETE`` statement when possible. This is ``False`` by
+        default. For more information, see :ref:`allowdeletemany`.
+
         `validation_exceptions` is the tuple of possible exceptions raised by
         validation of your database models. If this is specified, validation
         errors will be captured and forwarded to the client in JSON format. For
@@ -300,6 +405,112 @@ class APIManager(object):
         other code. For more information on preprocessors and postprocessors,
         see :ref:`processors`.
 
+        If `missing_cache_size` is a positive integer, the API remembers the
+        primary keys of up to that many instances which were requested but
+        which do not exist, and responds to further requests for those
+        instances with :http:statuscode:`404` without querying the database.
+        Creating an instance through this API removes its primary key from the
+        cache. This is ``0`` (that is, disabled) by default. For more
+        information, see :ref:`missingcache`.
+
+        If `return_minimal` is ``True``, responses to :http:method:`post` and
+        :http:method:`patch` requests for a single instance contain only the
+        primary key of the instance, unless a request includes the header
+        ``Prefer: return=representation``. If this is ``False`` (the default),
+        responses contain the full representation of the instance, unless a
+        request includes the header ``Prefer: return=minimal``. For more
+        information, see :ref:`returnminimal`.
+
+        If `select_for_update` is ``True``, :http:method:`patch` requests for a
+        single instance lock the row of that instance with ``SELECT ... FOR
+        UPDATE`` until the changes are committed. This is ``False`` by default.
+
+        If `write_behind_queue_size` is a positive integer, :http:method:`post`
+        requests receive a :http:statuscode:`202` response as soon as they
+        have been validated, and the instances are created by a background
+        thread in transactions of up to `write_behind_batch_size` instances.
+        At most `write_behind_queue_size` instances may be waiting to be
+        created; further requests receive a :http:statuscode:`429` response.
+        `write_behind_queue` may be an object with the same interface as
+        :class:`Queue.Queue` to use instead of an in-process queue (in which
+        case `write_behind_queue_size` is ignored); it must be accompanied by
+        `write_behind_jobs`, a mapping in which the statuses of the jobs are
+        stored, shared by the same processes as the queue. The background
+        thread creates instances with the same configuration as this API.
+        This requires the session to be a
+        :class:`~sqlalchemy.orm.scoping.scoped_session`. For more information,
+        see :ref:`writebehind`.
+
+        If `group_commit_window` is a number of seconds, the changes made by
+        concurrent :http:method:`post` requests and :http:method:`patch` and
+        :http:method:`delete` requests for a single instance which arrive
+        within that many seconds of each other (up to `group_commit_size` of
+        them) are committed in a single transaction, and each request receives
+        its response once that transaction has been committed, or a response
+        with status code :http:statuscode:`503` if it has not been committed
+        within `group_commit_timeout` seconds. This also requires the session
+        to be a :class:`~sqlalchemy.orm.scoping.scoped_session`. For more
+        information, see :ref:`groupcommit`.
+
+        If `allow_import` is ``True`` and `methods` includes ``'POST'``, an
+        endpoint is created at ``<url_prefix>/<collection_name>/import`` which
+        creates many instances from a newline-delimited JSON or CSV file in
+        the body of a :http:method:`post` request, committing every
+        `import_chunk_size` rows. Each line is passed through the ``POST``
+        preprocessors. For more information, see :ref:`import`.
+
+        If `read_only_transactions` is ``True``, :http:method:`get` requests
+        (including function evaluation) are handled in read-only transactions
+        which end as soon as the requested instances have been loaded, before
+        the response is postprocessed and encoded. For more information, see
+        :ref:`readonly`.
+
+        If `executor` is not ``None``, requests on the API and function
+        evaluation are handled on the threads of that pool (for example, a
+        :class:`multiprocessing.pool.ThreadPool` or a
+        :class:`gevent.threadpool.ThreadPool`) instead of on the thread which
+        received the request. This requires the session to be a
+        :class:`~sqlalchemy.orm.scoping.scoped_session`. For more information,
+        see :ref:`executor`.
+
+        If `query_executor` is not ``None``, the query which counts the results
+        of a search is executed on a thread of that pool (an object with an
+        ``apply_async(func, args)`` method, such as a
+        :class:`multiprocessing.pool.ThreadPool`) while the requested page of
+        results is loaded. For more information, see
+        :ref:`concurrentqueries`.
+
+        If `shard_resolver` is not ``None``, it is a
+        :class:`~flask.ext.restless.sharding.ShardResolver` which chooses the
+        database (the shard) on which each request is executed, for a model
+        whose instances are split across several databases. Searches are
+        executed on all of the shards which may hold matching instances, and
+        their results are merged. This cannot be combined with
+        `allow_patch_many`, `allow_post_many`, `allow_delete_many`,
+        `allow_functions`, `allow_import`, `read_only_transactions`,
+        `executor`, write-behind mode, or group commit. For more information,
+        see :ref:`sharding`.
+
+        If `timing_hook` is not ``None``, it is a function which is called
+        after each :http:method:`get` request (including function evaluation)
+        with the model, the method of the request, and the list of pairs of
+        name and duration in seconds of the phases of handling the request. If
+        `server_timing` is ``True``, those durations are also included in the
+        ``Server-Timing`` header of the response. For more information, see
+        :ref:`timing`.
+
+        If `statement_counter` is not ``None``, it is a
+        :class:`~flask.ext.restless.counting.StatementCounter` which counts the
+        SQL statements executed while handling each request on this API, and
+        which warns about requests which execute too many statements or the
+        same statement too many times. For more information, see
+        :ref:`statementcounting`.
+
+        If `profiler` is not ``None``, it is a
+        :class:`~flask.ext.restless.profiling.RequestProfiler` which profiles
+        the requests on this API which carry its secret header and saves the
+        statistics to files. For more information, see :ref:`profiling`.
+
         .. versionchanged:: 0.10.0
            Removed `authentication_required_for` and `authentication_function`
            as well as the `include_columns` and `exclude_columns` keyword
@@ -309,6 +520,17 @@ class APIManager(object):
            instead. For more information, see :ref:`authentication` and
            :ref:`includes` for more information.
 
+        .. versionadded:: 0.10.0
+           Added the `missing_cache_size`, `allow_post_many`,
+           `allow_delete_many`, `return_minimal`, `select_for_update`,
+           `write_behind_queue_size`, `write_behind_batch_size`,
+           `write_behind_queue`, `write_behind_jobs`, `group_commit_window`,
+           `group_commit_size`, `group_commit_timeout`, `allow_import`,
+           `import_chunk_size`, `read_only_transactions`, `executor`,
+           `query_executor`, `shard_resolver`, `timing_hook`,
+           `server_timing`, `statement_counter`, and `profiler` keyword
+           arguments.
+
         .. versionadded:: 0.9.2
            Added the `preprocessors` and `postprocessors` keyword arguments.
 
@@ -344,22 +566,100 @@ class APIManager(object):
         methods = frozenset((m.upper() for m in methods))
         # sets of methods used for different types of endpoints
         no_instance_methods = methods & frozenset(('POST', ))
+        possibly_empty_methods = set(('GET', ))
         if allow_patch_many:
-            possibly_empty_instance_methods = \
-                methods & frozenset(('GET', 'PATCH', 'PUT'))
-        else:
-            possibly_empty_instance_methods = methods & frozenset(('GET', ))
+            possibly_empty_methods |= set(('PATCH', 'PUT'))
+        if allow_delete_many:
+            possibly_empty_methods.add('DELETE')
+        possibly_empty_instance_methods = methods & possibly_empty_methods
         instance_methods = \
             methods & frozenset(('GET', 'PATCH', 'DELETE', 'PUT'))
         # the base URL of the endpoints on which requests will be made
         collection_endpoint = '/%s' % collection_name
         # the name of the API, for use in creating the view and the blueprint
         apiname = APIManager.APINAME_FORMAT % collection_name
+        # the cache of missing instances must outlive the view instances,
+        # which are created anew for each request
+        if missing_cache_size > 0:
+            missing_cache = MissingInstanceCache(missing_cache_size)
+        else:
+            missing_cache = None
+        # likewise, the background writer and the commit coordinator must
+        # outlive the view instances, and their threads need their own sessions
+        write_behind = write_behind_queue_size > 0 or \
+            write_behind_queue is not None
+        if executor is not None and not isinstance(self.session,
+                                                   ScopedSession):
+            msg = 'An executor requires a scoped session'
+            raise IllegalArgumentError(msg)
+        if shard_resolver is not None and (
+                allow_patch_many or allow_post_many or allow_delete_many
+                or allow_functions or allow_import or read_only_transactions
+                or executor is not None or write_behind
+                or group_commit_window is not None):
+            msg = ('A sharded API cannot create or update many instances per'
+                   ' request, evaluate functions, import files, use read-only'
+                   ' transactions, an executor, write-behind mode, or group'
+                   ' commit')
+            raise IllegalArgumentError(msg)
+        if write_behind or group_commit_window is not None:
+            if not isinstance(self.session, ScopedSession):
+                msg = ('Write-behind mode and group commit require a scoped'
+                       ' session')
+                raise IllegalArgumentError(msg)
+        if write_behind_queue is not None and write_behind_jobs is None:
+            msg = ('A write-behind queue requires a store for the statuses of'
+                   ' its jobs')
+            raise IllegalArgumentError(msg)
+        # the APIs of the background threads are configured like this one
+        worker_api_kw = dict(validation_exceptions=validation_exceptions,
+                             results_per_page=results_per_page,
+                             max_results_per_page=max_results_per_page,
+                             preprocessors=preprocessors,
+                             postprocessors=postprocessors,
+                             missing_cache=missing_cache,
+                             return_minimal=return_minimal,
+                             select_for_update=select_for_update)
+        if write_behind:
+            writer = BatchWriter(self.session, model,
+                                 maxsize=write_behind_queue_size,
+                                 batch_size=write_behind_batch_size,
+                                 queue=write_behind_queue,
+                                 jobs=write_behind_jobs,
+                                 api_kw=worker_api_kw,
+                                 missing_cache=missing_cache)
+        else:
+            writer = None
+        if group_commit_window is not None:
+            coordinator = CommitCoordinator(
+                self.session, model, window=group_commit_window,
+                batch_size=group_commit_size, api_kw=worker_api_kw,
+                missing_cache=missing_cache, timeout=group_commit_timeout)
+        else:
+            coordinator = None
+        # if there is an executor, the views handle requests on its threads;
+        # if there is a shard resolver, they use sessions bound to its shards
+        api_class, function_api_class = API, FunctionAPI
+        view_kw = dict(timing_hook=timing_hook, server_timing=server_timing,
+                       statement_counter=statement_counter, profiler=profiler)
+        if executor is not None:
+            api_class, function_api_class = ExecutorAPI, ExecutorFunctionAPI
+            view_kw['executor'] = executor
+        elif shard_resolver is not None:
+            api_class = ShardedAPI
+            view_kw['shard_resolver'] = shard_resolver
         # the view function for the API for this model
-        api_view = API.as_view(apiname, self.session, model,
+        api_view = api_class.as_view(apiname, self.session, model,
                                validation_exceptions, results_per_page,
                                max_results_per_page, post_form_preprocessor,
-                               preprocessors, postprocessors)
+                               preprocessors, postprocessors,
+                               missing_cache=missing_cache,
+                               allow_post_many=allow_post_many,
+                               return_minimal=return_minimal,
+                               select_for_update=select_for_update,
+                               writer=writer, coordinator=coordinator,
+                               read_only=read_only_transactions,
+                               query_executor=query_executor, **view_kw)
         # suffix an integer to apiname according to already existing blueprints
         blueprintname = self._next_blueprint_name(apiname)
         # add the URL rules to the blueprint: the first is for methods on the
@@ -375,7 +675,8 @@ class APIManager(object):
                                methods=possibly_empty_instance_methods,
                                view_func=api_view)
         # the per-instance endpoints will allow both integer and string primary
-        # key accesses
+        # key accesses; the values of a composite primary key are separated by
+        # commas in `instid`
         instance_endpoint = '%s/<instid>' % (collection_endpoint)
         blueprint.add_url_rule(instance_endpoint, methods=instance_methods,
                                    view_func=api_view)
@@ -383,22 +684,48 @@ class APIManager(object):
         for relation_name in get_relations(model):
             relation = get_related_model(model, relation_name)
             relation_api_name = apiname + '_' + relation_name
-            relation_api_view = API.as_view(relation_api_name, self.session,
-                                            relation, validation_exceptions,
-                                            results_per_page,
-                                            max_results_per_page,
-                                            post_form_preprocessor,
-                                            preprocessors, postprocessors)
+            relation_api_view = api_class.as_view(
+                relation_api_name, self.session, relation,
+                validation_exceptions, results_per_page, max_results_per_page,
+                post_form_preprocessor, preprocessors, postprocessors,
+                read_only=read_only_transactions,
+                query_executor=query_executor, **view_kw)
             endpoint_url = '%s/%s' % (instance_endpoint, relation_name)
             blueprint.add_url_rule(endpoint_url, methods=['GET'],
                                    view_func=relation_api_view)
+        # if write-behind mode is enabled, add an endpoint which provides the
+        # status of the jobs of the background writer
+        if writer is not None:
+            job_api_view = JobAPI.as_view(apiname + 'jobs', writer)
+            job_endpoint = '%s/jobs/<jobid>' % collection_endpoint
+            blueprint.add_url_rule(job_endpoint, methods=['GET'],
+                                   view_func=job_api_view)
+        # if importing is allowed, add an endpoint at /api/<collection>/import
+        # which creates instances from a file in the body of the request; it
+        # creates instances just like POST requests, so it requires that
+        # method and is subject to the same preprocessors and validation
+        if allow_import and 'POST' in methods:
+            import_preprocessors = \
+                upper_keys(preprocessors or {}).get('POST', [])
+            if post_form_preprocessor:
+                import_preprocessors = import_preprocessors + \
+                    [post_form_preprocessor]
+            import_api_view = ImportAPI.as_view(
+                apiname + 'import', self.session, model,
+                chunk_size=import_chunk_size, missing_cache=missing_cache,
+                preprocessors=import_preprocessors,
+                validation_exceptions=validation_exceptions)
+            import_endpoint = '%s/import' % collection_endpoint
+            blueprint.add_url_rule(import_endpoint, methods=['POST'],
+                                   view_func=import_api_view)
         # if function evaluation is allowed, add an endpoint at /api/eval/...
         # which responds only to GET requests and responds with the result of
         # evaluating functions on all instances of the specified model
         if allow_functions:
             eval_api_name = apiname + 'eval'
-            eval_api_view = FunctionAPI.as_view(eval_api_name, self.session,
-                                                model)
+            eval_api_view = function_api_class.as_view(
+                eval_api_name, self.session, model,
+                read_only=read_only_transactions, **view_kw)
             eval_endpoint = '/eval' + collection_endpoint
             blueprint.add_url_rule(eval_endpoint, methods=['GET'],
                                    view_func=eval_api_view)
@@ -424,3 +751,33 @@ class APIManager(object):
         """
         blueprint = self.create_api_blueprint(*args, **kw)
         self.app.register_blueprint(blueprint)
+
+    def create_batch_api(self, url_prefix='/api', max_operations=100):
+        """Creates and registers an endpoint at ``<url_prefix>/batch`` on the
+        :class:`flask.Flask` application specified in the constructor of this
+        class, which executes many requests on the APIs created by this class
+        in a single request and a single database transaction.
+
+        The returned :class:`flask.Blueprint` has already been registered with
+        the application, so you do *not* need to register it yourself.
+
+        `url_prefix` is the URL prefix at which the endpoint will be
+        accessible.
+
+        `max_operations` is the maximum number of operations allowed in a
+        single batch request.
+
+        For more information on the format of requests and responses, see
+        :ref:`batchrequests`.
+
+        .. versionadded:: 0.10.0
+
+        """
+        batch_view = BatchAPI.as_view('batchapi', self.session,
+                                      max_operations)
+        blueprintname = self._next_blueprint_name('batchapi')
+        blueprint = Blueprint(blueprintname, __name__, url_prefix=url_prefix)
+        blueprint.add_url_rule('/batch', methods=['POST'],
+                               view_func=batch_view)
+        self.app.register_blueprint(blueprint)
+        return blueprint
@@ -0,0 +1,179 @@
+"""
+    flask.ext.restless.profiling
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Provides :class:`RequestProfiler`, which profiles the requests which carry
+    a secret header and saves the statistics to files, for diagnosing slow
+    requests in production.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+import cProfile
+import os
+import tempfile
+import threading
+from timeit import default_timer
+
+from flask import current_app
+from flask import request
+from werkzeug.security import safe_str_cmp
+
+#: The default name of the header which a request carries to be profiled.
+PROFILE_HEADER = 'X-Restless-Profile'
+
+#: The header of the response to a profiled request which contains the name of
+#: the file in which the statistics were saved.
+PROFILE_FILE_HEADER = 'X-Restless-Profile-File'
+
+#: The suffix of the names of the files in which the statistics are saved.
+PROFILE_SUFFIX = '.prof'
+
+
+class RequestProfiler(object):
+    """Profiles the requests whose header named `header` has the value
+    `secret`, and saves the statistics of each to a new file in the directory
+    `directory`.
+
+    The statistics are collected with :mod:`cProfile` on the thread which
+    handles the request, and saved in the format read by :mod:`pstats` (and by
+    tools like `SnakeViz <http://jiffyclub.github.io/snakeviz/>`_ and
+    ``gprof2dot``). The name of the file is given in the
+    :data:`PROFILE_FILE_HEADER` header of the response.
+
+    At most one request is profiled every `interval` seconds, and at most one
+    at a time; other requests which carry the header are handled without being
+    profiled. If `max_files` is not ``None``, only the newest `max_files`
+    files of statistics in `directory` are kept, and older ones are deleted.
+    This bounds the overhead and the disk space used, so that the profiler may
+    be left enabled in production.
+
+    If the statistics cannot be saved (for example, because the directory is
+    missing or full), the error is logged and the response is returned
+    without the :data:`PROFILE_FILE_HEADER` header.
+
+    Instances of this class are safe to share among threads, and may be shared
+    by several APIs.
+
+    """
+
+    def __init__(self, directory, secret, header=PROFILE_HEADER, interval=60,
+                 max_files=100):
+        if not secret:
+            raise ValueError('The secret of a profiler must not be empty')
+        self.directory = directory
+        self.secret = secret
+        self.header = header
+        self.interval = interval
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        self._last = None
+        self._running = False
+
+    def _acquire(self):
+        """Returns ``True`` and marks a profile as running if the current
+        request should be profiled, and ``False`` otherwise.
+
+        """
+        value = request.headers.get(self.header)
+        if value is None or not safe_str_cmp(value, self.secret):
+            return False
+        self._lock.acquire()
+        try:
+            now = default_timer()
+            if self._running or (self._last is not None and
+                                 now - self._last < self.interval):
+                return False
+            self._running = True
+            self._last = now
+            return True
+        finally:
+            self._lock.release()
+
+    def _release(self):
+        """Marks the running profile as finished."""
+        self._lock.acquire()
+        try:
+            self._running = False
+        finally:
+            self._lock.release()
+
+    def _filename(self, model):
+        """Returns the name of a new file in :attr:`directory` in which to save
+        the statistics of the current request on `model`.
+
+        """
+        prefix = '%s-%s-' % (request.method.lower(), model.__name__)
+        fd, filename = tempfile.mkstemp(suffix=PROFILE_SUFFIX, prefix=prefix,
+                                        dir=self.directory)
+        os.close(fd)
+        return filename
+
+    def _prune(self):
+        """Deletes the oldest files of statistics in :attr:`directory` so that
+        at most :attr:`max_files` of them remain.
+
+        """
+        if self.max_files is None:
+            return
+        paths = [os.path.join(self.directory, name)
+                 for name in os.listdir(self.directory)
+                 if name.endswith(PROFILE_SUFFIX)]
+        if len(paths) <= self.max_files:
+            return
+        paths.sort(key=lambda path: (os.path.getmtime(path), path))
+        for path in paths[:len(paths) - self.max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                # another process may have deleted it already
+                pass
+
+    def _save(self, model, profile):
+        """Saves the statistics of `profile`, collected while handling the
+        current request on `model`, to a new file, deletes the oldest files if
+        there are too many, and returns the name of the new file, or ``None``
+        if it could not be saved.
+
+        """
+        logger = current_app.logger
+        try:
+            filename = self._filename(model)
+        except (IOError, OSError):
+            logger.exception('Unable to save the profile of %s %s',
+                             request.method, request.path)
+            return None
+        try:
+            profile.dump_stats(filename)
+        except (IOError, OSError):
+            logger.exception('Unable to save the profile of %s %s',
+                             request.method, request.path)
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+            return None
+        try:
+            self._prune()
+        except (IOError, OSError):
+            logger.exception('Unable to delete old profiles')
+        return filename
+
+    def profile(self, model, function, *args, **kw):
+        """Returns the response returned by calling `function` with the given
+        positional and keyword arguments to handle the current request on
+        `model`, profiling the call if the request should be profiled.
+
+        """
+        if not self._acquire():
+            return function(*args, **kw)
+        try:
+            profile = cProfile.Profile()
+            response = profile.runcall(function, *args, **kw)
+            filename = self._save(model, profile)
+        finally:
+            self._release()
+        if filename is not None:
+            response.headers[PROFILE_FILE_HEADER] = os.path.basename(filename)
+        return response
@@ -0,0 +1,220 @@
+"""
+    flask.ext.restless.routing
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Provides :class:`ReplicaRouter`, which sends the queries made while
+    handling read-only requests to read replicas of the database, and
+    :class:`RoutingSession`, the session class which consults it.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+from collections import deque
+import threading
+import time
+
+from flask import has_request_context
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.orm import sessionmaker
+
+from .views import BATCH_ENVIRON_KEY
+
+#: The methods of requests whose queries may be sent to a replica.
+READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+#: The key in the WSGI environment of a request under which the replica chosen
+#: for that request is stored, so that all of its queries see the same replica.
+REPLICA_ENVIRON_KEY = 'flask_restless.replica'
+
+#: The strategy which chooses each replica in turn.
+ROUND_ROBIN = 'round_robin'
+
+#: The strategy which chooses the replica with the fewest connections in use.
+LEAST_LOADED = 'least_loaded'
+
+
+class ReplicaRouter(object):
+    """Chooses the database engine on which the queries of each request are
+    executed.
+
+    The queries made while handling a :http:method:`get` request (including
+    searches, requests on related instances, and function evaluation) are
+    executed on one of the `replicas`; all other queries are executed on the
+    `primary` engine. All of the queries of a single request are executed on
+    the same replica.
+
+    `strategy` is either :data:`ROUND_ROBIN`, in which case each request uses
+    the next replica in turn, or :data:`LEAST_LOADED`, in which case each
+    request uses the replica with the fewest connections checked out of its
+    pool.
+
+    If `sticky_window` is a positive number of seconds, all requests from a
+    client which made a successful write request (that is, one whose method is
+    not in :data:`READ_METHODS`) less than that many seconds ago use the
+    primary engine, so that the client sees its own writes even if the
+    replicas lag behind. Clients are identified by the result of calling the
+    function `client_key` with no arguments during a request; by default, this
+    is the remote address of the request. At most `max_clients` clients are
+    remembered.
+
+    Operations of batch requests always use the primary engine.
+
+    Instances of this class are safe to share among threads.
+
+    """
+
+    def __init__(self, primary, replicas, strategy=ROUND_ROBIN,
+                 sticky_window=0, client_key=None, max_clients=10000):
+        if not replicas:
+            raise ValueError('At least one replica is required')
+        if strategy not in (ROUND_ROBIN, LEAST_LOADED):
+            raise ValueError('Unknown strategy: %r' % (strategy, ))
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.strategy = strategy
+        self.sticky_window = sticky_window
+        self.client_key = client_key or (lambda: request.remote_addr)
+        self.max_clients = max_clients
+        self._next = 0
+        self._load = [0] * len(self.replicas)
+        self._writes = {}
+        self._order = deque()
+        self._lock = threading.Lock()
+        if strategy == LEAST_LOADED:
+            for index, replica in enumerate(self.replicas):
+                self._track_load(replica, index)
+
+    def _track_load(self, replica, index):
+        """Counts the connections checked out of the pool of the engine
+        `replica`, which is the replica at `index`.
+
+        """
+        def checkout(dbapi_connection, connection_record, connection_proxy):
+            self._add_load(index, 1)
+
+        def checkin(dbapi_connection, connection_record):
+            self._add_load(index, -1)
+
+        event.listen(replica, 'checkout', checkout)
+        event.listen(replica, 'checkin', checkin)
+
+    def _add_load(self, index, delta):
+        """Adds `delta` to the number of connections in use on the replica at
+        `index`.
+
+        """
+        self._lock.acquire()
+        try:
+            self._load[index] += delta
+        finally:
+            self._lock.release()
+
+    def choose_replica(self):
+        """Returns the replica to use for a new request, according to the
+        strategy specified in the constructor of this class.
+
+        """
+        self._lock.acquire()
+        try:
+            if self.strategy == LEAST_LOADED:
+                # break ties in turn, so that idle replicas share the load
+                indices = range(self._next, len(self.replicas)) + \
+                    range(self._next)
+                index = min(indices, key=self._load.__getitem__)
+            else:
+                index = self._next
+            self._next = (index + 1) % len(self.replicas)
+            return self.replicas[index]
+        finally:
+            self._lock.release()
+
+    def record_write(self, client):
+        """Remembers that `client` has just made a write request."""
+        now = time.time()
+        self._lock.acquire()
+        try:
+            self._writes[client] = now
+            self._order.append((client, now))
+            # forget the clients whose window has passed, and the oldest
+            # clients if there are too many
+            while self._order and \
+                    (now - self._order[0][1] >= self.sticky_window
+                     or len(self._writes) > self.max_clients):
+                oldest, when = self._order.popleft()
+                if self._writes.get(oldest) == when:
+                    del self._writes[oldest]
+        finally:
+            self._lock.release()
+
+    def is_sticky(self, client):
+        """Returns ``True`` if and only if `client` made a write request less
+        than `sticky_window` seconds ago.
+
+        """
+        when = self._writes.get(client)
+        return when is not None and time.time() - when < self.sticky_window
+
+    def replica_for_request(self):
+        """Returns the replica on which the queries of the current request
+        should be executed, or ``None`` if they should be executed on the
+        primary engine.
+
+        """
+        if not has_request_context() or request.method not in READ_METHODS \
+                or request.environ.get(BATCH_ENVIRON_KEY):
+            return None
+        if self.sticky_window > 0 and self.is_sticky(self.client_key()):
+            return None
+        replica = request.environ.get(REPLICA_ENVIRON_KEY)
+        if replica is None:
+            replica = self.choose_replica()
+            request.environ[REPLICA_ENVIRON_KEY] = replica
+        return replica
+
+    def after_request(self, response):
+        """Records a successful write request by the client which made the
+        current request, and returns `response` unchanged.
+
+        This is registered as an :meth:`~flask.Flask.after_request` function
+        by :class:`~flask.ext.restless.APIManager`.
+
+        """
+        if self.sticky_window > 0 and request.method not in READ_METHODS \
+                and response.status_code < 400:
+            self.record_write(self.client_key())
+        return response
+
+    def sessionmaker(self, **kw):
+        """Returns a :func:`~sqlalchemy.orm.sessionmaker` which creates
+        instances of :class:`RoutingSession` bound to the primary engine and
+        routed by this object.
+
+        The keyword arguments are passed to
+        :func:`~sqlalchemy.orm.sessionmaker`.
+
+        """
+        return sessionmaker(bind=self.primary, class_=RoutingSession,
+                            router=self, **kw)
+
+
+class RoutingSession(Session):
+    """A session which executes queries on the engine chosen by a
+    :class:`ReplicaRouter`.
+
+    Changes are always flushed to the engine to which the session is bound.
+
+    """
+
+    def __init__(self, router=None, **kw):
+        super(RoutingSession, self).__init__(**kw)
+        self.router = router
+
+    def get_bind(self, mapper=None, clause=None):
+        if self.router is not None and not self._flushing:
+            replica = self.router.replica_for_request()
+            if replica is not None:
+                return replica
+        return super(RoutingSession, self).get_bind(mapper, clause)
@@ -0,0 +1,367 @@
+"""
+    flask.ext.restless.sharding
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Provides :class:`ShardResolver`, which chooses the database (the *shard*)
+    in which each instance of a model split across several databases lives,
+    and :class:`ShardedAPI`, the view which consults it.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+from __future__ import division
+
+import math
+from operator import attrgetter
+
+from flask import abort
+from flask import request
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.exc import MultipleResultsFound
+from sqlalchemy.orm.exc import NoResultFound
+
+from .search import create_query
+from .search import SearchParameters
+from .views import _coerce_primary_key
+from .views import _primary_key_columns
+from .views import API
+from .views import BATCH_ENVIRON_KEY
+from .views import jsonify_status_code
+from .views import ProcessingException
+
+#: The names of the search operators which compare a field for equality with
+#: a single value.
+EQUALITY_OPERATORS = frozenset(('==', 'eq', 'equals', 'equal_to'))
+
+#: The names of the dialects of the databases which order ``NULL`` after all
+#: other values in ascending order (and before them in descending order).
+#: Other databases, such as SQLite and MySQL, order it before all other values.
+NULLS_LAST_DIALECTS = frozenset(('postgresql', 'oracle'))
+
+
+def _fetch(session, model, search_params, stop=None, count=True):
+    """Returns a pair whose left element is the number of instances of `model`
+    in `session` which match the search `search_params` (or ``None`` if
+    `count` is ``False``) and whose right element is the list of the first
+    `stop` of them (or all of them, if `stop` is ``None``).
+
+    The instances are ordered as specified in `search_params` and then by
+    primary key, so that instances from several shards can be merged in a
+    well-defined order. The limit and offset of `search_params` are ignored.
+
+    This function may be called on a thread of the pool of a
+    :class:`ShardResolver`. It ends the transaction of `session` before
+    returning, so that the connection it used is not used again on another
+    thread; the session must not expire its instances on commit.
+
+    """
+    query = create_query(session, model, search_params)
+    for name, pytype in _primary_key_columns(model):
+        query = query.order_by(getattr(model, name))
+    if stop is not None:
+        instances = query.limit(stop).all()
+    else:
+        instances = query.all()
+    if not count:
+        num_results = None
+    elif stop is None or len(instances) < stop:
+        num_results = len(instances)
+    else:
+        num_results = query.order_by(None).count()
+    session.commit()
+    return num_results, instances
+
+
+def _sort(instances, model, order_by, dialect):
+    """Sorts the list of instances of `model` in place, in the order specified
+    by the list of :class:`~flask.ext.restless.search.OrderBy` objects
+    `order_by` and then by primary key.
+
+    ``None`` is placed where the database of `dialect` places ``NULL`` (see
+    :data:`NULLS_LAST_DIALECTS`), so that the order matches the order in which
+    each shard returned its instances. Other values are compared in Python,
+    which may not match the collation of the database for strings.
+
+    """
+    nulls_last = dialect.name in NULLS_LAST_DIALECTS
+    keys = [(o.field, o.direction == 'desc') for o in order_by]
+    keys += [(name, False) for name, pytype in _primary_key_columns(model)]
+    # sorting is stable, so sorting by each key from the least significant to
+    # the most significant sorts by all of them
+    for name, reverse in reversed(keys):
+        get = attrgetter(name)
+        key = lambda instance: ((get(instance) is None) == nulls_last,
+                                get(instance))
+        instances.sort(key=key, reverse=reverse)
+
+
+class ShardResolver(object):
+    """Chooses the shard on which each request on a sharded model is executed.
+
+    `binds` is a dictionary mapping the name of each shard to the engine (or
+    connection) of its database. The instances of the model are split among
+    the shards according to the value of their attribute named `shard_key`:
+    the function `shard_for_key` takes such a value and returns the name of
+    the shard which holds the instances with that value.
+
+    `shard_for_id`, if not ``None``, is a function which takes the primary
+    key of an instance as a string (as it appears in the URL) and returns the
+    name of the shard which holds that instance, or ``None`` if it is not
+    known. Otherwise, requests on a single instance look for the instance on
+    each shard in turn.
+
+    Searches with an equality filter (or an ``in`` filter) on the shard key
+    are executed on the shards which hold those values only; other searches
+    are executed on all of the shards, and their results are merged. If
+    `executor` is not ``None``, it is a pool of threads (an object with an
+    ``apply_async(func, args)`` method, such as a
+    :class:`multiprocessing.pool.ThreadPool`) on which the queries on each
+    shard are executed concurrently.
+
+    Instances of this class are safe to share among threads.
+
+    """
+
+    def __init__(self, binds, shard_key, shard_for_key, shard_for_id=None,
+                 executor=None):
+        self.binds = dict(binds)
+        self.shard_key = shard_key
+        self.shard_for_key = shard_for_key
+        self.shard_for_id = shard_for_id
+        self.executor = executor
+        self.sessionmakers = dict((shard, sessionmaker(bind=bind))
+                                  for shard, bind in self.binds.iteritems())
+
+    def session(self, shard, **kw):
+        """Returns a new session bound to the database of the shard named
+        `shard`.
+
+        The keyword arguments are passed to the constructor of the session.
+
+        """
+        return self.sessionmakers[shard](**kw)
+
+    def shard_for_instance(self, instid):
+        """Returns the name of the shard which holds the instance whose primary
+        key is the string `instid`, or ``None`` if it is not known.
+
+        """
+        if self.shard_for_id is None:
+            return None
+        shard = self.shard_for_id(instid)
+        return shard if shard in self.binds else None
+
+    def shard_for_params(self, params):
+        """Returns the name of the shard which should hold an instance created
+        from the dictionary `params`, or ``None`` if `params` does not specify
+        the shard key.
+
+        """
+        if self.shard_key not in params:
+            return None
+        shard = self.shard_for_key(params[self.shard_key])
+        return shard if shard in self.binds else None
+
+    def shards_for_search(self, search_params):
+        """Returns the sorted list of names of the shards which may hold
+        instances matching the search specified by the
+        :class:`~flask.ext.restless.search.SearchParameters` object
+        `search_params`.
+
+        """
+        shards = set(self.binds)
+        for filt in search_params.filters:
+            if filt.fieldname != self.shard_key or filt.otherfield:
+                continue
+            if filt.operator in EQUALITY_OPERATORS:
+                values = [filt.argument]
+            elif filt.operator == 'in':
+                values = filt.argument
+            else:
+                continue
+            shards &= set(self.shard_for_key(value) for value in values)
+        return sorted(shards)
+
+    def map(self, function, arguments):
+        """Returns the list of results of calling `function` on each element of
+        `arguments`, on the threads of the executor given in the constructor
+        of this class if there is one.
+
+        """
+        if self.executor is None:
+            return [function(argument) for argument in arguments]
+        pending = [self.executor.apply_async(function, (argument, ))
+                   for argument in arguments]
+        return [result.get() for result in pending]
+
+
+class ShardedAPI(API):
+    """An :class:`~flask.ext.restless.views.API` for a model whose instances
+    are split across several databases, as chosen by the
+    :class:`ShardResolver` given as the `shard_resolver` keyword argument.
+
+    A request on a single instance is executed in a session bound to the shard
+    which holds the instance, and a :http:method:`post` request in a session
+    bound to the shard chosen by the value of the shard key in the created
+    instance (after preprocessing). A search is executed on each of the shards
+    which may hold matching instances, and the results are merged.
+
+    Sharded APIs cannot be used in batch requests, nor with the options which
+    create or update many instances in one request.
+
+    """
+
+    def __init__(self, *args, **kw):
+        self.shard_resolver = kw.pop('shard_resolver')
+        super(ShardedAPI, self).__init__(*args, **kw)
+        self._sessions = []
+
+    def dispatch_request(self, *args, **kw):
+        if request.environ.get(BATCH_ENVIRON_KEY):
+            message = 'Sharded APIs cannot be used in batch requests'
+            return jsonify_status_code(400, message=message)
+        try:
+            try:
+                instid = kw.get('instid')
+                if instid is not None:
+                    self._use_instance_shard(instid)
+                return super(ShardedAPI, self).dispatch_request(*args, **kw)
+            except ProcessingException, exception:
+                return jsonify_status_code(exception.status_code,
+                                           message=exception.message)
+        finally:
+            for session in self._sessions:
+                session.close()
+
+    def _open(self, shard, **kw):
+        """Returns a new session bound to the shard named `shard`, which is
+        closed at the end of the request.
+
+        """
+        session = self.shard_resolver.session(shard, **kw)
+        self._sessions.append(session)
+        return session
+
+    def _use_shard(self, shard):
+        """Executes the rest of the request in a session bound to the shard
+        named `shard`.
+
+        """
+        if shard is None:
+            raise ProcessingException('Unable to determine the shard', 400)
+        self.session = self._open(shard)
+
+    def _use_instance_shard(self, instid):
+        """Executes the rest of the request in a session bound to the shard
+        which holds the instance whose primary key is `instid`.
+
+        If the shard resolver does not know which shard holds the instance,
+        each shard is queried for it in turn, unless the cache of missing
+        instances records that it does not exist. Responds with
+        :http:statuscode:`404` if no shard holds it.
+
+        """
+        resolver = self.shard_resolver
+        shard = resolver.shard_for_instance(instid)
+        if shard is not None:
+            self._use_shard(shard)
+            return
+        cache = self.missing_cache
+        if cache is not None:
+            try:
+                primary_key = _coerce_primary_key(self.model, instid)
+            except ValueError:
+                abort(404)
+            if primary_key in cache:
+                abort(404)
+        for shard in sorted(resolver.binds):
+            self._use_shard(shard)
+            if self._get_by(instid) is not None:
+                return
+        if cache is not None:
+            cache.add(primary_key)
+        abort(404)
+
+    def _create_instance(self, params):
+        self._use_shard(self.shard_resolver.shard_for_params(params))
+        return super(ShardedAPI, self)._create_instance(params)
+
+    def _fan_out(self, search_params, stop=None, count=True):
+        """Returns the list of results of calling :func:`_fetch` on each shard
+        which may hold instances matching the
+        :class:`~flask.ext.restless.search.SearchParameters` object
+        `search_params`, with `stop` and `count` as given.
+
+        """
+        shards = self.shard_resolver.shards_for_search(search_params)
+        # the sessions may be used on another thread, and their instances
+        # must remain loaded after the transaction is ended on that thread
+        sessions = [self._open(shard, expire_on_commit=False)
+                    for shard in shards]
+        fetch = lambda session: _fetch(session, self.model, search_params,
+                                       stop, count)
+        return self.shard_resolver.map(fetch, sessions)
+
+    def _single(self, search_params):
+        search_params = SearchParameters.from_dictionary(search_params)
+        instances = []
+        for num_results, found in self._fan_out(search_params, 2, False):
+            instances.extend(found)
+        self.timer.lap('execute')
+        if not instances:
+            raise NoResultFound('No row was found for one()')
+        if len(instances) > 1:
+            raise MultipleResultsFound('Multiple rows were found for one()')
+        return instances[0]
+
+    def _paginated(self, search_params):
+        """Returns a dictionary describing the page requested by the client of
+        the results of the search specified by the dictionary `search_params`,
+        as described in :meth:`flask.ext.restless.views.API._paginated`.
+
+        If only one shard may hold matching instances, the search is executed
+        on that shard alone. Otherwise, each shard loads the matching
+        instances up to the end of the requested page, in order, and counts
+        all of them; the instances are then merged, and the page is taken from
+        the merged list.
+
+        """
+        params = SearchParameters.from_dictionary(search_params)
+        shards = self.shard_resolver.shards_for_search(params)
+        if len(shards) == 1:
+            self._use_shard(shards[0])
+            return super(ShardedAPI, self)._paginated(search_params)
+        results_per_page = self._compute_results_per_page()
+        offset = params.offset or 0
+        if results_per_page > 0:
+            page_num = self._page_number()
+            start = offset + (page_num - 1) * results_per_page
+            stop = start + results_per_page
+        else:
+            page_num = 1
+            start = offset
+            stop = None
+        if params.limit:
+            stop = min(stop or (offset + params.limit), offset + params.limit)
+        # the limit and offset apply to the merged results
+        shard_params = SearchParameters(filters=params.filters,
+                                        order_by=params.order_by)
+        num_results = 0
+        instances = []
+        for count, found in self._fan_out(shard_params, stop):
+            num_results += count
+            instances.extend(found)
+        if instances:
+            dialect = self.shard_resolver.binds[shards[0]].dialect
+            _sort(instances, self.model, params.order_by, dialect)
+        self.timer.lap('execute')
+        num_results = max(0, num_results - offset)
+        if params.limit:
+            num_results = min(num_results, params.limit)
+        if results_per_page > 0:
+            total_pages = int(math.ceil(num_results / results_per_page))
+        else:
+            total_pages = 1
+        return dict(page=page_num, objects=instances[start:stop],
+                    total_pages=total_pages, num_results=num_results)
@@ -0,0 +1,67 @@
+"""
+    flask.ext.restless.timing
+    ~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Provides :class:`PhaseTimer`, which measures the time spent in each phase
+    of handling a request, and :data:`request_timed`, the signal sent with
+    those measurements.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+from timeit import default_timer
+
+from flask.signals import Namespace
+
+#: The namespace of the signals sent by Flask-Restless.
+_signals = Namespace()
+
+#: Signal sent after a :http:method:`get` request on an API has been handled,
+#: with the application as the sender and the keyword arguments ``model`` (the
+#: model of the API), ``method`` (the method of the request), and ``phases``
+#: (the list of pairs of phase name and duration in seconds, as in
+#: :attr:`PhaseTimer.phases`).
+#:
+#: Like the signals of Flask itself, this requires `blinker
+#: <http://pypi.python.org/pypi/blinker>`_; without it, nothing is sent.
+request_timed = _signals.signal('request-timed')
+
+
+class PhaseTimer(object):
+    """Measures the time spent in consecutive phases of handling a request.
+
+    The timer starts when it is created. Each call to :meth:`lap` ends the
+    current phase, attributing the time since the end of the previous phase
+    to the given phase name.
+
+    """
+
+    def __init__(self):
+        self.phases = []
+        self._last = default_timer()
+
+    def lap(self, phase):
+        """Ends the phase named `phase`, which began when the previous phase
+        ended (or when this timer was created).
+
+        If several phases have the same name, their durations are added.
+
+        """
+        now = default_timer()
+        duration = now - self._last
+        self._last = now
+        for index, (name, total) in enumerate(self.phases):
+            if name == phase:
+                self.phases[index] = (name, total + duration)
+                return
+        self.phases.append((phase, duration))
+
+    def server_timing(self):
+        """Returns the value of a ``Server-Timing`` response header describing
+        the phases measured by this timer and their total, in milliseconds.
+
+        """
+        phases = self.phases + [('total', sum(d for p, d in self.phases))]
+        return ', '.join('%s;dur=%.3f' % (phase, duration * 1000)
+                         for phase, duration in phases)
@@ -24,10 +24,14 @@
 from __future__ import division
 
 from collections import defaultdict
+import csv
 import itertools
 import datetime
+import decimal
 import math
+from Queue import Full
 import warnings
+from weakref import WeakKeyDictionary
 
 from dateutil.parser import parse as parse_datetime
 from flask import abort
@@ -35,21 +39,37 @@ from flask import current_app
 from flask import json
 from flask import jsonify
 from flask import request
+from flask import Response
+from flask import stream_with_context
 from flask.views import MethodView
 from sqlalchemy import Date
 from sqlalchemy import DateTime
+from sqlalchemy import sql
+from sqlalchemy import UniqueConstraint
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import class_mapper
 from sqlalchemy.orm import ColumnProperty
 from sqlalchemy.orm import object_mapper
 from sqlalchemy.orm import RelationshipProperty
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.interfaces import MANYTOMANY
+from sqlalchemy.orm.interfaces import ONETOMANY
 from sqlalchemy.orm.exc import MultipleResultsFound
 from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.orm.exc import UnmappedColumnError
+from sqlalchemy.orm.instrumentation import manager_of_class
 from sqlalchemy.orm.query import Query
 from sqlalchemy.sql import func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.ext.declarative import _declarative_constructor
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.ext.associationproxy import AssociationProxy
+from werkzeug.exceptions import HTTPException
+from werkzeug.urls import url_quote
 
 from .helpers import get_columns
 from .helpers import get_related_model
@@ -58,7 +78,9 @@ from .helpers import session_query
 from .helpers import unicode_keys_to_strings
 from .helpers import upper_keys
 from .search import create_query
-from .search import search
+from .search import SearchParameters
+from .timing import PhaseTimer
+from .timing import request_timed
 
 
 class ProcessingException(Exception):
@@ -82,6 +104,28 @@ class ProcessingException(Exception):
         self.status_code = status_code
 
 
+class CommitTimeout(Exception):
+    """Raised by :meth:`flask.ext.restless.writer.CommitCoordinator.execute`
+    when the changes of a request have not been committed within the timeout
+    of the coordinator.
+
+    """
+    pass
+
+
+class Unchanged(object):
+    """The result of a function given to
+    :meth:`flask.ext.restless.writer.CommitCoordinator.execute` which made no
+    changes, so that the coordinator has nothing to commit on its behalf.
+
+    `result` is the actual result of the function.
+
+    """
+
+    def __init__(self, result):
+        self.result = result
+
+
 def jsonify_status_code(status_code, *args, **kw):
     """Returns a jsonified response with the specified HTTP status code.
 
@@ -128,6 +172,111 @@ def _is_date_field(model, fieldname):
     return isinstance(fieldtype, Date) or isinstance(fieldtype, DateTime)
 
 
+def _strings_to_dates(model, dictionary):
+    """Returns a new dictionary with all the mappings of `dictionary` but with
+    date strings mapped to :class:`datetime.datetime` objects.
+
+    The keys of `dictionary` are names of fields of `model`. For more
+    information, see :meth:`API._strings_to_dates`.
+
+    """
+    result = {}
+    for fieldname, value in dictionary.iteritems():
+        if _is_date_field(model, fieldname) and value is not None:
+            if value.strip() == '':
+                result[fieldname] = None
+            else:
+                result[fieldname] = parse_datetime(value)
+        else:
+            result[fieldname] = value
+    return result
+
+
+def _extract_error_messages(exception):
+    """Tries to extract a dictionary mapping field name to validation error
+    messages from `exception`, which is a validation exception as provided in
+    the ``validation_exceptions`` keyword argument in the constructor of
+    :class:`API`.
+
+    Since the type of the exception is provided by the user, we don't know for
+    sure where the validation error messages live inside `exception`.
+    Therefore this function simply attempts to access a few likely attributes
+    and returns the first one it finds (or ``None`` if no error messages
+    dictionary can be extracted).
+
+    """
+    # 'errors' comes from sqlalchemy_elixir_validations
+    if hasattr(exception, 'errors'):
+        return exception.errors
+    # 'message' comes from savalidation
+    if hasattr(exception, 'message'):
+        # TODO this works only if there is one validation error
+        try:
+            left, right = exception.message.rsplit(':', 1)
+            left_bracket = left.rindex('[')
+            right_bracket = right.rindex(']')
+        except ValueError:
+            # could not parse the string; we're not trying too hard here...
+            return None
+        msg = right[:right_bracket].strip(' "')
+        fieldname = left[left_bracket + 1:].strip()
+        return {fieldname: msg}
+    return None
+
+
+def _chunks(sequence, size):
+    """Yields consecutive slices of the list `sequence`, each of length at
+    most `size`.
+
+    """
+    for start in xrange(0, len(sequence), size):
+        yield sequence[start:start + size]
+
+
+#: The key in the WSGI environment of a request which indicates that the
+#: request is one of the operations of a batch request; see :class:`BatchAPI`.
+BATCH_ENVIRON_KEY = 'flask_restless.batch'
+
+#: The maximum number of bound parameters in a single query issued by
+#: :func:`_get_or_create_many` and :meth:`API._get_many_by`.
+#:
+#: Some databases limit the number of parameters in a statement (SQLite, for
+#: example, allows 999 by default), so larger batches are split into several
+#: queries.
+MAX_BATCH_PARAMETERS = 500
+
+#: The media type of a :http:method:`patch` request whose body is a JSON Patch
+#: document, as described in :rfc:`6902`.
+JSON_PATCH_MIMETYPE = 'application/json-patch+json'
+
+#: The operations of a JSON Patch document supported by :meth:`API.patch`.
+JSON_PATCH_OPERATIONS = ('add', 'remove', 'replace', 'test')
+
+#: The media types of request bodies which :class:`ImportAPI` parses as
+#: newline-delimited JSON, one object per line.
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson')
+
+#: The media type of request bodies which :class:`ImportAPI` parses as CSV,
+#: with a header row containing the names of the fields.
+CSV_MIMETYPE = 'text/csv'
+
+#: Strings in a CSV file which represent the Boolean values ``True`` and
+#: ``False``, respectively.
+CSV_TRUE = frozenset(('true', 't', 'yes', 'y', '1'))
+CSV_FALSE = frozenset(('false', 'f', 'no', 'n', '0'))
+
+#: Maps the name of a database dialect to a pair of statements, the first of
+#: which makes the current transaction read-only and the second of which (if
+#: not ``None``) undoes the first before the connection is returned to its
+#: pool. SQLite has no read-only transactions, so the ``query_only`` pragma is
+#: set on the connection instead.
+READ_ONLY_STATEMENTS = {
+    'postgresql': ('SET TRANSACTION READ ONLY', None),
+    'mysql': ('SET TRANSACTION READ ONLY', None),
+    'sqlite': ('PRAGMA query_only = ON', 'PRAGMA query_only = OFF'),
+}
+
+
 def _get_or_create(session, model, **kwargs):
     """Returns the first instance of the specified model filtered by the
     keyword arguments, or creates a new instance of the model and returns that.
@@ -159,6 +308,386 @@ def _get_or_create(session, model, **kwargs):
     return instance, True
 
 
+def _find_many(session, model, dictionaries):
+    """Returns a list containing, for each dictionary in `dictionaries`, the
+    first instance of `model` whose fields have the values specified in that
+    dictionary, or ``None`` if there is no such instance.
+
+    All of the instances are retrieved with a single query (or a few queries,
+    if there are very many dictionaries; see :data:`MAX_BATCH_PARAMETERS`).
+
+    """
+    # An empty dictionary matches any instance; this is handled separately,
+    # since including it in the batched query would select the whole table.
+    nonempty = [d for d in dictionaries if d]
+    candidates = []
+    # each chunk of dictionaries must not exceed the parameter limit
+    chunksize = max(1, MAX_BATCH_PARAMETERS // max([len(d) for d in nonempty]
+                                                   or [1]))
+    for chunk in _chunks(nonempty, chunksize):
+        criteria = [sql.and_(*[getattr(model, k) == v
+                               for k, v in d.iteritems()])
+                    for d in chunk]
+        query = session_query(session, model).filter(sql.or_(*criteria))
+        candidates.extend(query.all())
+    result = []
+    for dictionary in dictionaries:
+        if not dictionary:
+            result.append(session_query(session, model).first())
+        else:
+            result.append(_first_match(candidates, dictionary))
+    return result
+
+
+def _first_match(instances, dictionary):
+    """Returns the first instance in `instances` whose fields have the values
+    specified in `dictionary`, or ``None`` if there is no such instance.
+
+    The values are compared in Python, so they must already have the types of
+    their columns; see :func:`_coerce_fields`.
+
+    """
+    for instance in instances:
+        if all(getattr(instance, k) == v for k, v in dictionary.iteritems()):
+            return instance
+    return None
+
+
+class _InsertIgnore(sql.expression.Insert):
+    """An ``INSERT`` statement which skips rows that would violate the unique
+    constraint on the columns `conflict_columns` instead of failing.
+
+    This is compiled to ``INSERT ... ON CONFLICT (<columns>) DO NOTHING``.
+    Unlike SQLite's ``INSERT OR IGNORE``, this still fails on any other
+    violation, such as of a ``NOT NULL`` or ``CHECK`` constraint. Only the
+    versions of the databases in :data:`ON_CONFLICT_VERSIONS` support it.
+
+    """
+
+    def __init__(self, table, conflict_columns, **kw):
+        super(_InsertIgnore, self).__init__(table, **kw)
+        self.conflict_columns = conflict_columns
+
+
+@compiles(_InsertIgnore)
+def _compile_insert_ignore(insert, compiler, **kw):
+    text = compiler.visit_insert(insert, **kw)
+    columns = ', '.join(compiler.preparer.format_column(column)
+                        for column in insert.conflict_columns)
+    return '%s ON CONFLICT (%s) DO NOTHING' % (text, columns)
+
+
+#: Maps the name of each dialect on which :func:`_get_or_create_many` may
+#: create instances with a single ``INSERT ... ON CONFLICT DO NOTHING``
+#: statement to the earliest version of the database which supports it.
+ON_CONFLICT_VERSIONS = {'postgresql': (9, 5), 'sqlite': (3, 24, 0)}
+
+
+def _supports_on_conflict(dialect):
+    """Returns ``True`` if and only if the database of `dialect` supports
+    ``INSERT ... ON CONFLICT DO NOTHING``; see :data:`ON_CONFLICT_VERSIONS`.
+
+    """
+    minimum = ON_CONFLICT_VERSIONS.get(dialect.name)
+    if minimum is None:
+        return False
+    if dialect.name == 'sqlite':
+        version = dialect.dbapi.sqlite_version_info
+    else:
+        version = dialect.server_version_info
+    return version is not None and tuple(version) >= minimum
+
+
+def _validates_in_python(model):
+    """Returns ``True`` if and only if creating an instance of `model` through
+    the ORM runs code which inserting a row with a SQL statement would skip: a
+    constructor other than the default one, a validator declared with
+    :func:`sqlalchemy.orm.validates`, or a ``before_insert`` or
+    ``after_insert`` listener of the mapper.
+
+    """
+    mapper = class_mapper(model)
+    init = manager_of_class(model).original_init
+    init = getattr(init, 'im_func', init)
+    if init not in (_declarative_constructor, object.__init__):
+        return True
+    return bool(mapper.validators) or bool(mapper.dispatch.before_insert) \
+        or bool(mapper.dispatch.after_insert)
+
+
+def _unique_column_sets(model):
+    """Returns a list of sets of the names of attributes of `model` which are
+    mapped to columns of a unique constraint or unique index of the table of
+    `model`.
+
+    The primary key is not included, since it is usually generated by the
+    database.
+
+    """
+    mapper = class_mapper(model)
+    table = mapper.mapped_table
+    unique = [c.columns for c in table.constraints
+              if isinstance(c, UniqueConstraint)]
+    unique += [i.columns for i in table.indexes if i.unique]
+    unique += [[c] for c in table.columns if c.unique]
+    result = []
+    for columns in unique:
+        try:
+            names = set(mapper.get_property_by_column(c).key for c in columns)
+        except UnmappedColumnError:
+            continue
+        result.append(names)
+    return result
+
+
+def _column_values(model, dictionary):
+    """Returns a dictionary mapping each key of the table of `model` to the
+    value of the corresponding attribute in `dictionary`, or ``None`` if some
+    key of `dictionary` is not the name of an attribute mapped to a single
+    column of that table.
+
+    """
+    mapper = class_mapper(model)
+    result = {}
+    for name, value in dictionary.iteritems():
+        if not mapper.has_property(name):
+            return None
+        prop = mapper.get_property(name)
+        if not isinstance(prop, ColumnProperty) or len(prop.columns) != 1 \
+                or prop.columns[0].table is not mapper.mapped_table:
+            return None
+        result[prop.columns[0].key] = value
+    return result
+
+
+def _column_types(model):
+    """Returns a dictionary mapping the name of each attribute of `model` which
+    is mapped to a single column of the table of `model` to a pair whose left
+    element is the key of that column and whose right element is the Python
+    type of the values in the column, or ``None`` if the type is unknown.
+
+    """
+    mapper = class_mapper(model)
+    result = {}
+    for prop in mapper.iterate_properties:
+        if not isinstance(prop, ColumnProperty) or len(prop.columns) != 1 \
+                or prop.columns[0].table is not mapper.mapped_table:
+            continue
+        column = prop.columns[0]
+        try:
+            pytype = column.type.python_type
+        except NotImplementedError:
+            pytype = None
+        result[prop.key] = (column.key, pytype)
+    return result
+
+
+def _convert_string(pytype, value):
+    """Returns the string `value`, as it appears in an imported file,
+    converted to `pytype`.
+
+    An empty string represents ``None``, unless `pytype` is a string type.
+    Dates and times are parsed with :func:`dateutil.parser.parse`.
+
+    Raises :exc:`ValueError` if `value` is not a valid representation of a
+    value of type `pytype`.
+
+    """
+    if pytype is None or issubclass(pytype, basestring):
+        return value
+    if not value.strip():
+        return None
+    if pytype is bool:
+        if value.strip().lower() in CSV_TRUE:
+            return True
+        if value.strip().lower() in CSV_FALSE:
+            return False
+        raise ValueError(value)
+    if pytype is datetime.datetime:
+        return parse_datetime(value)
+    if pytype is datetime.date:
+        return parse_datetime(value).date()
+    return _coerce_value(pytype, value)
+
+
+def _coerce_fields(column_types, dictionary):
+    """Returns a copy of `dictionary`, which maps names of attributes to
+    values, in which each value is converted to the Python type of the column
+    to which its attribute is mapped, as the database would convert it when
+    comparing the two.
+
+    `column_types` is the result of :func:`_column_types`. Strings are
+    converted to numbers for numeric columns (see :func:`_coerce_value`),
+    integers to strings for string columns, and :class:`datetime.datetime`
+    objects to dates for date columns. Other values, and values which cannot
+    be converted, are left unchanged.
+
+    """
+    result = dict(dictionary)
+    for name, value in dictionary.iteritems():
+        if name not in column_types:
+            continue
+        pytype = column_types[name][1]
+        if pytype is datetime.date and isinstance(value, datetime.datetime):
+            result[name] = value.date()
+            continue
+        if pytype is None or isinstance(value, pytype):
+            continue
+        if isinstance(value, basestring):
+            try:
+                result[name] = _coerce_value(pytype, value)
+            except (ValueError, OverflowError):
+                pass
+        elif isinstance(value, (int, long)) and not isinstance(value, bool) \
+                and issubclass(pytype, basestring):
+            result[name] = unicode(value)
+    return result
+
+
+def _import_row(column_types, dictionary):
+    """Returns a dictionary mapping the keys of columns to the values
+    specified in `dictionary`, which maps names of attributes to values,
+    ready to be inserted into a table; see :class:`ImportAPI`.
+
+    `column_types` is the result of :func:`_column_types`. String values are
+    converted to the types of their columns by :func:`_convert_string`.
+
+    Raises :exc:`ValueError` if a key of `dictionary` is not the name of an
+    attribute mapped to a column, or if a value cannot be converted.
+
+    """
+    row = {}
+    for name, value in dictionary.iteritems():
+        if name not in column_types:
+            raise ValueError("Model does not have field '%s'" % name)
+        key, pytype = column_types[name]
+        if isinstance(value, basestring):
+            try:
+                value = _convert_string(pytype, value)
+            except (ValueError, OverflowError):
+                raise ValueError("Invalid value for field '%s': %r" %
+                                 (name, value))
+        row[key] = value
+    return row
+
+
+def _insert_ignore_many(session, model, dictionaries):
+    """Inserts a row into the table of `model` for each dictionary in
+    `dictionaries`, skipping those rows which would violate a unique
+    constraint, and returns ``True``.
+
+    Rows are inserted with one ``INSERT`` statement for each distinct set of
+    keys among `dictionaries`, executed with many sets of parameters, in the
+    current transaction of `session`. Because conflicting rows are skipped,
+    this is safe against concurrent requests creating the same instances.
+
+    Only rows which conflict on the columns of a unique constraint which they
+    specify are skipped; any other violation raises
+    :exc:`~sqlalchemy.exc.IntegrityError` as usual.
+
+    If this is not possible, nothing is inserted and ``False`` is returned.
+    This is the case unless the database supports ``ON CONFLICT`` (see
+    :func:`_supports_on_conflict`), creating an instance of `model` runs no
+    validation in Python (see :func:`_validates_in_python`), each dictionary
+    specifies the value of each attribute of a unique constraint of the table
+    of `model` (so that duplicate instances really do conflict), and each key
+    of each dictionary is the name of an attribute mapped to a column of that
+    table.
+
+    """
+    mapper = class_mapper(model)
+    bind = session.get_bind(mapper)
+    if not _supports_on_conflict(bind.dialect) or _validates_in_python(model):
+        return False
+    unique = _unique_column_sets(model)
+    if not all(any(names <= set(d) for names in unique)
+               for d in dictionaries):
+        return False
+    rows = [_column_values(model, d) for d in dictionaries]
+    if None in rows:
+        return False
+    groups = defaultdict(list)
+    for dictionary, row in zip(dictionaries, rows):
+        groups[frozenset(dictionary)].append(row)
+    for names, group in groups.iteritems():
+        # the conflict target is a unique constraint which each row specifies
+        target = [n for n in unique if n <= names][0]
+        columns = [mapper.get_property(name).columns[0]
+                   for name in sorted(target)]
+        # an inline statement does not need to return the generated primary
+        # key, so that it can be executed with many sets of parameters at once
+        statement = _InsertIgnore(mapper.mapped_table, columns, inline=True)
+        session.execute(statement, group, mapper=mapper)
+    return True
+
+
+def _get_or_create_many(session, model, dictionaries, create=True):
+    """Returns a list containing, for each dictionary in `dictionaries`, the
+    first instance of `model` whose fields have the values specified in that
+    dictionary.
+
+    This is a batched version of :func:`_get_or_create`: all of the existing
+    instances are retrieved with a single query (see :func:`_find_many`), and
+    all of the new instances are created together.
+
+    If no instance matches a dictionary and `create` is ``True``, a new
+    instance of `model` is created with the fields specified in the dictionary.
+    Identical dictionaries yield the same new instance. If `create` is
+    ``False``, the list contains ``None`` in place of such an instance.
+
+    Where possible (see :func:`_insert_ignore_many`), new instances are
+    created with a single ``INSERT`` statement which skips rows violating a
+    unique constraint, and then retrieved with a single query; this way, an
+    instance created by a concurrent request in the meantime is used instead
+    of causing an :exc:`~sqlalchemy.exc.IntegrityError`. Otherwise, the new
+    instances are added to the session and flushed together.
+
+    `session` is the session in which all database transactions are made.
+
+    `model` is the SQLAlchemy model to get or create.
+
+    `dictionaries` is a list of dictionaries mapping field name to value. Date
+    and time values may be given as strings; see :func:`_strings_to_dates`.
+    Other values are converted to the types of their columns (see
+    :func:`_coerce_fields`), so that they compare equal to the values of the
+    instances which the database matched with them.
+
+    """
+    column_types = _column_types(model)
+    dictionaries = [_coerce_fields(column_types, _strings_to_dates(
+        model, unicode_keys_to_strings(d))) for d in dictionaries]
+    result = _find_many(session, model, dictionaries)
+    if not create:
+        return result
+    missing = [i for i, instance in enumerate(result) if instance is None]
+    if not missing:
+        return result
+    distinct = []
+    for i in missing:
+        if dictionaries[i] not in distinct:
+            distinct.append(dictionaries[i])
+    if _insert_ignore_many(session, model, distinct):
+        found = _find_many(session, model, [dictionaries[i] for i in missing])
+        for i, instance in zip(missing, found):
+            result[i] = instance
+        missing = [i for i in missing if result[i] is None]
+    # Create the remaining instances through the session; this also happens
+    # when a row was skipped by the statement above because it conflicted
+    # with a row having different values for other fields, so that the
+    # resulting IntegrityError is reported as before.
+    created = []
+    for i in missing:
+        instance = _first_match(created, dictionaries[i])
+        if instance is None:
+            instance = model(**dictionaries[i])
+            session.add(instance)
+            created.append(instance)
+        result[i] = instance
+    if created:
+        session.flush()
+    return result
+
+
 def _primary_key_name(model_or_instance):
     """Returns the name of the primary key of the specified model or instance
     of a model, as a string.
@@ -176,6 +705,215 @@ def _primary_key_name(model_or_instance):
     return 'id' if 'id' in primary_key_names else primary_key_names[0]
 
 
+#: Maps a model class to a list containing, for each of the columns of its
+#: primary key, a pair whose left element is the name of the attribute of the
+#: model which maps that column and whose right element is the Python type of
+#: the values of that column (or ``None`` if the type is unknown).
+#:
+#: This is filled lazily by :func:`_primary_key_columns`, since computing it
+#: requires inspecting the mapper of the model on each request otherwise.
+_PRIMARY_KEY_COLUMNS = WeakKeyDictionary()
+
+
+def _primary_key_columns(model):
+    """Returns a list of pairs describing the columns of the primary key of
+    `model`, in the order in which they appear in the mapper (which is the
+    order expected by :meth:`sqlalchemy.orm.query.Query.get`).
+
+    The left element of each pair is the name of the attribute which maps the
+    column and the right element is the Python type of the values in the
+    column, or ``None`` if the Python type is unknown.
+
+    The result is cached, so calling this function repeatedly on the same model
+    is cheap.
+
+    """
+    try:
+        return _PRIMARY_KEY_COLUMNS[model]
+    except KeyError:
+        pass
+    mapper = class_mapper(model)
+    columns = []
+    for column in mapper.primary_key:
+        name = mapper.get_property_by_column(column).key
+        try:
+            pytype = column.type.python_type
+        except NotImplementedError:
+            pytype = None
+        columns.append((name, pytype))
+    _PRIMARY_KEY_COLUMNS[model] = columns
+    return columns
+
+
+def _coerce_value(pytype, value):
+    """Returns the string `value` converted to `pytype`, if `pytype` is a
+    numeric type, or `value` itself otherwise.
+
+    Raises :exc:`ValueError` if `value` is not a valid representation of a
+    value of type `pytype`.
+
+    """
+    if pytype in (int, long, float):
+        return pytype(value)
+    if pytype is decimal.Decimal:
+        try:
+            return decimal.Decimal(value)
+        except decimal.InvalidOperation:
+            raise ValueError(value)
+    return value
+
+
+def _coerce_primary_key(model, value):
+    """Returns `value`, which is a string as provided in the URL of a request,
+    converted to the Python type of the primary key of `model`.
+
+    Comparing a column to a value of the same type allows the database to use
+    the index on the primary key. If `value` is not a string, or if the type of
+    the primary key is not numeric, `value` is returned unchanged.
+
+    If `model` has a composite primary key, `value` must be either a string
+    containing the value of each column of the primary key separated by commas
+    (for example, ``'1,foo'``) or a sequence of those values, in the order of
+    the columns in the mapper. In this case, a tuple containing each of the
+    coerced values is returned.
+
+    Raises :exc:`ValueError` if `value` is not a valid representation of a
+    value of the type of the primary key (for example, if the primary key is
+    an integer but `value` is ``'foo'``). In that case, no instance of `model`
+    can have `value` as its primary key.
+
+    """
+    columns = _primary_key_columns(model)
+    if len(columns) == 1:
+        if not isinstance(value, basestring):
+            return value
+        return _coerce_value(columns[0][1], value)
+    if isinstance(value, basestring):
+        value = value.split(',')
+    if not isinstance(value, (list, tuple)) or len(value) != len(columns):
+        raise ValueError(value)
+    return tuple(_coerce_value(pytype, v) if isinstance(v, basestring) else v
+                 for (name, pytype), v in zip(columns, value))
+
+
+def _primary_key_value(instance):
+    """Returns the value of the primary key of the specified instance of a
+    model, or a tuple containing the value of each column of the primary key if
+    the model has a composite primary key.
+
+    """
+    columns = _primary_key_columns(type(instance))
+    values = tuple(getattr(instance, name) for name, pytype in columns)
+    return values[0] if len(values) == 1 else values
+
+
+def _version_attribute(model):
+    """Returns the name of the attribute of `model` which holds the version
+    counter configured with the ``version_id_col`` argument of its mapper, or
+    ``None`` if `model` is not versioned.
+
+    """
+    mapper = class_mapper(model)
+    if mapper.version_id_col is None:
+        return None
+    return mapper.get_property_by_column(mapper.version_id_col).key
+
+
+def _deletes_cascade(model):
+    """Returns ``True`` if and only if the ORM does more than delete the row
+    of an instance of `model` when the instance is deleted.
+
+    This is the case if `model` inherits from a mapped class, or if it has a
+    relationship which cascades deletes or deletes orphans, or which (unless
+    it is configured with ``passive_deletes``) updates or deletes the rows
+    which refer to the deleted instance. A bulk SQL ``DELETE`` statement would
+    skip all of these.
+
+    """
+    mapper = class_mapper(model)
+    if mapper.inherits is not None:
+        return True
+    for prop in mapper.iterate_properties:
+        if not isinstance(prop, RelationshipProperty):
+            continue
+        if prop.cascade.delete or prop.cascade.delete_orphan:
+            return True
+        if prop.direction in (ONETOMANY, MANYTOMANY) and \
+                not prop.passive_deletes:
+            return True
+    return False
+
+
+def _same_value(old, new):
+    """Returns ``True`` if and only if setting a field whose value is `old` to
+    `new` would leave it unchanged.
+
+    Values which cannot be compared (for example, a naive and an aware
+    :class:`datetime.datetime`) are considered different.
+
+    """
+    try:
+        return old == new
+    except TypeError:
+        return False
+
+
+def _parse_pointer(pointer):
+    """Returns the list of reference tokens of the JSON Pointer `pointer`, as
+    described in :rfc:`6901`.
+
+    Raises :exc:`ValueError` if `pointer` is not a string beginning with
+    ``'/'``.
+
+    """
+    if not isinstance(pointer, basestring) or not pointer.startswith('/'):
+        raise ValueError('Invalid JSON Pointer: %r' % (pointer, ))
+    return [token.replace('~1', '/').replace('~0', '~')
+            for token in pointer[1:].split('/')]
+
+
+def _patched_fields(operations):
+    """Returns the set of names of the fields which are the targets of the
+    operations in the JSON Patch document `operations`.
+
+    Raises :exc:`ValueError` if `operations` is not a list of operations whose
+    names are in :data:`JSON_PATCH_OPERATIONS`, each of which has a valid
+    ``path`` and, unless it is a ``remove`` operation, a ``value``.
+
+    """
+    if not isinstance(operations, list):
+        raise ValueError('JSON Patch document must be a list')
+    fields = set()
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise ValueError('JSON Patch operation must be an object')
+        op = operation.get('op')
+        if op not in JSON_PATCH_OPERATIONS:
+            raise ValueError('Unsupported JSON Patch operation: %r' % (op, ))
+        if op != 'remove' and 'value' not in operation:
+            raise ValueError("JSON Patch operation '%s' requires a value" % op)
+        fields.add(_parse_pointer(operation.get('path'))[0])
+    return fields
+
+
+def _count(query, bind):
+    """Returns the number of rows matched by `query`, executed in a new session
+    bound to the engine `bind`.
+
+    This function is called on the threads of the pool given as the
+    `query_executor` of :class:`API`, so it must not use the session in which
+    `query` was created. For the same reason, `bind` must not be a
+    connection, since the connection of a session is used by the thread of
+    the request while the count is executed.
+
+    """
+    session = Session(bind=bind)
+    try:
+        return query.with_session(session).count()
+    finally:
+        session.close()
+
+
 # This code was adapted from :meth:`elixir.entity.Entity.to_dict` and
 # http://stackoverflow.com/q/1958219/108197.
 def _to_dict(instance, deep=None):
@@ -341,6 +1079,7 @@ class ModelView(MethodView):
         super(ModelView, self).__init__(*args, **kw)
         self.session = session
         self.model = model
+        self.timer = PhaseTimer()
 
     def query(self, model=None):
         """Returns either a SQLAlchemy query or Flask-SQLAlchemy query object
@@ -351,6 +1090,124 @@ class ModelView(MethodView):
         """
         return session_query(self.session, model or self.model)
 
+    #: Whether :http:method:`get` requests are handled in read-only
+    #: transactions; see :meth:`_begin_read_only`.
+    read_only = False
+
+    #: A function called with the model, the method, and the phases measured
+    #: by :attr:`timer` after each request on which phases were measured, or
+    #: ``None``; see :meth:`dispatch_request`.
+    timing_hook = None
+
+    #: Whether responses to requests on which phases were measured have a
+    #: ``Server-Timing`` header.
+    server_timing = False
+
+    #: The :class:`~flask.ext.restless.counting.StatementCounter` which counts
+    #: the SQL statements executed while handling each request, or ``None``.
+    statement_counter = None
+
+    #: The :class:`~flask.ext.restless.profiling.RequestProfiler` which
+    #: profiles the requests which carry its header, or ``None``.
+    profiler = None
+
+    def dispatch_request(self, *args, **kw):
+        """Dispatches the request to the method of this view which handles it.
+
+        If that method measured the phases of handling the request with
+        :attr:`timer`, the time since the end of the last phase is attributed
+        to encoding the response, and the phases are reported to
+        :attr:`timing_hook`, to the receivers of the
+        :data:`~flask.ext.restless.timing.request_timed` signal, and (if
+        :attr:`server_timing` is ``True``) in the ``Server-Timing`` header of
+        the response.
+
+        If :attr:`statement_counter` is not ``None``, it counts the SQL
+        statements executed while the request is dispatched. If
+        :attr:`profiler` is not ``None``, it profiles the dispatch if the
+        request asks for it.
+
+        The phases and the statements are reported even if the method raises
+        an exception (for example, by aborting with :http:statuscode:`404`),
+        since those requests are often the ones worth diagnosing.
+
+        """
+        counter = self.statement_counter
+        if counter is not None:
+            counter.begin()
+        dispatch = super(ModelView, self).dispatch_request
+        response = None
+        try:
+            if self.profiler is not None:
+                response = self.profiler.profile(self.model, dispatch, *args,
+                                                 **kw)
+            else:
+                response = dispatch(*args, **kw)
+        finally:
+            if self.timer.phases:
+                if response is not None:
+                    self.timer.lap('encode')
+                phases = self.timer.phases
+                if self.timing_hook is not None:
+                    self.timing_hook(self.model, request.method, phases)
+                request_timed.send(current_app._get_current_object(),
+                                   model=self.model, method=request.method,
+                                   phases=phases)
+                if self.server_timing and response is not None:
+                    response.headers['Server-Timing'] = \
+                        self.timer.server_timing()
+            if counter is not None:
+                counter.end(response)
+        return response
+
+    def _begin_read_only(self):
+        """Begins a new read-only transaction in the session, if
+        :attr:`read_only` is ``True``.
+
+        Any transaction already in progress in the session is rolled back
+        first, and autoflush is disabled until :meth:`_end_read_only` is
+        called, since there should be nothing to flush. The statement which
+        makes the transaction read-only is chosen from
+        :data:`READ_ONLY_STATEMENTS` according to the dialect of the database
+        on which the queries of this model are executed; on other databases
+        the transaction is an ordinary one which is simply ended early.
+
+        Operations of batch requests are left alone, since they share the
+        transaction of the batch.
+
+        """
+        if not self.read_only or request.environ.get(BATCH_ENVIRON_KEY):
+            return
+        self.session.rollback()
+        self._autoflush = self.session.autoflush
+        self.session.autoflush = False
+        connection = self.session.connection(mapper=class_mapper(self.model))
+        begin, end = READ_ONLY_STATEMENTS.get(connection.dialect.name,
+                                              (None, None))
+        if begin is not None:
+            connection.execute(begin)
+        self._read_only_end = (connection, end)
+
+    def _end_read_only(self):
+        """Ends the read-only transaction begun by :meth:`_begin_read_only`,
+        if there is one.
+
+        This is called as soon as the requested instances have been loaded and
+        converted to dictionaries, so that the transaction (and any locks or
+        snapshot it holds) does not last while the response is postprocessed
+        and encoded. It may safely be called more than once.
+
+        """
+        connection, end = self.__dict__.pop('_read_only_end', (None, None))
+        if connection is None:
+            return
+        try:
+            if end is not None:
+                connection.execute(end)
+        finally:
+            self.session.rollback()
+            self.session.autoflush = self._autoflush
+
 
 class FunctionAPI(ModelView):
     """Provides method-based dispatching for :http:method:`get` requests which
@@ -360,6 +1217,25 @@ class FunctionAPI(ModelView):
 
     """
 
+    def __init__(self, session, model, read_only=False, timing_hook=None,
+                 server_timing=False, statement_counter=None, profiler=None,
+                 *args, **kw):
+        """Instantiates this view with the specified attributes.
+
+        If `read_only` is ``True``, the functions are evaluated in a read-only
+        transaction; for more information, see :ref:`readonly`.
+
+        `timing_hook`, `server_timing`, `statement_counter`, and `profiler` are
+        as described in :class:`API`.
+
+        """
+        super(FunctionAPI, self).__init__(session, model, *args, **kw)
+        self.read_only = read_only
+        self.timing_hook = timing_hook
+        self.server_timing = server_timing
+        self.statement_counter = statement_counter
+        self.profiler = profiler
+
     def get(self):
         """Returns the result of evaluating the SQL functions specified in the
         body of the request.
@@ -372,9 +1248,13 @@ class FunctionAPI(ModelView):
             data = json.loads(request.args.get('q')) or {}
         except (TypeError, ValueError, OverflowError):
             return jsonify_status_code(400, message='Unable to decode data')
+        self.timer.lap('parse')
+        self._begin_read_only()
         try:
             result = _evaluate_functions(self.session, self.model,
                                          data.get('functions'))
+            self._end_read_only()
+            self.timer.lap('execute')
             if not result:
                 return jsonify_status_code(204)
             return jsonpify(result)
@@ -384,6 +1264,8 @@ class FunctionAPI(ModelView):
         except OperationalError, exception:
             message = 'No such function "%s"' % exception.function
             return jsonify_status_code(400, message=message)
+        finally:
+            self._end_read_only()
 
 
 class API(ModelView):
@@ -397,7 +1279,12 @@ class API(ModelView):
     def __init__(self, session, model, validation_exceptions=None,
                  results_per_page=10, max_results_per_page=100,
                  post_form_preprocessor=None, preprocessors=None,
-                 postprocessors=None, *args, **kw):
+                 postprocessors=None, missing_cache=None,
+                 allow_post_many=False, return_minimal=False,
+                 select_for_update=False, writer=None, coordinator=None,
+                 read_only=False, query_executor=None, timing_hook=None,
+                 server_timing=False, statement_counter=None, profiler=None,
+                 *args, **kw):
         """Instantiates this view with the specified attributes.
 
         `session` is the SQLAlchemy session in which all database transactions
@@ -454,6 +1341,73 @@ class API(ModelView):
         other code. For more information on preprocessors and postprocessors,
         see :ref:`processors`.
 
+        `missing_cache` is a :class:`~flask.ext.restless.helpers.MissingInstanceCache`
+        which remembers the primary keys of instances which were requested but
+        do not exist, or ``None`` if every request should query the database.
+        The cache must be created outside of this class, since a new instance
+        of this class is created for each request. For more information, see
+        :ref:`missingcache`.
+
+        If `allow_post_many` is ``True``, :http:method:`post` requests may
+        contain a list of objects, each of which describes a new instance of the
+        model. All of these instances are created in a single transaction. For
+        more information, see :ref:`allowpostmany`.
+
+        If `return_minimal` is ``True``, responses to :http:method:`post` and
+        :http:method:`patch` requests for a single instance contain only the
+        primary key of the instance instead of its full representation, unless
+        the request includes the header ``Prefer: return=representation``.
+        Otherwise, a request may ask for this with the header ``Prefer:
+        return=minimal``. For more information, see :ref:`returnminimal`.
+
+        If `select_for_update` is ``True``, the instance updated by a
+        :http:method:`patch` request is selected with ``SELECT ... FOR
+        UPDATE``, so that concurrent requests updating the same instance are
+        serialized by the database.
+
+        `writer` is a :class:`~flask.ext.restless.writer.BatchWriter` which
+        creates the instances described by :http:method:`post` requests in the
+        background, or ``None`` if they should be created before responding.
+        Like `missing_cache`, it must be created outside of this class. For
+        more information, see :ref:`writebehind`.
+
+        `coordinator` is a
+        :class:`~flask.ext.restless.writer.CommitCoordinator` which applies and
+        commits the changes made by :http:method:`post` requests and by
+        :http:method:`patch` and :http:method:`delete` requests for a single
+        instance, in transactions shared with other concurrent requests, or
+        ``None`` if each request should commit its own changes. Like
+        `missing_cache`, it must be created outside of this class. For more
+        information, see :ref:`groupcommit`.
+
+        If `read_only` is ``True``, :http:method:`get` requests are handled in
+        short read-only transactions which end as soon as the requested
+        instances have been loaded. For more information, see :ref:`readonly`.
+
+        `query_executor` is a pool of threads (an object with an
+        ``apply_async(func, args)`` method, such as a
+        :class:`multiprocessing.pool.ThreadPool`) on which the query counting
+        the results of a search is executed while the page of results is
+        loaded, or ``None`` if the two queries should be executed one after
+        the other. For more information, see :ref:`concurrentqueries`.
+
+        `timing_hook` is a function which, after each :http:method:`get`
+        request, is called with the model, the method of the request, and the
+        list of pairs of phase name and duration in seconds of handling the
+        request (see :class:`~flask.ext.restless.timing.PhaseTimer`). If
+        `server_timing` is ``True``, the responses to those requests include
+        the durations in a ``Server-Timing`` header. For more information, see
+        :ref:`timing`.
+
+        `statement_counter` is a
+        :class:`~flask.ext.restless.counting.StatementCounter` which counts the
+        SQL statements executed while handling each request, or ``None``. For
+        more information, see :ref:`statementcounting`.
+
+        `profiler` is a :class:`~flask.ext.restless.profiling.RequestProfiler`
+        which profiles the requests which carry its secret header, or
+        ``None``. For more information, see :ref:`profiling`.
+
         .. versionchanged:: 0.10.0
            Removed `authentication_required_for` and `authentication_function`
            as well as the `include_columns` and `exclude_columns` keyword
@@ -463,6 +1417,12 @@ class API(ModelView):
            instead. For more information, see :ref:`authentication` and
            :ref:`includes` for more information.
 
+        .. versionadded:: 0.10.0
+           Added the `missing_cache`, `allow_post_many`, `return_minimal`,
+           `select_for_update`, `writer`, `coordinator`, `read_only`,
+           `query_executor`, `timing_hook`, `server_timing`,
+           `statement_counter`, and `profiler` keyword arguments.
+
         .. versionadded:: 0.9.2
            Added the `preprocessors` and `postprocessors` keyword arguments.
 
@@ -488,6 +1448,19 @@ class API(ModelView):
         self.validation_exceptions = tuple(validation_exceptions or ())
         self.results_per_page = results_per_page
         self.max_results_per_page = max_results_per_page
+        self.missing_cache = missing_cache
+        self.allow_post_many = allow_post_many
+        self.return_minimal = return_minimal
+        self.select_for_update = select_for_update
+        self.writer = writer
+        self.coordinator = coordinator
+        self.read_only = read_only
+        self.query_executor = query_executor
+        self.timing_hook = timing_hook
+        self.server_timing = server_timing
+        self.statement_counter = statement_counter
+        self.profiler = profiler
+        self.version_attribute = _version_attribute(model)
         self.postprocessors = defaultdict(list)
         self.preprocessors = defaultdict(list)
         self.postprocessors.update(upper_keys(postprocessors or {}))
@@ -510,55 +1483,79 @@ class API(ModelView):
         for preprocessor in self.preprocessors['PUT_MANY']:
             self.preprocessors['PATCH_MANY'].append(preprocessor)
 
-    def _add_to_relation(self, query, relationname, toadd=None):
-        """Adds a new or existing related model to each model specified by
-        `query`.
+    def _resolve_related(self, submodel, dictionaries, create=True):
+        """Returns a list containing, for each dictionary in `dictionaries`, the
+        instance of `submodel` which it represents.
+
+        If a dictionary contains the key ``'id'``, the instance is the one
+        whose primary key has that value (or ``None`` if no such instance
+        exists). Otherwise, the instance is the first one whose fields have the
+        values specified in the dictionary; if no such instance exists and
+        `create` is ``True``, a new one is created.
+
+        All of the instances specified by primary key are retrieved with a
+        single query, and all of the instances specified by their fields are
+        retrieved with another one; see :meth:`_get_many_by` and
+        :func:`_get_or_create_many`.
+
+        """
+        result = [None] * len(dictionaries)
+        by_id = [(i, d) for i, d in enumerate(dictionaries) if 'id' in d]
+        by_fields = [(i, d) for i, d in enumerate(dictionaries)
+                     if 'id' not in d]
+        if by_id:
+            ids = [d['id'] for i, d in by_id]
+            for (i, d), inst in zip(by_id, self._get_many_by(ids, submodel)):
+                result[i] = inst
+        if by_fields:
+            found = _get_or_create_many(self.session, submodel,
+                                        [d for i, d in by_fields], create)
+            for (i, d), inst in zip(by_fields, found):
+                result[i] = inst
+        return result
+
+    def _add_to_relation(self, instances, relationname, toadd=None):
+        """Adds a new or existing related model to each model in `instances`.
 
         This function does not commit the changes made to the database. The
         calling function has that responsibility.
 
-        `query` is a SQLAlchemy query instance that evaluates to all instances
-        of the model specified in the constructor of this class that should be
-        updated.
+        `instances` is a list of instances of the model specified in the
+        constructor of this class that should be updated.
 
         `relationname` is the name of a one-to-many relationship which exists
-        on each model specified in `query`.
+        on each model in `instances`.
 
         `toadd` is a list of dictionaries, each representing the attributes of
         an existing or new related model to add. If a dictionary contains the
         key ``'id'``, that instance of the related model will be
-        added. Otherwise, the
-        :classmethod:`~flask.ext.restless.model.get_or_create` class method
-        will be used to get or create a model to add.
+        added. Otherwise, an existing instance with the specified attributes
+        will be added, or created if no such instance exists. All of the
+        related instances are resolved at once; see :meth:`_resolve_related`.
 
         """
         submodel = get_related_model(self.model, relationname)
         if isinstance(toadd, dict):
             toadd = [toadd]
-        for dictionary in toadd or []:
-            if 'id' in dictionary:
-                subinst = self._get_by(dictionary['id'], submodel)
-            else:
-                kw = unicode_keys_to_strings(dictionary)
-                subinst = _get_or_create(self.session, submodel, **kw)[0]
-            try:
-                for instance in query:
+        subinsts = self._resolve_related(submodel, toadd or [])
+        for instance in instances:
+            for subinst in subinsts:
+                try:
                     getattr(instance, relationname).append(subinst)
-            except AttributeError:
-                setattr(instance, relationname, subinst)
+                except AttributeError:
+                    setattr(instance, relationname, subinst)
 
-    def _remove_from_relation(self, query, relationname, toremove=None):
-        """Removes a related model from each model specified by `query`.
+    def _remove_from_relation(self, instances, relationname, toremove=None):
+        """Removes a related model from each model in `instances`.
 
         This function does not commit the changes made to the database. The
         calling function has that responsibility.
 
-        `query` is a SQLAlchemy query instance that evaluates to all instances
-        of the model specified in the constructor of this class that should be
-        updated.
+        `instances` is a list of instances of the model specified in the
+        constructor of this class that should be updated.
 
         `relationname` is the name of a one-to-many relationship which exists
-        on each model specified in `query`.
+        on each model in `instances`.
 
         `toremove` is a list of dictionaries, each representing the attributes
         of an existing model to remove. If a dictionary contains the key
@@ -570,58 +1567,47 @@ class API(ModelView):
 
         If one of the dictionaries contains a mapping from ``'__delete__'`` to
         ``True``, then the removed object will be deleted after being removed
-        from each instance of the model in the specified query.
+        from each instance of the model in `instances`.
 
         """
         submodel = get_related_model(self.model, relationname)
-        for dictionary in toremove or []:
-            remove = dictionary.pop('__delete__', False)
-            if 'id' in dictionary:
-                subinst = self._get_by(dictionary['id'], submodel)
-            else:
-                kw = unicode_keys_to_strings(dictionary)
-                subinst = self.query(submodel).filter_by(**kw).first()
-            for instance in query:
+        toremove = toremove or []
+        deletes = [d.pop('__delete__', False) for d in toremove]
+        subinsts = self._resolve_related(submodel, toremove, create=False)
+        for subinst, remove in zip(subinsts, deletes):
+            for instance in instances:
                 getattr(instance, relationname).remove(subinst)
             if remove:
                 self.session.delete(subinst)
 
-    def _set_on_relation(self, query, relationname, toset=None):
+    def _set_on_relation(self, instances, relationname, toset=None):
         """Sets the value of the relation specified by `relationname` on each
-        instance specified by `query` to have the new or existing related
-        models specified by `toset`.
+        instance in `instances` to have the new or existing related models
+        specified by `toset`.
 
         This function does not commit the changes made to the database. The
         calling function has that responsibility.
 
-        `query` is a SQLAlchemy query instance that evaluates to all instances
-        of the model specified in the constructor of this class that should be
-        updated.
+        `instances` is a list of instances of the model specified in the
+        constructor of this class that should be updated.
 
         `relationname` is the name of a one-to-many relationship which exists
-        on each model specified in `query`.
+        on each model in `instances`.
 
         `toset` is a list of dictionaries, each representing the attributes of
         an existing or new related model to set. If a dictionary contains the
         key ``'id'``, that instance of the related model will be added.
-        Otherwise, the :classmethod:`~flask.ext.restless.model.get_or_create`
-        class method will be used to get or create a model to set.
+        Otherwise, an existing instance with the specified attributes will be
+        added, or created if no such instance exists. All of the related
+        instances are resolved at once; see :meth:`_resolve_related`.
 
         """
         submodel = get_related_model(self.model, relationname)
-        subinst_list = []
-        for dictionary in toset or []:
-            if 'id' in dictionary:
-                subinst = self._get_by(dictionary['id'], submodel)
-            else:
-                kw = unicode_keys_to_strings(dictionary)
-                subinst = _get_or_create(self.session, submodel, **kw)[0]
-            subinst_list.append(subinst)
-        for instance in query:
+        subinst_list = self._resolve_related(submodel, toset or [])
+        for instance in instances:
             setattr(instance, relationname, subinst_list)
 
-    # TODO change this to have more sensible arguments
-    def _update_relations(self, query, params):
+    def _update_relations(self, instances, params):
         """Adds, removes, or sets models which are related to the model
         specified in the constructor of this class.
 
@@ -631,9 +1617,9 @@ class API(ModelView):
         This method returns a :class:`frozenset` of strings representing the
         names of relations which were modified.
 
-        `query` is a SQLAlchemy query instance that evaluates to all instances
-        of the model specified in the constructor of this class that should be
-        updated.
+        `instances` is an iterable (for example, a list or a SQLAlchemy query)
+        of all instances of the model specified in the constructor of this
+        class that should be updated. It is evaluated at most once.
 
         `params` is a dictionary containing a mapping from name of the relation
         to modify (as a string) to either a list or another dictionary. In the
@@ -659,18 +1645,182 @@ class API(ModelView):
         """
         relations = get_relations(self.model)
         tochange = frozenset(relations) & frozenset(params)
+        if not tochange:
+            return tochange
+        instances = list(instances)
         for columnname in tochange:
             if isinstance(params[columnname], list):
                 toset = params[columnname]
-                self._set_on_relation(query, columnname, toset=toset)
+                self._set_on_relation(instances, columnname, toset=toset)
             else:
                 toadd = params[columnname].get('add', [])
                 toremove = params[columnname].get('remove', [])
-                self._add_to_relation(query, columnname, toadd=toadd)
-                self._remove_from_relation(query, columnname,
+                self._add_to_relation(instances, columnname, toadd=toadd)
+                self._remove_from_relation(instances, columnname,
                                            toremove=toremove)
         return tochange
 
+    def _set_fields(self, instance, fields):
+        """Sets the fields of `instance` to the values specified in the
+        dictionary `fields`, and returns ``True`` if and only if at least one
+        of them changed.
+
+        A field whose current value is equal to the new one is not assigned,
+        so it is not marked as modified in the session, and the ``UPDATE``
+        statement emitted when the session is flushed includes only the columns
+        which actually changed.
+
+        This function does not commit the changes made to the database. The
+        calling function has that responsibility.
+
+        """
+        changed = False
+        # Special case: if there are any dates, convert the string form of the
+        # date into an instance of the Python ``datetime`` object.
+        fields = self._strings_to_dates(fields)
+        # Compare the values as the database would store them, so that, for
+        # example, the string "1" does not differ from the integer 1.
+        coerced = _coerce_fields(_column_types(self.model), fields)
+        for field, value in fields.iteritems():
+            if not _same_value(getattr(instance, field), coerced[field]):
+                setattr(instance, field, value)
+                changed = True
+        return changed
+
+    def _related_instance(self, relationname, dictionary):
+        """Returns the related instance for the relation `relationname`
+        represented by `dictionary`, as described in :meth:`_resolve_related`.
+
+        Raises :exc:`ProcessingException` if `dictionary` specifies the primary
+        key of an instance which does not exist.
+
+        """
+        if not isinstance(dictionary, dict):
+            msg = 'Related instance must be an object'
+            raise ProcessingException(message=msg)
+        submodel = get_related_model(self.model, relationname)
+        subinst = self._resolve_related(submodel, [dictionary])[0]
+        if subinst is None:
+            msg = 'No related instance with id %s' % dictionary['id']
+            raise ProcessingException(message=msg)
+        return subinst
+
+    def _patch_relation(self, instance, relationname, tokens, operation):
+        """Applies the JSON Patch `operation`, whose path refers to the
+        relation `relationname` of `instance` followed by the reference tokens
+        `tokens`, to that relation.
+
+        The path of an ``add`` operation may end with ``-`` (to append a
+        related instance) or with an index in the collection of related
+        instances (to insert it before that index). The path of a ``remove``
+        or ``replace`` operation may end with an index, or refer to the whole
+        relation. Related instances are represented as in
+        :meth:`_update_relations`. ``test`` operations are not supported on
+        relations.
+
+        """
+        op = operation['op']
+        value = operation.get('value')
+        if op == 'test' or len(tokens) > 1:
+            msg = "Unsupported JSON Patch operation on relation '%s'"
+            raise ProcessingException(message=msg % relationname)
+        if not tokens:
+            if op == 'remove':
+                value = [] if hasattr(getattr(instance, relationname),
+                                      'append') else None
+            if isinstance(value, list):
+                self._set_on_relation([instance], relationname, toset=value)
+            elif value is None:
+                setattr(instance, relationname, None)
+            else:
+                setattr(instance, relationname,
+                        self._related_instance(relationname, value))
+            return
+        collection = getattr(instance, relationname)
+        if not hasattr(collection, 'append'):
+            msg = "Relation '%s' is not a collection" % relationname
+            raise ProcessingException(message=msg)
+        if op == 'add' and tokens[0] == '-':
+            collection.append(self._related_instance(relationname, value))
+            return
+        try:
+            index = int(tokens[0])
+        except ValueError:
+            index = -1
+        if not 0 <= index <= len(collection) - (op != 'add'):
+            msg = "Invalid index '%s' in relation '%s'" % (tokens[0],
+                                                           relationname)
+            raise ProcessingException(message=msg)
+        if op == 'add':
+            collection.insert(index, self._related_instance(relationname,
+                                                            value))
+        elif op == 'remove':
+            collection.pop(index)
+        else:
+            collection[index] = self._related_instance(relationname, value)
+
+    def _apply_patch_document(self, instance, operations):
+        """Applies the operations of the JSON Patch document `operations` (as
+        described in :rfc:`6902`) to `instance`, in order, and returns ``True``
+        if and only if `instance` was changed.
+
+        The first reference token of the path of each operation is the name of
+        a field of the model. ``add`` and ``replace`` set a column to the
+        specified value, ``remove`` sets it to ``None``, and ``test`` compares
+        it with the specified value. Operations on relations are described in
+        :meth:`_patch_relation`.
+
+        `operations` must already have been validated by
+        :func:`_patched_fields`.
+
+        Raises :exc:`ProcessingException` with :http:statuscode:`400` if an
+        operation cannot be applied, or with :http:statuscode:`409` if a
+        ``test`` operation fails. In that case, some of the operations may
+        already have been applied to `instance`.
+
+        This function does not commit the changes made to the database. The
+        calling function has that responsibility.
+
+        """
+        relations = frozenset(get_relations(self.model))
+        changed = False
+        for operation in operations:
+            op = operation['op']
+            tokens = _parse_pointer(operation['path'])
+            field = tokens[0]
+            if field in relations:
+                self._patch_relation(instance, field, tokens[1:], operation)
+                changed = changed or op != 'test'
+                continue
+            if len(tokens) > 1:
+                msg = "Cannot apply JSON Patch operation inside field '%s'"
+                raise ProcessingException(message=msg % field)
+            value = operation.get('value')
+            if op == 'test':
+                value = self._strings_to_dates({field: value})[field]
+                if not _same_value(getattr(instance, field), value):
+                    msg = "Test of field '%s' failed" % field
+                    raise ProcessingException(message=msg, status_code=409)
+            else:
+                changed = self._set_fields(instance, {field: value}) or changed
+        return changed
+
+    def _apply_update(self, instance, data):
+        """Updates `instance` as specified by the (preprocessed) request data
+        `data`, which is either a mapping from field name to new value or a
+        JSON Patch document, and returns ``True`` if and only if `instance` was
+        changed.
+
+        This function does not commit the changes made to the database. The
+        calling function has that responsibility.
+
+        """
+        if isinstance(data, list):
+            return self._apply_patch_document(instance, data)
+        relations = self._update_relations([instance], data)
+        fields = dict((k, v) for k, v in data.iteritems() if k not in relations)
+        return self._set_fields(instance, fields) or bool(relations)
+
     def _handle_validation_exception(self, exception):
         """Rolls back the session, extracts validation error messages, and
         returns a :func:`flask.jsonify` response with :http:statuscode:`400`
@@ -691,30 +1841,10 @@ class API(ModelView):
         in the ``validation_exceptions`` keyword argument in the constructor of
         this class.
 
-        Since the type of the exception is provided by the user in the
-        constructor of this class, we don't know for sure where the validation
-        error messages live inside `exception`. Therefore this method simply
-        attempts to access a few likely attributes and returns the first one it
-        finds (or ``None`` if no error messages dictionary can be extracted).
+        For more information, see :func:`_extract_error_messages`.
 
         """
-        # 'errors' comes from sqlalchemy_elixir_validations
-        if hasattr(exception, 'errors'):
-            return exception.errors
-        # 'message' comes from savalidation
-        if hasattr(exception, 'message'):
-            # TODO this works only if there is one validation error
-            try:
-                left, right = exception.message.rsplit(':', 1)
-                left_bracket = left.rindex('[')
-                right_bracket = right.rindex(']')
-            except ValueError:
-                # could not parse the string; we're not trying too hard here...
-                return None
-            msg = right[:right_bracket].strip(' "')
-            fieldname = left[left_bracket + 1:].strip()
-            return {fieldname: msg}
-        return None
+        return _extract_error_messages(exception)
 
     def _strings_to_dates(self, dictionary):
         """Returns a new dictionary with all the mappings of `dictionary` but
@@ -732,16 +1862,7 @@ class API(ModelView):
         argument.
 
         """
-        result = {}
-        for fieldname, value in dictionary.iteritems():
-            if _is_date_field(self.model, fieldname) and value is not None:
-                if value.strip() == '':
-                    result[fieldname] = None
-                else:
-                    result[fieldname] = parse_datetime(value)
-            else:
-                result[fieldname] = value
-        return result
+        return _strings_to_dates(self.model, dictionary)
 
     def _search(self):
         """Defines a generic search function for the database model.
@@ -814,14 +1935,20 @@ class API(ModelView):
             data = json.loads(request.args.get('q', '{}'))
         except (TypeError, ValueError, OverflowError):
             return jsonify_status_code(400, message='Unable to decode data')
+        self.timer.lap('parse')
 
         # exceptions are caught by the get() method, which calls this one
         for preprocessor in self.preprocessors['GET_MANY']:
             data = preprocessor(data)
+        self.timer.lap('preprocess')
 
         # perform a filtered search
         try:
-            result = search(self.session, self.model, data)
+            is_single = data.get('single')
+            if is_single:
+                result = self._single(data)
+            else:
+                result = self._paginated(data)
         except NoResultFound:
             return jsonify(message='No result found')
         except MultipleResultsFound:
@@ -835,16 +1962,32 @@ class API(ModelView):
         deep = dict((r, {}) for r in relations)
 
         # for security purposes, don't transmit list as top-level JSON
-        if isinstance(result, list):
-            result = self._paginated(result, deep)
-        else:
+        if is_single:
             result = _to_dict(result, deep)
+        else:
+            result['objects'] = [_to_dict(x, deep) for x in result['objects']]
+        self._end_read_only()
+        self.timer.lap('serialize')
 
         for postprocessor in self.postprocessors['GET_MANY']:
             result = postprocessor(result)
+        self.timer.lap('postprocess')
 
         return jsonpify(result)
 
+    def _single(self, search_params):
+        """Returns the single instance of the model which matches the search
+        specified by the dictionary `search_params`.
+
+        Raises :exc:`sqlalchemy.orm.exc.NoResultFound` if there is no such
+        instance and :exc:`sqlalchemy.orm.exc.MultipleResultsFound` if there
+        are several.
+
+        """
+        query = create_query(self.session, self.model, search_params)
+        self.timer.lap('build')
+        return query.one()
+
     def _compute_results_per_page(self):
         """Helper function which returns the number of results per page based
         on the request argument ``results_per_page`` and the server
@@ -860,18 +2003,24 @@ class API(ModelView):
             results_per_page = self.results_per_page
         return min(results_per_page, self.max_results_per_page)
 
-    # TODO it is ugly to have `deep` as an arg here; can we remove it?
-    def _paginated(self, instances, deep):
-        """Returns a paginated JSONified response from the specified list of
-        model instances.
+    def _page_number(self):
+        """Returns the number of the page of results requested by the client
+        in the ``page`` query parameter, where the first page (which is also
+        the default) is page 1.
 
-        `instances` is a list of model instances.
+        Page numbers less than 1 are treated as 1.
 
-        `deep` is the dictionary which defines the depth of submodels to output
-        in the JSON format of the model instances in `instances`; it is passed
-        directly to :func:`_to_dict`.
+        """
+        return max(1, int(request.args.get('page', 1)))
 
-        The response data is JSON of the form:
+    def _paginated(self, search_params):
+        """Returns a dictionary describing the page requested by the client of
+        the results of the search specified by the dictionary `search_params`.
+
+        The value of ``objects`` in the returned dictionary is the list of
+        instances of the model on the requested page; once those instances
+        have been converted to dictionaries, the response data is JSON of the
+        form:
 
         .. sourcecode:: javascript
 
@@ -882,22 +2031,54 @@ class API(ModelView):
              "objects": [{"id": 1, "name": "Jeffrey", "age": 24}, ...]
            }
 
+        Only the instances on the requested page are loaded, and the total
+        number of results is computed by a separate ``COUNT`` query. If
+        :attr:`query_executor` is not ``None`` and the session is bound to an
+        engine (rather than a single connection), that query is executed on
+        one of its threads, on a connection of its own, while the page is
+        loaded. Otherwise, it is executed afterwards, unless the requested page
+        is the first and it is not full.
+
         """
-        num_results = len(instances)
+        search_params = SearchParameters.from_dictionary(search_params)
+        query = create_query(self.session, self.model, search_params)
+        self.timer.lap('build')
         results_per_page = self._compute_results_per_page()
-        if results_per_page > 0:
-            # get the page number (first page is page 1)
-            page_num = int(request.args.get('page', 1))
-            start = (page_num - 1) * results_per_page
-            end = min(num_results, start + results_per_page)
-            total_pages = int(math.ceil(num_results / results_per_page))
+        if results_per_page <= 0:
+            instances = query.all()
+            self.timer.lap('execute')
+            return dict(page=1, objects=instances, total_pages=1,
+                        num_results=len(instances))
+        page_num = self._page_number()
+        start = (page_num - 1) * results_per_page
+        # the page must not extend beyond the limit of the search, if any
+        limit = results_per_page
+        if search_params.limit:
+            limit = max(0, min(limit, search_params.limit - start))
+        offset = (search_params.offset or 0) + start
+        page_query = query.offset(offset).limit(limit)
+        count_query = query
+        if not (search_params.limit or search_params.offset):
+            # the order of the results does not affect their number
+            count_query = query.order_by(None)
+        bind = None
+        if self.query_executor is not None:
+            bind = self.session.get_bind(class_mapper(self.model))
+        # a connection must not be shared with a thread of the executor
+        if isinstance(bind, Engine):
+            pending = self.query_executor.apply_async(_count,
+                                                      (count_query, bind))
+            instances = page_query.all()
+            num_results = pending.get()
         else:
-            page_num = 1
-            start = 0
-            end = num_results
-            total_pages = 1
-        objects = [_to_dict(x, deep) for x in instances[start:end]]
-        return dict(page=page_num, objects=objects, total_pages=total_pages,
+            instances = page_query.all()
+            if start == 0 and len(instances) < results_per_page:
+                num_results = len(instances)
+            else:
+                num_results = count_query.count()
+        self.timer.lap('execute')
+        total_pages = int(math.ceil(num_results / results_per_page))
+        return dict(page=page_num, objects=instances, total_pages=total_pages,
                     num_results=num_results)
 
     def _query_by_primary_key(self, primary_key_value, model=None):
@@ -909,17 +2090,217 @@ class API(ModelView):
 
         """
         the_model = model or self.model
+        query = self.query(the_model)
+        columns = _primary_key_columns(the_model)
+        try:
+            primary_key_value = _coerce_primary_key(the_model,
+                                                    primary_key_value)
+        except ValueError:
+            if len(columns) > 1:
+                # no instance has a malformed composite primary key
+                return query.filter(sql.false())
+            # the database will find no match for the uncoerced value
+        if len(columns) > 1:
+            # force unicode attribute names to strings; see
+            # unicode_keys_to_strings
+            names = [str(name) for name, pytype in columns]
+            return query.filter_by(**dict(zip(names, primary_key_value)))
         # force unicode primary key name to string; see unicode_keys_to_strings
         pk_name = str(_primary_key_name(the_model))
-        return self.query(the_model).filter_by(**{pk_name: primary_key_value})
+        return query.filter_by(**{pk_name: primary_key_value})
 
-    def _get_by(self, primary_key_value, model=None):
+    def _get_by(self, primary_key_value, model=None, for_update=False):
         """Returns the single instance of `model` (or ``self.model`` if not
         specified) whose primary key has the value `primary_key_value`, or
         ``None`` if no such instance exists.
 
+        If the instance is already present in the identity map of the session,
+        no SQL is emitted, unless `for_update` is ``True``. In that case, the
+        row is always selected with ``SELECT ... FOR UPDATE`` (on databases
+        which support it), so that it remains locked until the end of the
+        current transaction.
+
+        If the model has a composite primary key, `primary_key_value` is either
+        a string containing the value of each column of the primary key
+        separated by commas, or a sequence of those values; see
+        :func:`_coerce_primary_key`.
+
+        """
+        the_model = model or self.model
+        try:
+            primary_key_value = _coerce_primary_key(the_model,
+                                                    primary_key_value)
+        except ValueError:
+            return None
+        query = self.query(the_model)
+        if for_update:
+            query = query.with_lockmode('update')
+        return query.get(primary_key_value)
+
+    def _coordinated(self):
+        """Returns ``True`` if and only if the changes made by the current
+        request should be applied and committed by the commit coordinator
+        specified in the constructor of this class, in a transaction shared
+        with other concurrent requests.
+
+        Operations of a batch request are never coordinated, since they must
+        all be committed in the transaction of the batch request.
+
+        """
+        return self.coordinator is not None and \
+            not request.environ.get(BATCH_ENVIRON_KEY)
+
+    def _commit(self):
+        """Commits the current transaction of the session, unless the current
+        request is one of the operations of a batch request, in which case the
+        changes are only flushed to the database.
+
+        The :class:`BatchAPI` view commits the transaction once all of its
+        operations have succeeded.
+
+        """
+        if request.environ.get(BATCH_ENVIRON_KEY):
+            self.session.flush()
+        else:
+            self.session.commit()
+
+    def _preferred_return(self):
+        """Returns ``'minimal'`` or ``'representation'``, depending on whether
+        the response to a write request should contain only the primary key of
+        the affected instance or its full representation.
+
+        This is determined by the ``return`` preference in the ``Prefer``
+        header of the current request (as described in :rfc:`7240`), or by the
+        `return_minimal` argument given in the constructor of this class if no
+        such preference is specified.
+
+        """
+        for preference in request.headers.get('Prefer', '').split(','):
+            name, _, value = preference.split(';')[0].partition('=')
+            if name.strip().lower() == 'return':
+                value = value.strip().strip('"').lower()
+                if value in ('minimal', 'representation'):
+                    return value
+        return 'minimal' if self.return_minimal else 'representation'
+
+    def _primary_key_dict(self, primary_key):
+        """Returns a dictionary mapping the name of each primary key column of
+        the model to its value in `primary_key` (a scalar, or a tuple for a
+        composite primary key).
+
+        This is the content of a response when the client prefers a minimal
+        response; see :meth:`_preferred_return`.
+
+        """
+        names = [name for name, pytype in _primary_key_columns(self.model)]
+        values = primary_key if len(names) > 1 else (primary_key, )
+        return dict(zip(names, values))
+
+    def _minimal_response(self, result, primary_key, status_code=200):
+        """Returns a response with the JSON content `result` and the specified
+        status code, along with a ``Location`` header containing the URL of the
+        instance whose primary key is `primary_key` and a
+        ``Preference-Applied`` header acknowledging the ``return=minimal``
+        preference.
+
+        """
+        response = jsonify_status_code(status_code, **result)
+        if not isinstance(primary_key, tuple):
+            primary_key = (primary_key, )
+        instid = u','.join(unicode(value) for value in primary_key)
+        # the URL of the collection is the URL of this request, without the
+        # primary key if this request is for an individual instance
+        collection_url = request.base_url
+        if request.view_args.get('instid') is not None:
+            collection_url = collection_url.rsplit('/', 1)[0]
+        response.headers['Location'] = '%s/%s' % (collection_url,
+                                                  url_quote(instid))
+        response.headers['Preference-Applied'] = 'return=minimal'
+        return response
+
+    def _get_many_by(self, primary_key_values, model=None):
+        """Returns a list containing, for each value in `primary_key_values`,
+        the single instance of `model` (or ``self.model`` if not specified)
+        whose primary key has that value, or ``None`` if no such instance
+        exists.
+
+        All of the instances are retrieved with a single query (or a few
+        queries, if there are very many values; see
+        :data:`MAX_BATCH_PARAMETERS`).
+
+        """
+        the_model = model or self.model
+        columns = _primary_key_columns(the_model)
+        if len(columns) > 1:
+            return [self._get_by(value, the_model)
+                    for value in primary_key_values]
+        coerced = []
+        for value in primary_key_values:
+            try:
+                coerced.append(_coerce_primary_key(the_model, value))
+            except ValueError:
+                coerced.append(None)
+        wanted = list(set(value for value in coerced if value is not None))
+        found = {}
+        pk = getattr(the_model, columns[0][0])
+        for chunk in _chunks(wanted, MAX_BATCH_PARAMETERS):
+            for inst in self.query(the_model).filter(pk.in_(chunk)):
+                found[_primary_key_value(inst)] = inst
+        return [found.get(value) for value in coerced]
+
+    def _get_existing(self, instid, for_update=False):
+        """Returns the instance of the model specified in the constructor of
+        this class whose primary key has the value `instid`, or ``None`` if no
+        such instance exists.
+
+        Unlike :meth:`_get_by`, this method consults the cache of missing
+        instances (if there is one) before querying the database, and records
+        `instid` in that cache if the query finds nothing. `for_update` is as
+        described in :meth:`_get_by`.
+
+        """
+        try:
+            instid = _coerce_primary_key(self.model, instid)
+        except ValueError:
+            return None
+        cache = self.missing_cache
+        if cache is not None and instid in cache:
+            return None
+        inst = self._get_by(instid, for_update=for_update)
+        if inst is None and cache is not None:
+            cache.add(instid)
+        return inst
+
+    def _etag(self, instance):
+        """Returns the entity tag of `instance`, which is the string form of
+        its version counter, or ``None`` if the model is not versioned.
+
+        """
+        if self.version_attribute is None:
+            return None
+        return str(getattr(instance, self.version_attribute))
+
+    def _check_version(self, instance, if_match):
+        """Raises :exc:`ProcessingException` with :http:statuscode:`412` if
+        `if_match`, the :class:`~werkzeug.datastructures.ETags` from the
+        ``If-Match`` header of the request, is not empty and does not match
+        the entity tag of `instance` (which may be ``None`` if the instance
+        does not exist).
+
+        Nothing is checked if the model is not versioned.
+
+        This only detects changes made before `instance` was loaded. Changes
+        made afterwards are detected when the session is flushed, since the
+        ``UPDATE`` or ``DELETE`` statement for a versioned model only matches
+        the row if its version has not changed, and otherwise SQLAlchemy
+        raises :exc:`~sqlalchemy.orm.exc.StaleDataError`.
+
         """
-        return self._query_by_primary_key(primary_key_value, model).first()
+        if not if_match or self.version_attribute is None:
+            return
+        if instance is None or not if_match.contains(self._etag(instance)):
+            raise ProcessingException(message='Precondition failed',
+                                      status_code=412)
 
     def _inst_to_dict(self, inst):
         """Returns the dictionary representation of the specified instance.
@@ -929,19 +2310,6 @@ class API(ModelView):
         deep = dict((r, {}) for r in relations)
         return _to_dict(inst, deep)
 
-    def _instid_to_dict(self, instid):
-        """Returns the dictionary representation of the instance specified by
-        `instid`.
-
-        If no such instance of the model exists, this method aborts with a
-        :http:statuscode:`404`.
-
-        """
-        inst = self._get_by(instid)
-        if inst is None:
-            abort(404)
-        return self._inst_to_dict(inst)
-
     def get(self, instid):
         """Returns a JSON representation of an instance of model with the
         specified name.
@@ -956,18 +2324,51 @@ class API(ModelView):
         method responds with :http:status:`404`.
 
         """
+        self._begin_read_only()
         try:
             if instid is None:
                 return self._search()
             for preprocessor in self.preprocessors['GET_SINGLE']:
                 preprocessor(instid)
-            result = self._instid_to_dict(instid)
+            self.timer.lap('preprocess')
+            inst = self._get_existing(instid)
+            if inst is None:
+                abort(404)
+            self.timer.lap('execute')
+            result = self._inst_to_dict(inst)
+            etag = self._etag(inst)
+            self._end_read_only()
+            self.timer.lap('serialize')
             for postprocessor in self.postprocessors['GET_SINGLE']:
                 result = postprocessor(result)
-            return jsonpify(result)
+            self.timer.lap('postprocess')
+            response = jsonpify(result)
+            if etag is not None:
+                response.set_etag(etag)
+            return response
         except ProcessingException, e:
             return jsonify_status_code(status_code=e.status_code,
                                        message=e.message)
+        finally:
+            self._end_read_only()
+
+    def _delete_instance(self, instid, if_match=None):
+        """Deletes the instance of the model whose primary key is `instid` and
+        returns ``True``, or returns ``False`` if no such instance exists.
+
+        `if_match` is the value of the ``If-Match`` header of the request; see
+        :meth:`_check_version`.
+
+        This function does not commit the changes made to the database. The
+        calling function has that responsibility.
+
+        """
+        inst = self._get_existing(instid)
+        self._check_version(inst, if_match)
+        if inst is None:
+            return False
+        self.session.delete(inst)
+        return True
 
     def delete(self, instid):
         """Removes the specified instance of the model with the specified name
@@ -977,8 +2378,12 @@ class API(ModelView):
         :rfc:`2616`, this method responds with :http:status:`204` regardless of
         whether an object was deleted.
 
+        If ``instid`` is ``None``, all instances matching the search specified
+        in the ``q`` query parameter are deleted; see :meth:`_delete_many`.
+
         """
-        is_deleted = False
+        if instid is None:
+            return self._delete_many()
         try:
             for preprocessor in self.preprocessors['DELETE']:
                 preprocessor(instid)
@@ -986,11 +2391,27 @@ class API(ModelView):
             return jsonify_status_code(status_code=e.status_code,
                                        message=e.message)
 
-        inst = self._get_by(instid)
-        if inst is not None:
-            self.session.delete(inst)
-            self.session.commit()
-            is_deleted = True
+        # the request is not available to the thread of the coordinator
+        if_match = request.if_match
+        try:
+            if self._coordinated():
+                delete = lambda api: api._delete_instance(instid, if_match)
+                is_deleted = self.coordinator.execute(delete)
+            else:
+                is_deleted = self._delete_instance(instid, if_match)
+                if is_deleted:
+                    self._commit()
+        except Full:
+            return jsonify_status_code(429, message='Too many pending requests')
+        except CommitTimeout:
+            return jsonify_status_code(503, message='Timed out waiting for'
+                                       ' the changes to be committed')
+        except ProcessingException, e:
+            return jsonify_status_code(status_code=e.status_code,
+                                       message=e.message)
+        except StaleDataError:
+            self.session.rollback()
+            return jsonify_status_code(412, message='Precondition failed')
         try:
             for postprocessor in self.postprocessors['DELETE']:
                 postprocessor(is_deleted)
@@ -1000,6 +2421,82 @@ class API(ModelView):
 
         return jsonify_status_code(204)
 
+    def _delete_many(self):
+        """Deletes all instances of the model which match the search
+        specified in the ``q`` query parameter of the request, as described in
+        :meth:`_search`.
+
+        The ``q`` query parameter is required, so that a request without it
+        does not delete every instance; a request without it has
+        :http:statuscode:`400`.
+
+        If the search does not specify a ``limit`` or an ``offset`` and
+        deleting an instance of the model does not cascade (see
+        :func:`_deletes_cascade`), the matching rows are deleted by a single
+        SQL ``DELETE`` statement, without loading them into the session, and
+        the deleted instances are removed from the session. Otherwise, each
+        matching instance is loaded and deleted individually by the ORM.
+
+        If the ``dry_run`` query parameter is ``true`` (or ``1``), nothing is
+        deleted, and the response reports how many instances match instead.
+
+        The response has :http:statuscode:`200` and JSON content of the form
+        ``{"num_deleted": 3}`` or, for a dry run, ``{"num_matched": 3}``.
+
+        """
+        if 'q' not in request.args:
+            message = 'A search query is required to delete many instances'
+            return jsonify_status_code(400, message=message)
+        try:
+            search_params = json.loads(request.args['q'])
+        except (TypeError, ValueError, OverflowError):
+            return jsonify_status_code(400, message='Unable to decode data')
+        try:
+            for preprocessor in self.preprocessors['DELETE_MANY']:
+                search_params = preprocessor(search_params)
+        except ProcessingException, e:
+            return jsonify_status_code(status_code=e.status_code,
+                                       message=e.message)
+        try:
+            query = create_query(self.session, self.model, search_params)
+        except:
+            return jsonify_status_code(400,
+                                       message='Unable to construct query')
+        dry_run = request.args.get('dry_run', '').lower() in ('true', '1')
+        if dry_run:
+            result = dict(num_matched=query.count())
+        else:
+            try:
+                if search_params.get('limit') or \
+                        search_params.get('offset') or \
+                        _deletes_cascade(self.model):
+                    num_deleted = 0
+                    for inst in query.all():
+                        self.session.delete(inst)
+                        num_deleted += 1
+                else:
+                    # the ordering of the search does not affect which rows
+                    # match, but a DELETE statement cannot be ordered
+                    search_params = dict(search_params, order_by=[])
+                    bulk_query = create_query(self.session, self.model,
+                                              search_params)
+                    # fetch the primary keys of the matching rows first, so
+                    # that the deleted instances are removed from the session
+                    num_deleted = bulk_query.delete(
+                        synchronize_session='fetch')
+                self._commit()
+            except IntegrityError, error:
+                self.session.rollback()
+                return jsonify_status_code(400, message=error.message)
+            result = dict(num_deleted=num_deleted)
+        try:
+            for postprocessor in self.postprocessors['DELETE_MANY']:
+                result = postprocessor(query, result)
+        except ProcessingException, e:
+            return jsonify_status_code(status_code=e.status_code,
+                                       message=e.message)
+        return jsonify(result)
+
     def post(self):
         """Creates a new instance of a given model based on request data.
 
@@ -1019,6 +2516,10 @@ class API(ModelView):
         Currently, this method can only handle instantiating a model with a
         single level of relationship data.
 
+        If :attr:`allow_post_many` is ``True``, the request data may instead be
+        a JSON list of such objects, in which case all of the instances are
+        created in a single transaction; see :meth:`_post_many`.
+
         """
         # try to read the parameters for the model from the body of the request
         try:
@@ -1026,6 +2527,13 @@ class API(ModelView):
         except (TypeError, ValueError, OverflowError):
             return jsonify_status_code(400, message='Unable to decode data')
 
+        # a list of objects is a request to create many instances at once
+        if isinstance(params, list):
+            if not self.allow_post_many:
+                msg = 'Creating multiple instances per request is not allowed'
+                return jsonify_status_code(400, message=msg)
+            return self._post_many(params)
+
         # apply any preprocessors to the POST arguments
         try:
             for preprocessor in self.preprocessors['POST']:
@@ -1041,6 +2549,91 @@ class API(ModelView):
                 msg = "Model does not have field '%s'" % field
                 return jsonify_status_code(400, message=msg)
 
+        # Operations of a batch request are never written behind, since they
+        # must be rolled back if a later operation fails.
+        if self.writer is not None and \
+                not request.environ.get(BATCH_ENVIRON_KEY):
+            return self._post_behind(params)
+
+        try:
+            minimal = self._preferred_return() == 'minimal'
+            if self._coordinated():
+                create = lambda api: api._create_instance(params)
+                primary_key = self.coordinator.execute(create)
+                instance = None if minimal else self._get_by(primary_key)
+            else:
+                instance = self._create_instance(params)
+                # Read the primary key before committing, since committing
+                # expires the instance and reading it afterwards would query
+                # the database.
+                self.session.flush()
+                primary_key = _primary_key_value(instance)
+                self._commit()
+            if self.missing_cache is not None:
+                self.missing_cache.discard(primary_key)
+            if minimal:
+                result = self._primary_key_dict(primary_key)
+            else:
+                result = self._inst_to_dict(instance)
+
+            try:
+                for postprocessor in self.postprocessors['POST']:
+                    result = postprocessor(result)
+            except ProcessingException, e:
+                return jsonify_status_code(status_code=e.status_code,
+                                           message=e.message)
+            if minimal:
+                return self._minimal_response(result, primary_key, 201)
+            return jsonify_status_code(201, **result)
+        except Full:
+            return jsonify_status_code(429, message='Too many pending requests')
+        except CommitTimeout:
+            return jsonify_status_code(503, message='Timed out waiting for'
+                                       ' the changes to be committed')
+        except self.validation_exceptions, exception:
+            return self._handle_validation_exception(exception)
+        except IntegrityError, error:
+            self.session.rollback()
+            return jsonify_status_code(400, message=error.message)
+
+    def _post_behind(self, params):
+        """Enqueues the creation of an instance of the model with the fields
+        specified in `params` on the background writer of this API, without
+        waiting for the instance to be created.
+
+        The response is :http:statuscode:`202` with JSON content containing
+        the ID of the job, of the form ``{"job": "..."}``, and a ``Location``
+        header containing the URL at which the status of the job can be
+        retrieved; see :class:`JobAPI`. If too many jobs are already waiting,
+        the response is :http:statuscode:`429` and nothing is created.
+
+        This is not used for operations of a batch request, which create their
+        instances in the transaction of the batch request.
+
+        """
+        try:
+            jobid = self.writer.submit(params)
+        except Full:
+            return jsonify_status_code(429, message='Too many pending requests')
+        response = jsonify_status_code(202, job=jobid)
+        response.headers['Location'] = '%s/jobs/%s' % (request.base_url,
+                                                       jobid)
+        return response
+
+    def _create_instance(self, params):
+        """Creates a new instance of the model specified in the constructor of
+        this class, adds it to the session, and returns it.
+
+        `params` is a dictionary mapping field name to the value to which to
+        initialize that field, as described in :meth:`post`. Each of the keys
+        of `params` must be the name of a field of the model.
+
+        This function does not commit the changes made to the database. The
+        calling function has that responsibility. Related instances which need
+        to be created are flushed to the database, so validation exceptions
+        and :exc:`~sqlalchemy.exc.IntegrityError` may be raised.
+
+        """
         # Getting the list of relations that will be added later
         cols = get_columns(self.model)
         relations = get_relations(self.model)
@@ -1054,45 +2647,119 @@ class API(ModelView):
         # date into an instance of the Python ``datetime`` object.
         params = self._strings_to_dates(params)
 
-        try:
-            # Instantiate the model with the parameters.
-            modelargs = dict([(i, params[i]) for i in props])
-            # HACK Python 2.5 requires __init__() keywords to be strings.
-            instance = self.model(**unicode_keys_to_strings(modelargs))
-
-            # Handling relations, a single level is allowed
-            for col in set(relations).intersection(paramkeys):
-                submodel = get_related_model(self.model, col)
-
-                if type(params[col]) == list:
-                    # model has several related objects
-                    for subparams in params[col]:
-                        kw = unicode_keys_to_strings(subparams)
-                        subinst = _get_or_create(self.session, submodel,
-                                                 **kw)[0]
-                        getattr(instance, col).append(subinst)
-                else:
-                    # model has single related object
-                    kw = unicode_keys_to_strings(params[col])
-                    subinst = _get_or_create(self.session, submodel, **kw)[0]
-                    setattr(instance, col, subinst)
+        # Instantiate the model with the parameters.
+        modelargs = dict([(i, params[i]) for i in props])
+        # HACK Python 2.5 requires __init__() keywords to be strings.
+        instance = self.model(**unicode_keys_to_strings(modelargs))
 
-            # add the created model to the session
-            self.session.add(instance)
-            self.session.commit()
-            result = self._inst_to_dict(instance)
+        # Handling relations, a single level is allowed
+        for col in set(relations).intersection(paramkeys):
+            submodel = get_related_model(self.model, col)
 
-            try:
-                for postprocessor in self.postprocessors['POST']:
-                    result = postprocessor(result)
-            except ProcessingException, e:
-                return jsonify_status_code(status_code=e.status_code,
-                                           message=e.message)
-            return jsonify_status_code(201, **result)
+            if type(params[col]) == list:
+                # model has several related objects
+                subinsts = _get_or_create_many(self.session, submodel,
+                                               params[col])
+                getattr(instance, col).extend(subinsts)
+            else:
+                # model has single related object
+                subinst = _get_or_create_many(self.session, submodel,
+                                              [params[col]])[0]
+                setattr(instance, col, subinst)
+
+        # add the created model to the session
+        self.session.add(instance)
+        return instance
+
+    def _post_many(self, objects):
+        """Creates a new instance of the model for each dictionary in the list
+        `objects`, all in a single transaction.
+
+        Each dictionary is preprocessed by the ``POST`` preprocessors and
+        checked for fields which do not exist on the model. Dictionaries which
+        fail these checks are skipped, and the reason is reported in the
+        ``errors`` list of the response. All other instances are added to the
+        session and committed at once. If committing fails (for example, due
+        to an :exc:`~sqlalchemy.exc.IntegrityError`), no instances are created.
+
+        The response is :http:statuscode:`201` if any instances were created
+        (and :http:statuscode:`400` otherwise) with JSON content of the form:
+
+        .. sourcecode:: javascript
+
+           {
+             "num_created": 2,
+             "ids": [1, 2],
+             "errors": [{"index": 1, "message": "..."}]
+           }
+
+        where ``"ids"`` is the list of primary keys of the created instances
+        and each element of ``"errors"`` specifies the position in `objects`
+        of a dictionary which was skipped.
+
+        """
+        errors = []
+        instances = []
+        try:
+            for index, params in enumerate(objects):
+                if not isinstance(params, dict):
+                    msg = 'Unable to decode data'
+                    errors.append(dict(index=index, message=msg))
+                    continue
+                try:
+                    for preprocessor in self.preprocessors['POST']:
+                        params = preprocessor(params)
+                except ProcessingException, e:
+                    errors.append(dict(index=index, message=e.message))
+                    continue
+                bad_fields = [f for f in params if not hasattr(self.model, f)]
+                if bad_fields:
+                    msg = "Model does not have field '%s'" % bad_fields[0]
+                    errors.append(dict(index=index, message=msg))
+                    continue
+                instances.append(self._create_instance(params))
+            self._commit()
         except self.validation_exceptions, exception:
             return self._handle_validation_exception(exception)
         except IntegrityError, error:
+            self.session.rollback()
             return jsonify_status_code(400, message=error.message)
+        ids = [_primary_key_value(instance) for instance in instances]
+        if self.missing_cache is not None:
+            for pk in ids:
+                self.missing_cache.discard(pk)
+        result = dict(num_created=len(ids), ids=ids, errors=errors)
+        try:
+            for postprocessor in self.postprocessors['POST_MANY']:
+                result = postprocessor(result)
+        except ProcessingException, e:
+            return jsonify_status_code(status_code=e.status_code,
+                                       message=e.message)
+        return jsonify_status_code(201 if ids else 400, **result)
+
+    def _can_update_in_bulk(self, search_params, data):
+        """Returns ``True`` if and only if the instances matching the search
+        parameters `search_params` can be updated with the field values in
+        `data` by a single SQL ``UPDATE`` statement, without loading the
+        instances into the session.
+
+        This is the case if each field in `data` is mapped to a single column
+        of the table of the model (as opposed to, for example, a hybrid
+        property or a :func:`~sqlalchemy.orm.column_property` expression; see
+        :func:`_column_types`), if the search does not limit or offset the set
+        of matching instances, if no validation exceptions were specified in
+        the constructor of this class (since validation of models happens in
+        Python when setting attributes on loaded instances), and if the model
+        is not versioned (since the ORM increments the version counter of each
+        instance it updates; see :meth:`_check_version`).
+
+        """
+        if self.validation_exceptions or self.version_attribute is not None:
+            return False
+        if search_params.get('limit') or search_params.get('offset'):
+            return False
+        column_types = _column_types(self.model)
+        return all(field in column_types for field in data)
 
     def patch(self, instid):
         """Updates the instance specified by ``instid`` of the named model, or
@@ -1109,6 +2776,22 @@ class API(ModelView):
         parameters for restricting the set of instances on which updates will
         be made in this case.
 
+        When updating many instances, if no relations are being changed, the
+        matching instances are updated by a single SQL ``UPDATE`` statement
+        whenever possible; see :meth:`_can_update_in_bulk`.
+
+        If the media type of the request is :data:`JSON_PATCH_MIMETYPE`, the
+        request data is instead parsed as a JSON Patch document, which is a
+        list of operations to apply to the single instance specified by
+        ``instid``; see :meth:`_apply_patch_document`.
+
+        Fields whose value would not change are not assigned, and if the
+        instance does not change at all, nothing is committed.
+
+        If the model is versioned and the request has an ``If-Match`` header,
+        the instance is updated only if its version matches; see
+        :meth:`_check_version`.
+
         """
         # try to load the fields/values to update from the body of the request
         try:
@@ -1118,6 +2801,9 @@ class API(ModelView):
             return jsonify_status_code(400, message='Unable to decode data')
         # Check if the request is to patch many instances of the current model.
         patchmany = instid is None
+        if request.mimetype == JSON_PATCH_MIMETYPE and patchmany:
+            msg = 'JSON Patch documents apply only to a single instance'
+            return jsonify_status_code(400, message=msg)
         # Perform any necessary preprocessing.
         if patchmany:
             try:
@@ -1137,69 +2823,637 @@ class API(ModelView):
                 return jsonify_status_code(status_code=e.status_code,
                                            message=e.message)
 
+        fields = data
+        if request.mimetype == JSON_PATCH_MIMETYPE:
+            try:
+                fields = _patched_fields(data)
+            except ValueError, exception:
+                return jsonify_status_code(400, message=str(exception))
+
         # Check for any request parameter naming a column which does not exist
         # on the current model.
-        for field in data:
+        for field in fields:
             if not hasattr(self.model, field):
                 msg = "Model does not have field '%s'" % field
                 return jsonify_status_code(400, message=msg)
 
-        if patchmany:
-            try:
-                # create a SQLALchemy Query from the query parameter `q`
-                query = create_query(self.session, self.model, search_params)
-            except:
-                return jsonify_status_code(400,
-                                           message='Unable to construct query')
-        else:
-            # create a SQLAlchemy Query which has exactly the specified row
-            query = self._query_by_primary_key(instid)
-            if query.count() == 0:
-                abort(404)
-            assert query.count() == 1, 'Multiple rows with same ID'
+        if not patchmany:
+            return self._patch_single(instid, data)
+
+        try:
+            # create a SQLALchemy Query from the query parameter `q`
+            query = create_query(self.session, self.model, search_params)
+        except:
+            return jsonify_status_code(400, message='Unable to construct query')
 
         relations = self._update_relations(query, data)
         field_list = frozenset(data) ^ relations
         data = dict((field, data[field]) for field in field_list)
 
-        # Special case: if there are any dates, convert the string form of the
-        # date into an instance of the Python ``datetime`` object.
-        data = self._strings_to_dates(data)
-
         try:
             # Let's update all instances present in the query
             num_modified = 0
-            if data:
+            if data and not relations and \
+                    self._can_update_in_bulk(search_params, data):
+                # Issue a single UPDATE statement instead of loading each
+                # matching row. There is no need to synchronize the instances
+                # in the session, since committing expires them anyway.
+                search_params = dict(search_params, order_by=[])
+                bulk_query = create_query(self.session, self.model,
+                                          search_params)
+                # Special case: if there are any dates, convert the string
+                # form of the date into an instance of the Python
+                # ``datetime`` object (:meth:`_set_fields` does this for the
+                # instances updated one at a time).
+                # the names of the attributes may differ from the names of
+                # their columns, which are what the UPDATE statement needs
+                mapper = class_mapper(self.model)
+                values = dict((mapper.get_property(field).columns[0], value)
+                              for field, value
+                              in self._strings_to_dates(data).iteritems())
+                num_modified = bulk_query.update(values,
+                                                 synchronize_session=False)
+            elif data:
                 for item in query.all():
-                    for field, value in data.iteritems():
-                        setattr(item, field, value)
+                    self._set_fields(item, data)
                     num_modified += 1
-            self.session.commit()
+            self._commit()
         except self.validation_exceptions, exception:
             return self._handle_validation_exception(exception)
         except IntegrityError, error:
             return jsonify_status_code(400, message=error.message)
 
+        self._primary_key_changed(data)
+
         # Perform any necessary postprocessing.
-        if patchmany:
-            result = dict(num_modified=num_modified)
-            try:
-                for postprocessor in self.postprocessors['PATCH_MANY']:
-                    result = postprocessor(query, result)
-            except ProcessingException, e:
-                return jsonify_status_code(status_code=e.status_code,
-                                           message=e.message)
+        result = dict(num_modified=num_modified)
+        try:
+            for postprocessor in self.postprocessors['PATCH_MANY']:
+                result = postprocessor(query, result)
+        except ProcessingException, e:
+            return jsonify_status_code(status_code=e.status_code,
+                                       message=e.message)
+        return jsonify(result)
+
+    def _primary_key_changed(self, fields):
+        """Clears the cache of missing instances if `fields`, the names of the
+        fields changed on instances of the model, includes the primary key,
+        since an instance may now exist at a key which was previously cached
+        as missing.
+
+        """
+        pk_names = frozenset(n for n, t in _primary_key_columns(self.model))
+        if self.missing_cache is not None and pk_names & frozenset(fields):
+            self.missing_cache.clear()
+
+    def _update_instance(self, instid, data, if_match=None):
+        """Updates the instance of the model whose primary key is `instid` with
+        the fields and relations specified in `data`, and returns it, or
+        returns ``None`` if no such instance exists. If the instance exists but
+        `data` does not change it, it is returned wrapped in an
+        :class:`Unchanged`.
+
+        `if_match` is the value of the ``If-Match`` header of the request; see
+        :meth:`_check_version`.
+
+        This function does not commit the changes made to the database. The
+        calling function has that responsibility.
+
+        """
+        instance = self._get_existing(instid,
+                                      for_update=self.select_for_update)
+        if instance is None:
+            return None
+        self._check_version(instance, if_match)
+        session = self.session
+        if not (self._apply_update(instance, data) or session.new
+                or session.deleted or session.dirty):
+            return Unchanged(instance)
+        return instance
+
+    def _patch_single(self, instid, data):
+        """Updates the instance of the model whose primary key is `instid` with
+        the (preprocessed) request data `data`, as described in :meth:`patch`.
+
+        The instance is fetched once and then reused throughout. If a commit
+        coordinator was specified in the constructor of this class, the update
+        is applied and committed by the coordinator instead; see
+        :meth:`_coordinated`.
+
+        """
+        minimal = self._preferred_return() == 'minimal'
+        coordinated = self._coordinated()
+        changed = True
+        # the request is not available to the thread of the coordinator
+        if_match = request.if_match
+        try:
+            if coordinated:
+                update = lambda api: api._update_instance(instid, data,
+                                                          if_match)
+                primary_key = self.coordinator.execute(update)
+                if isinstance(primary_key, Unchanged):
+                    changed = False
+                    primary_key = primary_key.result
+                if primary_key is None:
+                    abort(404)
+                # the changes were committed in another session
+                if changed:
+                    self.session.expire_all()
+                instance = None if minimal else self._get_by(primary_key)
+            else:
+                instance = self._get_existing(
+                    instid, for_update=self.select_for_update)
+                if instance is None:
+                    abort(404)
+                self._check_version(instance, if_match)
+                session = self.session
+                changed = self._apply_update(instance, data) or \
+                    bool(session.new or session.deleted or session.dirty)
+                # Build the response before committing, since committing
+                # expires the instance and reading it afterwards would query
+                # the database again.
+                if changed:
+                    session.flush()
+                primary_key = _primary_key_value(instance)
+            if minimal:
+                result = self._primary_key_dict(primary_key)
+            else:
+                result = self._inst_to_dict(instance)
+            etag = self._etag(instance) if instance is not None else None
+            if changed and not coordinated:
+                self._commit()
+            elif not changed and not request.environ.get(BATCH_ENVIRON_KEY):
+                # nothing was written, so there is nothing to commit
+                self.session.rollback()
+        except Full:
+            return jsonify_status_code(429, message='Too many pending requests')
+        except CommitTimeout:
+            return jsonify_status_code(503, message='Timed out waiting for'
+                                       ' the changes to be committed')
+        except ProcessingException, e:
+            self.session.rollback()
+            return jsonify_status_code(status_code=e.status_code,
+                                       message=e.message)
+        except StaleDataError:
+            # the instance was changed by another request after it was loaded
+            self.session.rollback()
+            return jsonify_status_code(412, message='Precondition failed')
+        except self.validation_exceptions, exception:
+            return self._handle_validation_exception(exception)
+        except IntegrityError, error:
+            return jsonify_status_code(400, message=error.message)
+
+        if changed:
+            self._primary_key_changed(_patched_fields(data)
+                                      if isinstance(data, list) else data)
+
+        # Perform any necessary postprocessing.
+        try:
+            for postprocessor in self.postprocessors['PATCH_SINGLE']:
+                result = postprocessor(result)
+        except ProcessingException, e:
+            return jsonify_status_code(status_code=e.status_code,
+                                       message=e.message)
+        if minimal:
+            response = self._minimal_response(result, primary_key)
         else:
-            result = self._instid_to_dict(instid)
+            response = jsonify(result)
+        if etag is not None:
+            response.set_etag(etag)
+        return response
+
+    def put(self, instid):
+        """Alias for :meth:`patch`."""
+        return self.patch(instid)
+
+
+class JobAPI(MethodView):
+    """Provides the status of the jobs of a
+    :class:`~flask.ext.restless.writer.BatchWriter`.
+
+    """
+
+    def __init__(self, writer, *args, **kw):
+        """Instantiates this view for the specified
+        :class:`~flask.ext.restless.writer.BatchWriter`.
+
+        """
+        super(JobAPI, self).__init__(*args, **kw)
+        self.writer = writer
+
+    def get(self, jobid):
+        """Returns the status of the job with the specified ID, as described in
+        :meth:`~flask.ext.restless.writer.BatchWriter.status`, or responds with
+        :http:statuscode:`404` if there is no such job.
+
+        """
+        result = self.writer.status(jobid)
+        if result is None:
+            abort(404)
+        return jsonify(result)
+
+
+class ImportAPI(ModelView):
+    """Provides an endpoint which creates many instances of a model from a
+    newline-delimited JSON or CSV file in the body of a :http:method:`post`
+    request.
+
+    The body of the request is read and parsed incrementally, and the rows are
+    inserted in chunks, each in a transaction of its own, so that the memory
+    used does not depend on the size of the file.
+
+    Rows are inserted with SQL ``INSERT`` statements, unless validation
+    exceptions are specified or the model validates its instances in Python
+    (see :func:`_validates_in_python`), in which case an instance of the model
+    is created for each row.
+
+    """
+
+    def __init__(self, session, model, chunk_size=1000, max_rejected=100,
+                 missing_cache=None, preprocessors=None,
+                 validation_exceptions=None, *args, **kw):
+        """Instantiates this view for the specified model.
+
+        `chunk_size` is the maximum number of rows inserted in a single
+        transaction.
+
+        `max_rejected` is the maximum number of rejected lines described in
+        the response. All of the rejected lines are counted.
+
+        `missing_cache` is the
+        :class:`~flask.ext.restless.helpers.MissingInstanceCache` of the API
+        for the model, or ``None``. It is cleared after rows are inserted.
+
+        `preprocessors` is the list of ``POST`` preprocessors of the API for
+        the model, which are called on the dictionary of each line, as in
+        :meth:`API.post`.
+
+        `validation_exceptions` is the list of validation exceptions of the
+        API for the model; see :class:`API`.
+
+        """
+        super(ImportAPI, self).__init__(session, model, *args, **kw)
+        self.chunk_size = chunk_size
+        self.max_rejected = max_rejected
+        self.missing_cache = missing_cache
+        self.preprocessors = list(preprocessors or ())
+        self.validation_exceptions = tuple(validation_exceptions or ())
+        self.create_instances = bool(self.validation_exceptions) or \
+            _validates_in_python(model)
+
+    def _ndjson_objects(self, lines):
+        """Generates pairs whose left element is a line number and whose right
+        element is the dictionary represented by the JSON object on that line
+        of `lines`, or the :exc:`ValueError` which occurred when parsing it.
+
+        Blank lines are skipped.
+
+        """
+        for number, line in itertools.izip(itertools.count(1), lines):
+            if not line.strip():
+                continue
             try:
-                for postprocessor in self.postprocessors['PATCH_SINGLE']:
-                    result = postprocessor(result)
+                obj = json.loads(line)
+            except (TypeError, ValueError, OverflowError):
+                yield number, ValueError('Unable to decode data')
+                continue
+            if not isinstance(obj, dict):
+                yield number, ValueError('Line must contain a JSON object')
+            else:
+                yield number, obj
+
+    def _csv_objects(self, lines):
+        """Generates pairs whose left element is a line number and whose right
+        element is the dictionary represented by the CSV record on that line of
+        `lines`, or the :exc:`ValueError` which occurred when parsing it.
+
+        The first record contains the names of the fields, and each string is
+        encoded in UTF-8.
+
+        """
+        reader = csv.reader(lines)
+        try:
+            header = [name.decode('utf-8') for name in reader.next()]
+        except StopIteration:
+            return
+        for record in reader:
+            if not record:
+                continue
+            if len(record) != len(header):
+                msg = 'Expected %d fields, found %d' % (len(header),
+                                                        len(record))
+                yield reader.line_num, ValueError(msg)
+                continue
+            try:
+                values = [value.decode('utf-8') for value in record]
+            except UnicodeDecodeError:
+                yield reader.line_num, ValueError('Invalid UTF-8')
+                continue
+            yield reader.line_num, dict(zip(header, values))
+
+    def _insert(self, rows):
+        """Inserts `rows`, a list of dictionaries mapping column keys to
+        values, into the table of the model in the current transaction.
+
+        Consecutive rows with the same set of keys are inserted with a single
+        ``INSERT`` statement, executed with many sets of parameters at once, so
+        that the rows are inserted in order.
+
+        If :attr:`create_instances` is ``True``, an instance of the model is
+        created and flushed for each row instead, so that validation
+        exceptions may be raised.
+
+        """
+        mapper = class_mapper(self.model)
+        if self.create_instances:
+            names = dict((key, name) for name, (key, pytype)
+                         in _column_types(self.model).iteritems())
+            for row in rows:
+                params = dict((names[key], value)
+                              for key, value in row.iteritems())
+                # HACK Python 2.5 requires __init__() keywords to be strings.
+                instance = self.model(**unicode_keys_to_strings(params))
+                self.session.add(instance)
+            self.session.flush()
+            return
+        statement = mapper.mapped_table.insert(inline=True)
+        for keys, group in itertools.groupby(rows, frozenset):
+            self.session.execute(statement, list(group), mapper=mapper)
+
+    def _insert_chunk(self, chunk):
+        """Inserts the rows of `chunk`, a list of pairs whose left element is
+        a line number and whose right element is a row, in a single
+        transaction, and returns the number of inserted rows along with a list
+        of pairs describing the rejected lines.
+
+        If that transaction fails, each row is inserted again in a transaction
+        of its own, so that only the rows which cause an error are rejected.
+        Each rejected line is described by a dictionary containing either a
+        ``message`` or, if a validation exception was raised, the
+        ``validation_errors`` extracted from it, as in :meth:`API.post`.
+
+        """
+        errors = (DBAPIError, ) + self.validation_exceptions
+        try:
+            self._insert([row for number, row in chunk])
+            self.session.commit()
+            return len(chunk), []
+        except errors:
+            self.session.rollback()
+        inserted, rejected = 0, []
+        for number, row in chunk:
+            try:
+                self._insert([row])
+                self.session.commit()
+                inserted += 1
+            except DBAPIError, exception:
+                self.session.rollback()
+                rejected.append((number, dict(message=str(exception.orig))))
+            except self.validation_exceptions, exception:
+                self.session.rollback()
+                messages = _extract_error_messages(exception) or \
+                    'Could not determine specific validation errors'
+                rejected.append((number, dict(validation_errors=messages)))
+        return inserted, rejected
+
+    def _import(self, objects):
+        """Imports the pairs of line numbers and dictionaries (or exceptions)
+        generated by `objects`, and generates a dictionary describing the
+        progress of the import after each chunk has been committed.
+
+        The last dictionary generated is the result of the import, which also
+        describes the first `max_rejected` rejected lines.
+
+        """
+        column_types = _column_types(self.model)
+        result = dict(num_inserted=0, num_rejected=0, rejected=[])
+
+        def reject(number, **detail):
+            result['num_rejected'] += 1
+            if len(result['rejected']) < self.max_rejected:
+                result['rejected'].append(dict(detail, line=number))
+
+        def commit(chunk):
+            inserted, rejected = self._insert_chunk(chunk)
+            result['num_inserted'] += inserted
+            for number, detail in rejected:
+                reject(number, **detail)
+            if inserted and self.missing_cache is not None:
+                self.missing_cache.clear()
+            return dict(num_inserted=result['num_inserted'],
+                        num_rejected=result['num_rejected'])
+
+        chunk = []
+        for number, obj in objects:
+            if isinstance(obj, Exception):
+                reject(number, message=str(obj))
+                continue
+            try:
+                for preprocessor in self.preprocessors:
+                    obj = preprocessor(obj)
             except ProcessingException, e:
-                return jsonify_status_code(status_code=e.status_code,
-                                           message=e.message)
+                reject(number, message=e.message)
+                continue
+            try:
+                chunk.append((number, _import_row(column_types, obj)))
+            except ValueError, exception:
+                reject(number, message=str(exception))
+                continue
+            if len(chunk) >= self.chunk_size:
+                yield commit(chunk)
+                chunk = []
+        if chunk:
+            commit(chunk)
+        yield result
+
+    def post(self):
+        """Creates an instance of the model for each line of the file in the
+        body of the request, and responds with a JSON object of the form::
+
+            {"num_inserted": 998, "num_rejected": 2,
+             "rejected": [{"line": 5, "message": "..."}, ...]}
+
+        If the media type of the request is one of :data:`NDJSON_MIMETYPES`,
+        each line contains a JSON object mapping field names to values. If it
+        is :data:`CSV_MIMETYPE`, the first line contains the names of the
+        fields and each other line their values. String values are converted
+        to the types of the columns of the model. Other media types receive a
+        :http:statuscode:`415` response.
+
+        The dictionary of each line is passed through the ``POST``
+        preprocessors specified in the constructor of this class before it is
+        converted; a line for which a preprocessor raises
+        :exc:`ProcessingException` is rejected with the message of that
+        exception.
+
+        Lines which cannot be parsed or converted, which fail validation, or
+        which the database refuses to insert (for example, because of a unique
+        constraint), are rejected. Only fields which are mapped to columns of
+        the table of the model are allowed.
+
+        If the client prefers the media type ``application/x-ndjson`` (as
+        specified in the ``Accept`` header), the response is streamed as the
+        rows are imported: each line is a JSON object containing the
+        ``num_inserted`` and ``num_rejected`` elements after another chunk has
+        been committed, and the last line is the object described above.
 
+        """
+        if request.mimetype in NDJSON_MIMETYPES:
+            objects = self._ndjson_objects(request.stream)
+        elif request.mimetype == CSV_MIMETYPE:
+            objects = self._csv_objects(request.stream)
+        else:
+            msg = 'Unsupported media type: %s' % request.mimetype
+            return jsonify_status_code(415, message=msg)
+        progress = self._import(objects)
+        best = request.accept_mimetypes.best_match(['application/json',
+                                                    NDJSON_MIMETYPES[0]])
+        if best == NDJSON_MIMETYPES[0]:
+            lines = (json.dumps(status) + '\n' for status in progress)
+            return Response(stream_with_context(lines),
+                            mimetype=NDJSON_MIMETYPES[0])
+        for result in progress:
+            pass
         return jsonify(result)
 
-    def put(self, instid):
-        """Alias for :meth:`patch`."""
-        return self.patch(instid)
+
+class BatchAPI(MethodView):
+    """Provides a single endpoint which executes an ordered list of requests
+    on other APIs created by Flask-Restless in a single database transaction.
+
+    """
+
+    def __init__(self, session, max_operations=100, *args, **kw):
+        """Instantiates this view with the specified attributes.
+
+        `session` is the SQLAlchemy session in which all database transactions
+        will be performed. This must be the same session as the one used by
+        the APIs on which the operations are executed.
+
+        `max_operations` is the maximum number of operations allowed in a
+        single batch request.
+
+        """
+        super(BatchAPI, self).__init__(*args, **kw)
+        self.session = session
+        self.max_operations = max_operations
+
+    def _dispatch(self, operation):
+        """Executes the request described by the dictionary `operation` on the
+        view of the current application which handles it, and returns the
+        response.
+
+        The request inherits the headers of the current request, so that
+        preprocessors which authenticate requests, for example, see the same
+        headers. Additional headers may be given in the ``'headers'`` element
+        of `operation`.
+
+        Raises :exc:`ValueError` if `operation` is malformed or does not
+        specify an endpoint of an API created by Flask-Restless.
+
+        """
+        if not isinstance(operation, dict) or 'url' not in operation:
+            raise ValueError('Each operation must specify a URL')
+        method = operation.get('method', 'GET').upper()
+        headers = dict((k, v) for k, v in request.headers.iteritems()
+                       if k not in ('Content-Type', 'Content-Length'))
+        headers.update(operation.get('headers') or {})
+        data = operation.get('data')
+        if data is not None:
+            data = json.dumps(data)
+        environ_overrides = {BATCH_ENVIRON_KEY: True}
+        context = current_app.test_request_context(
+            operation['url'], method=method, data=data, headers=headers,
+            content_type='application/json', base_url=request.host_url,
+            environ_overrides=environ_overrides)
+        context.push()
+        try:
+            if request.routing_exception is not None:
+                return request.routing_exception.get_response(request.environ)
+            view = current_app.view_functions[request.url_rule.endpoint]
+            if not issubclass(getattr(view, 'view_class', object), API):
+                raise ValueError('No API at URL %s' % operation['url'])
+            try:
+                return current_app.make_response(view(**request.view_args))
+            except HTTPException, exception:
+                return exception.get_response(request.environ)
+        finally:
+            context.pop()
+
+    def post(self):
+        """Executes each of the operations specified in the body of the
+        request, in order, and commits the changes made by all of them at
+        once.
+
+        The :attr:`flask.request.data` attribute will be parsed as a JSON list
+        of objects, each of the form:
+
+        .. sourcecode:: javascript
+
+           {
+             "method": "PATCH",
+             "url": "/api/person/1",
+             "data": {"name": "foo"},
+             "headers": {"Prefer": "return=minimal"}
+           }
+
+        Each operation is handled exactly as a request on its own would be, by
+        the API created by Flask-Restless at the specified URL (including its
+        preprocessors and postprocessors), except that changes are flushed to
+        the database instead of committed.
+
+        If all of the operations succeed, the transaction is committed and the
+        response is :http:statuscode:`200` with JSON content of the form:
+
+        .. sourcecode:: javascript
+
+           {"results": [{"status": 201, "body": {...}}, ...]}
+
+        where each element of ``"results"`` contains the status code and the
+        JSON content of the response to the corresponding operation.
+
+        As soon as an operation fails (that is, its status code is not less
+        than 400), the transaction is rolled back, the remaining operations
+        are skipped, and the response has the status code of the failed
+        operation, with JSON content containing the ``"index"`` of the failed
+        operation and the ``"results"`` so far.
+
+        """
+        try:
+            operations = json.loads(request.data)
+        except (TypeError, ValueError, OverflowError):
+            return jsonify_status_code(400, message='Unable to decode data')
+        if not isinstance(operations, list):
+            message = 'Request must contain a list of operations'
+            return jsonify_status_code(400, message=message)
+        if len(operations) > self.max_operations:
+            message = 'At most %d operations are allowed per request' % \
+                self.max_operations
+            return jsonify_status_code(400, message=message)
+        results = []
+        try:
+            for index, operation in enumerate(operations):
+                try:
+                    response = self._dispatch(operation)
+                except ValueError, exception:
+                    self.session.rollback()
+                    return jsonify_status_code(400, index=index,
+                                               message=str(exception),
+                                               results=results)
+                try:
+                    body = json.loads(response.data)
+                except (TypeError, ValueError):
+                    body = None
+                results.append(dict(status=response.status_code, body=body))
+                if response.status_code >= 400:
+                    self.session.rollback()
+                    return jsonify_status_code(response.status_code,
+                                               index=index, results=results)
+            self.session.commit()
+        except IntegrityError, error:
+            self.session.rollback()
+            return jsonify_status_code(400, message=error.message)
+        except:
+            self.session.rollback()
+            raise
+        return jsonify(results=results)
@@ -0,0 +1,477 @@
+"""
+    flask.ext.restless.writer
+    ~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Provides :class:`BatchWriter`, which creates instances of a model in a
+    background thread, in batches, on behalf of :http:method:`post` requests
+    which do not wait for the instances to be committed, and
+    :class:`CommitCoordinator`, which executes the changes of concurrent
+    requests which do wait in shared transactions.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+from collections import deque
+from Queue import Empty
+from Queue import Full
+from Queue import Queue
+import threading
+import time
+from uuid import uuid4
+
+from flask import current_app
+
+from .views import _primary_key_value
+from .views import API
+from .views import CommitTimeout
+from .views import Unchanged
+
+#: The status of a job which has been enqueued but not yet written.
+PENDING = 'pending'
+
+#: The status of a job whose instance has been committed to the database.
+COMPLETED = 'completed'
+
+#: The status of a job whose instance could not be created.
+FAILED = 'failed'
+
+
+class BatchWriter(object):
+    """Creates instances of a model in a background thread, in batches.
+
+    Each call to :meth:`submit` enqueues the parameters of an instance to
+    create and returns a job ID. A daemon thread, started by the first call to
+    :meth:`submit`, repeatedly takes up to `batch_size` jobs from the queue and
+    creates their instances in a single transaction. If that transaction
+    fails, each instance of the batch is retried in a transaction of its own,
+    so that one bad job does not cause the others to fail. The status of each
+    job can be retrieved with :meth:`status`.
+
+    `session` is the :class:`~sqlalchemy.orm.scoping.scoped_session` in which
+    instances are created; the background thread uses its own session from
+    this registry.
+
+    `model` is the SQLAlchemy model of the instances to create.
+
+    `maxsize` is the maximum number of jobs waiting in the queue. When the
+    queue is full, :meth:`submit` raises :exc:`Queue.Full`.
+
+    `batch_size` is the maximum number of jobs written in a single transaction.
+
+    `window` is the number of seconds the background thread waits for more
+    jobs after taking the first job of a batch, unless the batch is already
+    full. If this is ``0``, a batch contains only the jobs which are already
+    waiting in the queue.
+
+    `queue` is an object with the same interface as :class:`Queue.Queue` in
+    which jobs wait to be written. If this is ``None``, a new
+    :class:`Queue.Queue` whose size is `maxsize` is used.
+
+    `jobs` is a mapping (an object with ``get`` and ``pop`` methods and item
+    assignment) in which the status of each job is stored. If this is
+    ``None``, a new dictionary is used. If `queue` is shared by several
+    processes, `jobs` must be shared by them as well, since the status of a
+    job is recorded by whichever process writes it.
+
+    `max_jobs` is the number of finished jobs whose status is remembered. Once
+    this many jobs have been finished by this process, the status of the
+    oldest one is forgotten.
+
+    `api_kw` is the dictionary of keyword arguments of the
+    :class:`~flask.ext.restless.views.API` with which the background thread
+    creates instances. It should configure that API (its validation
+    exceptions, processors, and so on) like the API on whose behalf instances
+    are created.
+
+    `missing_cache` is the
+    :class:`~flask.ext.restless.helpers.MissingInstanceCache` of the API on
+    whose behalf instances are created, or ``None``.
+
+    """
+
+    def __init__(self, session, model, maxsize=1000, batch_size=100,
+                 queue=None, max_jobs=10000, api_kw=None,
+                 missing_cache=None, window=0, jobs=None):
+        self.session = session
+        self.model = model
+        self.batch_size = batch_size
+        self.window = window
+        self.queue = queue if queue is not None else Queue(maxsize)
+        self.max_jobs = max_jobs
+        self.api_kw = api_kw or {}
+        self.missing_cache = missing_cache
+        self._jobs = jobs if jobs is not None else {}
+        self._finished = deque()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, params):
+        """Enqueues the creation of an instance of the model with the fields
+        specified in the dictionary `params`, and returns the ID of the job.
+
+        `params` must already have been preprocessed and checked for fields
+        which do not exist on the model, as in
+        :meth:`~flask.ext.restless.views.API.post`.
+
+        This method must be called within a Flask application context, since
+        the application is needed by the background thread.
+
+        Raises :exc:`Queue.Full` if there are already `maxsize` jobs waiting.
+
+        """
+        return self._enqueue(params)
+
+    def _enqueue(self, payload):
+        """Adds a new job whose payload is `payload` to the queue and returns
+        its ID.
+
+        Raises :exc:`Queue.Full` if the queue is full.
+
+        """
+        jobid = uuid4().hex
+        self._lock.acquire()
+        try:
+            self._jobs[jobid] = dict(status=PENDING)
+        finally:
+            self._lock.release()
+        try:
+            self.queue.put_nowait((jobid, payload))
+        except Full:
+            self._lock.acquire()
+            try:
+                self._jobs.pop(jobid, None)
+            finally:
+                self._lock.release()
+            raise
+        self._start(current_app._get_current_object())
+        return jobid
+
+    def status(self, jobid):
+        """Returns a dictionary describing the status of the job with the
+        specified ID, or ``None`` if there is no such job (or if it finished so
+        long ago that it has been forgotten).
+
+        The ``'status'`` element of the dictionary is one of :data:`PENDING`,
+        :data:`COMPLETED`, and :data:`FAILED`. A completed job also has an
+        ``'id'`` element containing the primary key of the created instance,
+        and a failed job has a ``'message'`` element describing the error.
+
+        """
+        result = self._jobs.get(jobid)
+        return dict(result) if result is not None else None
+
+    def join(self):
+        """Blocks until all jobs which have been submitted have finished."""
+        self.queue.join()
+
+    def _start(self, app):
+        """Starts the background thread, which writes jobs within an
+        application context for the Flask application `app`, unless it is
+        already running.
+
+        If the thread has died, a new one is started in its place.
+
+        """
+        if self._thread is not None and self._thread.isAlive():
+            return
+        self._lock.acquire()
+        try:
+            if self._thread is None or not self._thread.isAlive():
+                self._thread = threading.Thread(target=self._run, args=(app, ))
+                self._thread.setDaemon(True)
+                self._thread.start()
+        finally:
+            self._lock.release()
+
+    def _finish(self, jobid, **result):
+        """Records the result of the job with the specified ID, forgetting the
+        oldest finished job if necessary.
+
+        """
+        self._lock.acquire()
+        try:
+            self._jobs[jobid] = result
+            self._finished.append(jobid)
+            if len(self._finished) > self.max_jobs:
+                self._jobs.pop(self._finished.popleft(), None)
+        finally:
+            self._lock.release()
+
+    def _next_batch(self):
+        """Blocks until a job is available, then returns a list of up to
+        `batch_size` jobs from the queue, waiting at most `window` seconds for
+        more jobs to arrive.
+
+        """
+        batch = [self.queue.get()]
+        deadline = time.time() + self.window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.time()
+            try:
+                if remaining > 0:
+                    batch.append(self.queue.get(timeout=remaining))
+                else:
+                    batch.append(self.queue.get_nowait())
+            except Empty:
+                break
+        return batch
+
+    def _apply(self, api, params):
+        """Makes the changes specified by the payload of a job in the session
+        of the background thread, and returns either an instance of the model,
+        whose primary key is then the result of the job, or the result itself.
+
+        `api` is an :class:`~flask.ext.restless.views.API` for the model which
+        uses the session of the background thread.
+
+        For this class, the payload is the dictionary `params` given to
+        :meth:`submit`, and the result is a new instance of the model.
+
+        """
+        return api._create_instance(params)
+
+    def _write(self, api, batch):
+        """Applies the jobs in `batch` in a single transaction, and returns
+        their results.
+
+        """
+        results = [self._apply(api, payload) for jobid, payload in batch]
+        self.session.flush()
+        results = [_primary_key_value(result)
+                   if isinstance(result, self.model) else result
+                   for result in results]
+        self.session.commit()
+        return results
+
+    def _succeeded(self, batch, primary_keys):
+        """Records that the jobs in `batch` have created the instances with
+        the specified primary keys.
+
+        """
+        for (jobid, params), primary_key in zip(batch, primary_keys):
+            if self.missing_cache is not None:
+                self.missing_cache.discard(primary_key)
+            self._finish(jobid, status=COMPLETED, id=primary_key)
+
+    def _failed(self, job, exception):
+        """Records that `job` failed because of `exception`."""
+        current_app.logger.exception('Unable to create instance')
+        self._finish(job[0], status=FAILED, message=str(exception))
+
+    def _process(self, api, batch):
+        """Writes the jobs in `batch` and records their results.
+
+        If the transaction of the batch fails, each job is retried in a
+        transaction of its own, so that one bad job does not cause the others
+        to fail.
+
+        """
+        try:
+            self._succeeded(batch, self._write(api, batch))
+        except Exception:
+            self.session.rollback()
+            # retry each job on its own to isolate the failures
+            for job in batch:
+                try:
+                    self._succeeded([job], self._write(api, [job]))
+                except Exception, exception:
+                    self.session.rollback()
+                    self._failed(job, exception)
+
+    def _run(self, app):
+        """Writes batches of jobs from the queue forever."""
+        api = API(self.session, self.model, **self.api_kw)
+        while True:
+            batch = self._next_batch()
+            context = app.app_context()
+            context.push()
+            try:
+                self._process(api, batch)
+            finally:
+                self.session.remove()
+                context.pop()
+                for job in batch:
+                    self.queue.task_done()
+
+
+class CommitCoordinator(BatchWriter):
+    """Executes the changes made by concurrent requests in shared transactions.
+
+    Each call to :meth:`execute` enqueues a function which makes changes in a
+    session and blocks until those changes have been committed. The background
+    thread applies all of the functions which arrive within `window` seconds
+    of each other (up to `batch_size` of them) in a single transaction, so
+    that many requests share the cost of a single commit.
+
+    Each function is applied and flushed within a savepoint of that
+    transaction (see :meth:`~sqlalchemy.orm.session.Session.begin_nested`).
+    If it fails, only its own changes are rolled back, and only its request
+    fails; the other functions of the batch are never applied twice. If the
+    commit of the transaction itself fails, every request of the batch fails.
+    The database must therefore support savepoints; with SQLite, see
+    :ref:`groupcommit`.
+
+    `timeout` is the number of seconds :meth:`execute` waits for the changes
+    of a request to be committed.
+
+    The other arguments are the same as those of :class:`BatchWriter`, except
+    that the queue and the statuses of the jobs are always in-process.
+
+    """
+
+    def __init__(self, session, model, window=0.002, batch_size=50,
+                 maxsize=1000, api_kw=None, missing_cache=None, timeout=30):
+        super(CommitCoordinator, self).__init__(
+            session, model, maxsize=maxsize, batch_size=batch_size,
+            api_kw=api_kw, missing_cache=missing_cache, window=window)
+        self.timeout = timeout
+        self._events = {}
+        self._outcomes = {}
+        self._abandoned = set()
+
+    def execute(self, operation):
+        """Applies the function `operation` in the session of the background
+        thread, blocks until the changes it made have been committed, and
+        returns its result.
+
+        `operation` is a function which takes an
+        :class:`~flask.ext.restless.views.API` for the model which uses the
+        session of the background thread, and returns either an instance of
+        the model (in which case the result is the primary key of that
+        instance) or any other result. If it made no changes, it may return
+        its result wrapped in an :class:`~flask.ext.restless.views.Unchanged`,
+        in which case the result is wrapped in the same way and nothing is
+        committed on its behalf.
+
+        If `operation` raises an exception, or the changes it made cannot be
+        committed, that exception is raised here, and none of its changes are
+        committed.
+
+        Raises :exc:`Queue.Full` if there are already `maxsize` operations
+        waiting, and
+        :exc:`~flask.ext.restless.views.CommitTimeout` if the changes have not
+        been committed within `timeout` seconds (for example, because the
+        database is stalled). In the latter case `operation` is not applied
+        if it has not been already, but if it has, its changes may still be
+        committed.
+
+        """
+        event = threading.Event()
+        jobid = self._enqueue(operation)
+        self._lock.acquire()
+        try:
+            # the job may have finished before the event was registered
+            if jobid in self._outcomes:
+                event.set()
+            else:
+                self._events[jobid] = event
+        finally:
+            self._lock.release()
+        event.wait(self.timeout)
+        self._lock.acquire()
+        try:
+            self._jobs.pop(jobid, None)
+            self._events.pop(jobid, None)
+            if jobid not in self._outcomes:
+                # the background thread discards the job and its outcome
+                self._abandoned.add(jobid)
+                raise CommitTimeout
+            succeeded, outcome = self._outcomes.pop(jobid)
+        finally:
+            self._lock.release()
+        if not succeeded:
+            raise outcome
+        return outcome
+
+    def _apply(self, api, operation):
+        """Applies the function `operation` given to :meth:`execute`."""
+        return operation(api)
+
+    def _is_abandoned(self, jobid):
+        """Returns ``True`` if and only if the request waiting for the job
+        with the specified ID has timed out.
+
+        """
+        self._lock.acquire()
+        try:
+            return jobid in self._abandoned
+        finally:
+            self._lock.release()
+
+    def _write(self, api, batch):
+        """Applies each job in `batch` within a savepoint of a single
+        transaction, commits that transaction, and returns a list of pairs
+        ``(succeeded, outcome)``, where `outcome` is either the result of the
+        job or the exception which caused it to fail.
+
+        Jobs whose requests have timed out are not applied. If no job changed
+        anything, the transaction is rolled back instead of committed.
+
+        """
+        outcomes = []
+        changed = False
+        for jobid, operation in batch:
+            if self._is_abandoned(jobid):
+                outcomes.append((False, CommitTimeout()))
+                continue
+            self.session.begin_nested()
+            try:
+                result = self._apply(api, operation)
+                unchanged = isinstance(result, Unchanged)
+                if unchanged:
+                    result = result.result
+                self.session.flush()
+                if isinstance(result, self.model):
+                    result = _primary_key_value(result)
+            except Exception, exception:
+                self.session.rollback()
+                outcomes.append((False, exception))
+            else:
+                if unchanged:
+                    self.session.rollback()
+                    result = Unchanged(result)
+                else:
+                    self.session.commit()
+                    changed = True
+                outcomes.append((True, result))
+        if changed:
+            self.session.commit()
+        else:
+            self.session.rollback()
+        return outcomes
+
+    def _process(self, api, batch):
+        """Writes the jobs in `batch` and wakes up the requests waiting for
+        them.
+
+        If the transaction of the batch cannot be committed, every job fails;
+        jobs are never applied twice.
+
+        """
+        try:
+            outcomes = self._write(api, batch)
+        except Exception, exception:
+            current_app.logger.exception('Unable to commit changes')
+            self.session.rollback()
+            outcomes = [(False, exception)] * len(batch)
+        for (jobid, operation), (succeeded, outcome) in zip(batch, outcomes):
+            self._settle(jobid, succeeded, outcome)
+
+    def _settle(self, jobid, succeeded, outcome):
+        """Records the outcome of the job with the specified ID and wakes up
+        the request waiting for it, or discards the outcome if that request
+        has timed out.
+
+        """
+        self._lock.acquire()
+        try:
+            if jobid in self._abandoned:
+                self._abandoned.discard(jobid)
+                return
+            self._outcomes[jobid] = (succeeded, outcome)
+            event = self._events.pop(jobid, None)
+        finally:
+            self._lock.release()
+        if event is not None:
+            event.set()
@@ -28,22 +28,34 @@
 from unittest2 import TestSuite
 from unittest2 import defaultTestLoader
 
+from . import test_counting
+from . import test_executor
 from . import test_helpers
 from . import test_manager
 from . import test_search
+from . import test_sharding
 from . import test_validation
 from . import test_views
 from . import test_processors
+from . import test_profiling
+from . import test_routing
+from . import test_writer
 
 
 def suite():
     """Returns the test suite for this module."""
     result = TestSuite()
     loader = defaultTestLoader
+    result.addTest(loader.loadTestsFromModule(test_counting))
+    result.addTest(loader.loadTestsFromModule(test_executor))
     result.addTest(loader.loadTestsFromModule(test_helpers))
     result.addTest(loader.loadTestsFromModule(test_manager))
     result.addTest(loader.loadTestsFromModule(test_search))
+    result.addTest(loader.loadTestsFromModule(test_sharding))
     result.addTest(loader.loadTestsFromModule(test_validation))
     result.addTest(loader.loadTestsFromModule(test_views))
     result.addTest(loader.loadTestsFromModule(test_processors))
+    result.addTest(loader.loadTestsFromModule(test_profiling))
+    result.addTest(loader.loadTestsFromModule(test_routing))
+    result.addTest(loader.loadTestsFromModule(test_writer))
     return result
@@ -8,6 +8,7 @@
     :license: GNU AGPLv3+ or BSD
 
 """
+from contextlib import contextmanager
 import datetime
 from unittest2 import TestCase
 
@@ -16,6 +17,7 @@ from sqlalchemy import Column
 from sqlalchemy import create_engine
 from sqlalchemy import Date
 from sqlalchemy import DateTime
+from sqlalchemy import event
 from sqlalchemy import Float
 from sqlalchemy import ForeignKey
 from sqlalchemy import Integer
@@ -30,6 +32,38 @@ from sqlalchemy.orm import sessionmaker
 from flask.ext.restless import APIManager
 
 
+@contextmanager
+def recorded_statements(engine, hook=None):
+    """Returns a context manager which records the SQL statements executed on
+    `engine` within its block and gives the list of them as its target.
+
+    If `hook` is not ``None``, it is called with the DBAPI cursor and the
+    statement before each statement is executed, and may use the cursor to
+    simulate a concurrent change to the database.
+
+    In SQLAlchemy 0.7, connections which are already in use when the block
+    begins (for example, in a transaction of a session) do not see the
+    listener, so end such transactions first.
+
+    """
+    statements = []
+    active = [True]
+
+    def record(conn, cursor, statement, *args):
+        # listeners cannot be removed in SQLAlchemy 0.7, so this one is
+        # disabled instead when the block ends
+        if active[0]:
+            statements.append(statement)
+            if hook is not None:
+                hook(cursor, statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        active[0] = False
+
+
 class FlaskTestBase(TestCase):
     """Base class for tests which use a Flask application.
 
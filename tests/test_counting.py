@@ -0,0 +1,134 @@
+"""
+    tests.test_counting
+    ~~~~~~~~~~~~~~~~~~~
+
+    Provides unit tests for the :mod:`flask_restless.counting` module.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+import logging
+
+from unittest2 import TestSuite
+
+from flask import json
+
+from flask.ext.restless import StatementCounter
+from flask.ext.restless.counting import STATEMENTS_ENVIRON_KEY
+from flask.ext.restless.counting import STATEMENTS_HEADER
+from flask.ext.restless.counting import TIME_HEADER
+
+from .helpers import TestSupportPrefilled
+
+
+__all__ = ['StatementCounterTest']
+
+
+dumps = json.dumps
+loads = json.loads
+
+
+class RecordingHandler(logging.Handler):
+    """A logging handler which keeps the messages of the records it
+    handles.
+
+    """
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class StatementCounterTest(TestSupportPrefilled):
+    """Unit tests for the :class:`flask_restless.counting.StatementCounter`
+    class.
+
+    """
+
+    def setUp(self):
+        """Adds a handler which records the messages logged by the
+        application.
+
+        """
+        super(StatementCounterTest, self).setUp()
+        self.handler = RecordingHandler()
+        self.flaskapp.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        """Removes the handler added in :meth:`setUp`."""
+        self.flaskapp.logger.removeHandler(self.handler)
+        super(StatementCounterTest, self).tearDown()
+
+    def test_counting(self):
+        """Tests that the statements of each request are counted and reported
+        in the headers of the response, and that a statement repeated for each
+        instance on a page is reported as an N+1 query problem.
+
+        """
+        counter = StatementCounter(self.Base.metadata.bind, max_statements=3,
+                                   max_repeats=3, headers=True)
+        self.manager.create_api(self.Person, statement_counter=counter)
+        self.manager.create_api(self.Computer)
+        # the computers of each of the five people are loaded separately
+        response = self.app.get('/api/person')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(int(response.headers[STATEMENTS_HEADER]), 6)
+        self.assertGreaterEqual(float(response.headers[TIME_HEADER]), 0)
+        self.assertEqual(len(self.handler.messages), 2)
+        self.assertIn('SQL statements', self.handler.messages[0])
+        self.assertIn('5 times', self.handler.messages[1])
+        self.assertIn('N+1', self.handler.messages[1])
+        # a request on a single instance is within the limits
+        del self.handler.messages[:]
+        response = self.app.get('/api/person/1')
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(int(response.headers[STATEMENTS_HEADER]), 3)
+        self.assertEqual(self.handler.messages, [])
+        # statements of requests on other APIs are not counted
+        response = self.app.get('/api/computer')
+        self.assertNotIn(STATEMENTS_HEADER, response.headers)
+        self.assertEqual(self.handler.messages, [])
+
+    def test_errors(self):
+        """Tests that the statements of requests which raise an exception, and
+        statements which fail, are counted.
+
+        """
+        counter = StatementCounter(self.Base.metadata.bind, max_statements=0,
+                                   headers=True)
+        self.manager.create_api(self.Person, methods=['GET', 'POST'],
+                                statement_counter=counter)
+        response = self.app.get('/api/person/100')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(len(self.handler.messages), 1)
+        self.assertIn('GET /api/person/100 executed 1 SQL statements',
+                      self.handler.messages[0])
+        # the INSERT statement violates a unique constraint
+        response = self.app.post('/api/person',
+                                 data=dumps(dict(name=u'Lincoln')))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.headers[STATEMENTS_HEADER], '1')
+        connection = self.Base.metadata.bind.connect()
+        self.assertFalse(connection.info.get(STATEMENTS_ENVIRON_KEY))
+        connection.close()
+
+    def test_shared_listeners(self):
+        """Tests that counters for the same engine share their listeners."""
+        engine = self.Base.metadata.bind
+        StatementCounter(engine)
+        listeners = len(engine.dispatch.before_cursor_execute)
+        for i in range(3):
+            StatementCounter(engine)
+        self.assertEqual(len(engine.dispatch.before_cursor_execute),
+                         listeners)
+
+
+def load_tests(loader, standard_tests, pattern):
+    """Returns the test suite for this module."""
+    suite = TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(StatementCounterTest))
+    return suite
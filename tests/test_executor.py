@@ -0,0 +1,163 @@
+"""
+    tests.test_executor
+    ~~~~~~~~~~~~~~~~~~~
+
+    Provides unit tests for the :mod:`flask_restless.executor` module.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+from __future__ import with_statement
+
+from multiprocessing.pool import ThreadPool
+import threading
+
+from unittest2 import TestSuite
+
+from flask import g
+from flask import json
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from flask.ext.restless import APIManager
+from flask.ext.restless.manager import IllegalArgumentError
+
+from .helpers import recorded_statements
+from .helpers import TestSupport
+
+
+__all__ = ['ExecutorTest']
+
+
+dumps = json.dumps
+loads = json.loads
+
+
+class ExecutorTest(TestSupport):
+    """Unit tests for the :class:`flask_restless.executor.ExecutorAPI` and
+    :class:`flask_restless.executor.ExecutorFunctionAPI` classes, and for the
+    `query_executor` of the :class:`flask_restless.views.API` class.
+
+    """
+
+    def setUp(self):
+        """Binds the session to an in-memory database which is shared by all
+        threads, and creates a pool of two threads.
+
+        """
+        super(ExecutorTest, self).setUp()
+        engine = create_engine('sqlite://', poolclass=StaticPool,
+                               connect_args=dict(check_same_thread=False),
+                               convert_unicode=True)
+        self.session.remove()
+        self.Session.configure(bind=engine)
+        self.Base.metadata.bind = engine
+        self.Base.metadata.create_all()
+        self.pool = ThreadPool(2)
+
+    def tearDown(self):
+        """Stops the threads of the pool."""
+        self.pool.close()
+        self.pool.join()
+
+    def test_executor(self):
+        """Tests that requests are handled on the threads of the pool, in a
+        request context which shares the :data:`flask.g` object of the
+        original request.
+
+        """
+        threads = []
+
+        def set_user():
+            g.user = u'foo'
+
+        def record(params):
+            threads.append((threading.current_thread(), g.user))
+            return params
+
+        self.flaskapp.before_request(set_user)
+        self.manager.create_api(self.Person, methods=['GET', 'POST'],
+                                allow_functions=True, executor=self.pool,
+                                preprocessors=dict(GET_SINGLE=[record],
+                                                   POST=[record]))
+        response = self.app.post('/api/person', data=dumps(dict(name=u'a')))
+        self.assertEqual(response.status_code, 201)
+        response = self.app.get('/api/person/1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data)['name'], u'a')
+        self.assertEqual(len(threads), 2)
+        for thread, user in threads:
+            self.assertIsNot(thread, threading.current_thread())
+            self.assertEqual(user, u'foo')
+        # errors raised on the threads of the pool reach the client
+        response = self.app.get('/api/person/2')
+        self.assertEqual(response.status_code, 404)
+        query = dumps(dict(functions=[dict(name='count', field='id')]))
+        response = self.app.get('/api/eval/person?q=' + query)
+        self.assertEqual(loads(response.data)['count__id'], 1)
+
+    def test_query_executor(self):
+        """Tests that the query which counts the results of a search is
+        executed on a thread of the pool.
+
+        """
+        self.manager.create_api(self.Person, query_executor=self.pool)
+        self.session.add_all(self.Person(name=u'%d' % i) for i in range(15))
+        self.session.commit()
+        threads = []
+
+        def record(cursor, statement):
+            if 'count(' in statement:
+                threads.append(threading.current_thread())
+
+        with recorded_statements(self.Base.metadata.bind, record):
+            response = self.app.get('/api/person?page=2')
+        self.assertEqual(response.status_code, 200)
+        data = loads(response.data)
+        self.assertEqual(data['num_results'], 15)
+        self.assertEqual(data['total_pages'], 2)
+        self.assertEqual(len(data['objects']), 5)
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    def test_query_executor_connection(self):
+        """Tests that the query which counts the results of a search is
+        executed on the thread of the request if the session is bound to a
+        connection, which cannot be shared between threads.
+
+        """
+        threads = []
+
+        def record(cursor, statement):
+            if 'count(' in statement:
+                threads.append(threading.current_thread())
+
+        # the listener must be added before the connection is created
+        with recorded_statements(self.Base.metadata.bind, record):
+            connection = self.Base.metadata.bind.connect()
+            self.session.remove()
+            self.Session.configure(bind=connection)
+            self.manager.create_api(self.Person, query_executor=self.pool)
+            self.session.add_all(self.Person(name=u'%d' % i)
+                                 for i in range(15))
+            self.session.commit()
+            response = self.app.get('/api/person?page=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data)['num_results'], 15)
+        self.assertEqual(threads, [threading.current_thread()])
+        self.session.remove()
+        connection.close()
+
+    def test_unscoped_session(self):
+        """Tests that an executor requires a scoped session."""
+        manager = APIManager(self.flaskapp, self.Session())
+        self.assertRaises(IllegalArgumentError, manager.create_api,
+                          self.Person, executor=self.pool)
+
+
+def load_tests(loader, standard_tests, pattern):
+    """Returns the test suite for this module."""
+    suite = TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(ExecutorTest))
+    return suite
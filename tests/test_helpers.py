@@ -13,6 +13,7 @@ from unittest2 import TestSuite
 
 from flask.ext.restless.helpers import get_columns
 from flask.ext.restless.helpers import get_relations
+from flask.ext.restless.helpers import MissingInstanceCache
 from flask.ext.restless.helpers import unicode_keys_to_strings
 from flask.ext.restless.helpers import upper_keys
 
@@ -39,6 +40,31 @@ class HelpersTest(TestCase):
             self.assertTrue(k.isupper())
             self.assertFalse(v.isupper())
 
+    def test_missing_instance_cache(self):
+        """Test for the bounded cache of primary keys of missing instances.
+
+        """
+        cache = MissingInstanceCache(2)
+        cache.add(1)
+        self.assertIn(1, cache)
+        # keys are compared by their string representation
+        self.assertIn(u'1', cache)
+        cache.add(u'2')
+        cache.add(3)
+        # the oldest key has been evicted
+        self.assertNotIn(1, cache)
+        self.assertIn(2, cache)
+        self.assertIn(3, cache)
+        self.assertEqual(2, len(cache))
+        cache.discard(2)
+        self.assertNotIn(2, cache)
+        cache.discard(2)
+        # composite keys are compared by their comma-separated elements
+        cache.add((1, u'foo'))
+        self.assertIn(u'1,foo', cache)
+        cache.clear()
+        self.assertEqual(0, len(cache))
+
 
 class ModelHelpersTest(TestSupport):
     """Provides tests for helper functions which operate on SQLAlchemy models.
@@ -291,6 +291,77 @@ class APIManagerTest(TestSupport):
         response = self.app.get('/api/person/1/computers')
         self.assertEqual(200, response.status_code)
 
+    def test_batch_api(self):
+        """Tests that the batch endpoint executes all of its operations in a
+        single transaction.
+
+        """
+        self.manager.create_api(self.Person, methods=['GET', 'POST', 'PATCH'])
+        self.manager.create_api(self.Computer, methods=['POST'])
+        self.manager.create_batch_api()
+        self.flaskapp.add_url_rule('/api/other', 'other', lambda: 'other')
+        operations = [
+            dict(method='POST', url='/api/person', data=dict(name=u'foo')),
+            dict(method='POST', url='/api/computer', data=dict(name=u'bar'),
+                 headers={'Prefer': 'return=minimal'}),
+            dict(method='PATCH', url='/api/person/1', data=dict(age=10)),
+            dict(method='GET', url='/api/person/1')
+        ]
+        response = self.app.post('/api/batch', data=dumps(operations))
+        self.assertEqual(200, response.status_code)
+        results = loads(response.data)['results']
+        self.assertEqual([201, 201, 200, 200],
+                         [result['status'] for result in results])
+        self.assertEqual(dict(id=1), results[1]['body'])
+        self.assertEqual(10, results[3]['body']['age'])
+        self.session.remove()
+        self.assertEqual(1, self.session.query(self.Person).count())
+        self.assertEqual(1, self.session.query(self.Computer).count())
+
+        # if one operation fails, none of the changes are committed
+        operations = [
+            dict(method='POST', url='/api/person', data=dict(name=u'baz')),
+            dict(method='PATCH', url='/api/person/1', data=dict(bogus=0)),
+            dict(method='POST', url='/api/person', data=dict(name=u'qux'))
+        ]
+        response = self.app.post('/api/batch', data=dumps(operations))
+        self.assertEqual(400, response.status_code)
+        data = loads(response.data)
+        self.assertEqual(1, data['index'])
+        self.assertEqual(2, len(data['results']))
+        self.session.remove()
+        self.assertEqual(1, self.session.query(self.Person).count())
+
+        # operations on URLs which are not APIs are rejected
+        operations = [dict(method='GET', url='/api/other')]
+        response = self.app.post('/api/batch', data=dumps(operations))
+        self.assertEqual(400, response.status_code)
+        operations = [dict(method='DELETE', url='/api/person/1')]
+        response = self.app.post('/api/batch', data=dumps(operations))
+        self.assertEqual(405, response.status_code)
+
+    def test_session_factory(self):
+        """Tests that a manager created with a session factory removes the
+        session of the current thread at the end of each request, but not at
+        the end of each operation of a batch request.
+
+        """
+        manager = APIManager(self.flaskapp, session_factory=self.Session)
+        manager.create_api(self.Person, methods=['GET', 'POST'],
+                           url_prefix='/api/v2')
+        manager.create_batch_api(url_prefix='/api/v2')
+        response = self.app.post('/api/v2/person', data=dumps(dict(name=u'a')))
+        self.assertEqual(201, response.status_code)
+        self.assertFalse(manager.session.registry.has())
+        operations = [
+            dict(method='POST', url='/api/v2/person', data=dict(name=u'b')),
+            dict(method='POST', url='/api/v2/person', data=dict(name=u'c'))
+        ]
+        response = self.app.post('/api/v2/batch', data=dumps(operations))
+        self.assertEqual(200, response.status_code)
+        self.assertFalse(manager.session.registry.has())
+        self.assertEqual(3, self.session.query(self.Person).count())
+
 
 class FSATest(FlaskTestBase):
     """Tests which use models defined using Flask-SQLAlchemy instead of pure
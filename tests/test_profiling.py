@@ -0,0 +1,129 @@
+"""
+    tests.test_profiling
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Provides unit tests for the :mod:`flask_restless.profiling` module.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+import os
+import pstats
+import shutil
+import tempfile
+
+from unittest2 import TestSuite
+
+from flask import json
+
+from flask.ext.restless import RequestProfiler
+from flask.ext.restless.profiling import PROFILE_FILE_HEADER
+from flask.ext.restless.profiling import PROFILE_HEADER
+
+from .helpers import TestSupportPrefilled
+
+
+__all__ = ['RequestProfilerTest']
+
+
+dumps = json.dumps
+loads = json.loads
+
+
+class RequestProfilerTest(TestSupportPrefilled):
+    """Unit tests for the :class:`flask_restless.profiling.RequestProfiler`
+    class.
+
+    """
+
+    def setUp(self):
+        """Creates a temporary directory for the profiles."""
+        super(RequestProfilerTest, self).setUp()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Removes the temporary directory."""
+        shutil.rmtree(self.directory)
+        super(RequestProfilerTest, self).tearDown()
+
+    def test_profiling(self):
+        """Tests that only requests carrying the secret header are profiled,
+        and that the statistics are saved to the file named in the response.
+
+        """
+        profiler = RequestProfiler(self.directory, 'foo', interval=0)
+        self.manager.create_api(self.Person, allow_functions=True,
+                                profiler=profiler)
+        response = self.app.get('/api/person')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(PROFILE_FILE_HEADER, response.headers)
+        response = self.app.get('/api/person',
+                                headers={PROFILE_HEADER: 'bar'})
+        self.assertNotIn(PROFILE_FILE_HEADER, response.headers)
+        self.assertEqual(os.listdir(self.directory), [])
+        response = self.app.get('/api/person/1',
+                                headers={PROFILE_HEADER: 'foo'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data)['id'], 1)
+        filename = response.headers[PROFILE_FILE_HEADER]
+        self.assertEqual(os.listdir(self.directory), [filename])
+        stats = pstats.Stats(os.path.join(self.directory, filename))
+        self.assertGreater(stats.total_calls, 0)
+        query = dumps(dict(functions=[dict(name='count', field='id')]))
+        response = self.app.get('/api/eval/person?q=' + query,
+                                headers={PROFILE_HEADER: 'foo'})
+        self.assertEqual(loads(response.data)['count__id'], 5)
+        self.assertIn(PROFILE_FILE_HEADER, response.headers)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+    def test_rate_limit(self):
+        """Tests that at most one request is profiled in each interval."""
+        profiler = RequestProfiler(self.directory, 'foo', interval=3600)
+        self.manager.create_api(self.Person, profiler=profiler)
+        headers = {PROFILE_HEADER: 'foo'}
+        response = self.app.get('/api/person', headers=headers)
+        self.assertIn(PROFILE_FILE_HEADER, response.headers)
+        response = self.app.get('/api/person', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(PROFILE_FILE_HEADER, response.headers)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+    def test_max_files(self):
+        """Tests that only the newest files of statistics are kept."""
+        profiler = RequestProfiler(self.directory, 'foo', interval=0,
+                                   max_files=2)
+        self.manager.create_api(self.Person, profiler=profiler)
+        filenames = []
+        for i in range(3):
+            response = self.app.get('/api/person/1',
+                                    headers={PROFILE_HEADER: 'foo'})
+            filenames.append(response.headers[PROFILE_FILE_HEADER])
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         sorted(filenames[1:]))
+
+    def test_unable_to_save(self):
+        """Tests that the response to a request whose statistics cannot be
+        saved is returned all the same.
+
+        """
+        directory = os.path.join(self.directory, 'missing')
+        profiler = RequestProfiler(directory, 'foo', interval=0)
+        self.manager.create_api(self.Person, methods=['DELETE'],
+                                profiler=profiler)
+        response = self.app.delete('/api/person/1',
+                                   headers={PROFILE_HEADER: 'foo'})
+        self.assertEqual(response.status_code, 204)
+        self.assertNotIn(PROFILE_FILE_HEADER, response.headers)
+        self.assertEqual(self.session.query(self.Person).count(), 4)
+
+    def test_empty_secret(self):
+        """Tests that a profiler requires a secret."""
+        self.assertRaises(ValueError, RequestProfiler, self.directory, '')
+
+
+def load_tests(loader, standard_tests, pattern):
+    """Returns the test suite for this module."""
+    suite = TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(RequestProfilerTest))
+    return suite
@@ -0,0 +1,120 @@
+"""
+    tests.test_routing
+    ~~~~~~~~~~~~~~~~~~
+
+    Provides unit tests for the :mod:`flask_restless.routing` module.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+import os
+import shutil
+import tempfile
+
+from unittest2 import TestSuite
+
+from flask import json
+from sqlalchemy import Column
+from sqlalchemy import create_engine
+from sqlalchemy import Integer
+from sqlalchemy import Unicode
+from sqlalchemy.ext.declarative import declarative_base
+
+from flask.ext.restless import APIManager
+from flask.ext.restless import ReplicaRouter
+from flask.ext.restless.routing import LEAST_LOADED
+
+from .helpers import FlaskTestBase
+
+
+__all__ = ['ReplicaRouterTest']
+
+
+dumps = json.dumps
+loads = json.loads
+
+
+class ReplicaRouterTest(FlaskTestBase):
+    """Unit tests for the :class:`flask_restless.routing.ReplicaRouter` class.
+
+    """
+
+    def setUp(self):
+        """Creates a primary database and two replicas in SQLite files, each
+        of which contains a single person whose name identifies the database.
+
+        """
+        super(ReplicaRouterTest, self).setUp()
+        self.tempdir = tempfile.mkdtemp()
+        Base = declarative_base()
+
+        class Person(Base):
+            __tablename__ = 'person'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode)
+
+        self.Person = Person
+        self.engines = []
+        for name in (u'primary', u'replica1', u'replica2'):
+            path = os.path.join(self.tempdir, name + '.db')
+            engine = create_engine('sqlite:///' + path, convert_unicode=True)
+            Base.metadata.create_all(engine)
+            engine.execute(Person.__table__.insert(), name=name)
+            self.engines.append(engine)
+
+    def tearDown(self):
+        """Removes the database files."""
+        for engine in self.engines:
+            engine.dispose()
+        shutil.rmtree(self.tempdir)
+
+    def test_routing(self):
+        """Tests that :http:method:`get` requests are executed on the
+        replicas in turn, that other requests are executed on the primary
+        database, and that a client which has just written reads from the
+        primary database.
+
+        """
+        primary, replica1, replica2 = self.engines
+        router = ReplicaRouter(primary, [replica1, replica2], sticky_window=60)
+        manager = APIManager(self.flaskapp, replica_router=router)
+        manager.create_api(self.Person, methods=['GET', 'POST'])
+        names = [loads(self.app.get('/api/person/1').data)['name']
+                 for i in range(3)]
+        self.assertEqual(names, [u'replica1', u'replica2', u'replica1'])
+        response = self.app.get('/api/person')
+        self.assertEqual(loads(response.data)['objects'][0]['name'],
+                         u'replica2')
+        response = self.app.post('/api/person', data=dumps(dict(name=u'foo')))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(primary.execute('SELECT COUNT(*) FROM person')
+                         .scalar(), 2)
+        # this client now reads its own writes, but other clients do not
+        response = self.app.get('/api/person/2')
+        self.assertEqual(loads(response.data)['name'], u'foo')
+        response = self.app.get('/api/person/2',
+                                environ_base={'REMOTE_ADDR': '10.0.0.1'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_least_loaded(self):
+        """Tests that the least loaded replica is chosen."""
+        primary, replica1, replica2 = self.engines
+        router = ReplicaRouter(primary, [replica1, replica2],
+                               strategy=LEAST_LOADED)
+        self.assertIs(router.choose_replica(), replica1)
+        self.assertIs(router.choose_replica(), replica2)
+        connection = replica1.connect()
+        try:
+            self.assertIs(router.choose_replica(), replica2)
+            self.assertIs(router.choose_replica(), replica2)
+        finally:
+            connection.close()
+        self.assertIs(router.choose_replica(), replica1)
+
+
+def load_tests(loader, standard_tests, pattern):
+    """Returns the test suite for this module."""
+    suite = TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(ReplicaRouterTest))
+    return suite
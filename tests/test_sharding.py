@@ -0,0 +1,219 @@
+"""
+    tests.test_sharding
+    ~~~~~~~~~~~~~~~~~~~
+
+    Provides unit tests for the :mod:`flask_restless.sharding` module.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+from __future__ import with_statement
+
+from multiprocessing.pool import ThreadPool
+import os
+import shutil
+import tempfile
+
+from unittest2 import TestSuite
+
+from flask import json
+from sqlalchemy import Column
+from sqlalchemy import create_engine
+from sqlalchemy import Integer
+from sqlalchemy import Unicode
+from sqlalchemy.ext.declarative import declarative_base
+
+from flask.ext.restless import APIManager
+from flask.ext.restless import ShardResolver
+from flask.ext.restless.search import SearchParameters
+from flask.ext.restless.manager import IllegalArgumentError
+from flask.ext.restless.sharding import _sort
+
+from .helpers import FlaskTestBase
+from .helpers import recorded_statements
+
+
+__all__ = ['ShardingTest']
+
+
+dumps = json.dumps
+loads = json.loads
+
+
+class ShardingTest(FlaskTestBase):
+    """Unit tests for the :class:`flask_restless.sharding.ShardResolver` and
+    :class:`flask_restless.sharding.ShardedAPI` classes.
+
+    """
+
+    def setUp(self):
+        """Creates two shards in SQLite files, each holding three people, and
+        creates an API for the sharded model.
+
+        Each person belongs to a tenant, and the people of tenant ``n`` live in
+        the shard named ``'shard<n>'``. People with odd primary keys belong to
+        tenant 1.
+
+        """
+        super(ShardingTest, self).setUp()
+        self.tempdir = tempfile.mkdtemp()
+        Base = declarative_base()
+
+        class Person(Base):
+            __tablename__ = 'person'
+            id = Column(Integer, primary_key=True)
+            tenant = Column(Integer)
+            name = Column(Unicode)
+            age = Column(Integer)
+
+        self.Person = Person
+        self.engines = {}
+        for tenant in (1, 2):
+            path = os.path.join(self.tempdir, 'shard%d.db' % tenant)
+            engine = create_engine('sqlite:///' + path, convert_unicode=True)
+            Base.metadata.create_all(engine)
+            for i in range(tenant, 7, 2):
+                engine.execute(Person.__table__.insert(), id=i, tenant=tenant,
+                               name=u'p%d' % i, age=i * 10)
+            self.engines['shard%d' % tenant] = engine
+        self.pool = ThreadPool(2)
+        self.resolver = ShardResolver(self.engines, 'tenant',
+                                      lambda tenant: 'shard%s' % tenant,
+                                      executor=self.pool)
+        self.manager = APIManager(self.flaskapp)
+        self.manager.create_api(Person, methods=['GET', 'POST', 'PATCH'],
+                                shard_resolver=self.resolver)
+
+    def tearDown(self):
+        """Stops the threads of the pool and removes the database files."""
+        self.pool.close()
+        self.pool.join()
+        for engine in self.engines.itervalues():
+            engine.dispose()
+        shutil.rmtree(self.tempdir)
+
+    def test_fan_out(self):
+        """Tests that a search without a filter on the shard key merges the
+        ordered results of all the shards before paginating them.
+
+        """
+        search = dict(order_by=[dict(field='age', direction='desc')])
+        response = self.app.get('/api/person?results_per_page=2&page=2&q=' +
+                                dumps(search))
+        self.assertEqual(response.status_code, 200)
+        data = loads(response.data)
+        self.assertEqual([p['age'] for p in data['objects']], [40, 30])
+        self.assertEqual(data['num_results'], 6)
+        self.assertEqual(data['total_pages'], 3)
+        # the limit and offset apply to the merged results
+        search = dict(offset=1, limit=3)
+        response = self.app.get('/api/person?results_per_page=2&page=2&q=' +
+                                dumps(search))
+        data = loads(response.data)
+        self.assertEqual([p['id'] for p in data['objects']], [4])
+        self.assertEqual(data['num_results'], 3)
+        self.assertEqual(data['total_pages'], 2)
+        search = dict(single=True, filters=[dict(name='age', op='eq',
+                                                 val=50)])
+        response = self.app.get('/api/person?q=' + dumps(search))
+        self.assertEqual(loads(response.data)['name'], u'p5')
+
+    def test_nulls(self):
+        """Tests that instances whose ordering field is ``NULL`` are merged
+        where the database of the shards orders them, so that paging through
+        the results returns each instance exactly once.
+
+        """
+        for engine in self.engines.itervalues():
+            engine.execute('UPDATE person SET age = NULL WHERE id > 4')
+        search = dict(order_by=[dict(field='age')])
+        ids = []
+        for page in (1, 2, 3):
+            response = self.app.get('/api/person?results_per_page=2&page=%d'
+                                    '&q=%s' % (page, dumps(search)))
+            ids.extend(p['id'] for p in loads(response.data)['objects'])
+        # SQLite orders NULL before all other values
+        self.assertEqual(ids, [5, 6, 1, 2, 3, 4])
+
+        class Dialect(object):
+            name = 'postgresql'
+
+        people = [self.Person(id=i, age=age)
+                  for i, age in ((1, None), (2, 20), (3, 10))]
+        order_by = SearchParameters.from_dictionary(search).order_by
+        _sort(people, self.Person, order_by, Dialect())
+        self.assertEqual([p.id for p in people], [3, 2, 1])
+        search = dict(order_by=[dict(field='age', direction='desc')])
+        order_by = SearchParameters.from_dictionary(search).order_by
+        _sort(people, self.Person, order_by, Dialect())
+        self.assertEqual([p.id for p in people], [1, 2, 3])
+
+    def test_missing_cache(self):
+        """Tests that requests for an instance which is known to be missing
+        do not query any shard.
+
+        """
+        self.manager.create_api(self.Person, collection_name='people',
+                                missing_cache_size=10,
+                                shard_resolver=self.resolver)
+        response = self.app.get('/api/people/7')
+        self.assertEqual(response.status_code, 404)
+        with recorded_statements(self.engines['shard1']) as statements1:
+            with recorded_statements(self.engines['shard2']) as statements2:
+                response = self.app.get('/api/people/7')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(statements1, [])
+        self.assertEqual(statements2, [])
+
+    def test_shard_key_filter(self):
+        """Tests that a search with an equality filter on the shard key is
+        executed on a single shard.
+
+        """
+        search = dict(filters=[dict(name='tenant', op='==', val=2)])
+        with recorded_statements(self.engines['shard1']) as statements:
+            response = self.app.get('/api/person?q=' + dumps(search))
+        data = loads(response.data)
+        self.assertEqual([p['id'] for p in data['objects']], [2, 4, 6])
+        self.assertEqual(statements, [])
+
+    def test_instances(self):
+        """Tests that requests on a single instance are executed on the shard
+        which holds that instance.
+
+        """
+        response = self.app.get('/api/person/4')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data)['name'], u'p4')
+        response = self.app.get('/api/person/7')
+        self.assertEqual(response.status_code, 404)
+        response = self.app.patch('/api/person/3',
+                                  data=dumps(dict(name=u'foo')))
+        self.assertEqual(response.status_code, 200)
+        name = self.engines['shard1'].execute('SELECT name FROM person'
+                                              ' WHERE id = 3').scalar()
+        self.assertEqual(name, u'foo')
+        data = dict(id=8, tenant=2, name=u'bar')
+        response = self.app.post('/api/person', data=dumps(data))
+        self.assertEqual(response.status_code, 201)
+        count = self.engines['shard2'].execute('SELECT COUNT(*) FROM person')
+        self.assertEqual(count.scalar(), 4)
+        response = self.app.post('/api/person', data=dumps(dict(id=9)))
+        self.assertEqual(response.status_code, 400)
+
+    def test_illegal_arguments(self):
+        """Tests that options which create or update many instances cannot be
+        combined with sharding.
+
+        """
+        self.assertRaises(IllegalArgumentError, self.manager.create_api,
+                          self.Person, collection_name='people',
+                          allow_patch_many=True, shard_resolver=self.resolver)
+
+
+def load_tests(loader, standard_tests, pattern):
+    """Returns the test suite for this module."""
+    suite = TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(ShardingTest))
+    return suite
@@ -17,6 +17,7 @@ from unittest2 import TestSuite
 from unittest2 import skipUnless
 
 from flask import json
+from flask.signals import signals_available
 try:
     from flask.ext.sqlalchemy import SQLAlchemy
 except:
@@ -28,6 +29,7 @@ from sqlalchemy import create_engine
 from sqlalchemy import ForeignKey
 from sqlalchemy import Integer
 from sqlalchemy import Unicode
+from sqlalchemy import event
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.associationproxy import association_proxy as prox
 from sqlalchemy.ext.declarative import declarative_base
@@ -36,13 +38,19 @@ from sqlalchemy.orm import backref
 from sqlalchemy.orm import relationship as rel
 from sqlalchemy.orm import scoped_session
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import validates
 
 from flask.ext.restless.manager import APIManager
+from flask.ext.restless.timing import request_timed
+from flask.ext.restless.views import ProcessingException
+from flask.ext.restless.views import _coerce_primary_key
 from flask.ext.restless.views import _evaluate_functions as evaluate_functions
 from flask.ext.restless.views import _get_or_create
+from flask.ext.restless.views import _get_or_create_many
 from flask.ext.restless.views import _to_dict
 
 from .helpers import DatabaseTestBase
+from .helpers import recorded_statements
 from .helpers import FlaskTestBase
 from .helpers import TestSupport
 from .helpers import TestSupportPrefilled
@@ -280,6 +288,81 @@ class ModelTestCase(TestSupport):
         self.assertEqual(second_instance.name, u'Lincoln')
         self.assertEqual(second_instance.age, 24)
 
+    def test_get_or_create_many(self):
+        """Test for :func:`flask_restless.views._get_or_create_many`."""
+        self.session.add(self.Computer(name=u'foo', vendor=u'bar'))
+        self.session.commit()
+        dictionaries = [dict(name=u'foo'), dict(name=u'baz'),
+                        dict(name=u'foo', vendor=u'bar'), dict(name=u'baz')]
+        instances = _get_or_create_many(self.session, self.Computer,
+                                        dictionaries)
+        self.assertEqual(len(instances), 4)
+        self.assertEqual(instances[0].id, 1)
+        self.assertEqual(instances[2].id, 1)
+        # identical dictionaries yield the same new instance
+        self.assertIs(instances[1], instances[3])
+        self.assertIsNotNone(instances[1].id)
+        self.assertEqual(self.session.query(self.Computer).count(), 2)
+        # without creating, missing instances are None
+        instances = _get_or_create_many(self.session, self.Computer,
+                                        [dict(name=u'qux')], create=False)
+        self.assertEqual(instances, [None])
+
+    def test_get_or_create_many_coerce(self):
+        """Tests that :func:`flask_restless.views._get_or_create_many` matches
+        instances to values of a different type than their columns as the
+        database does, instead of creating duplicates.
+
+        """
+        self.session.add(self.Computer(name=u'5'))
+        self.session.commit()
+        dictionaries = [dict(id=u'1'), dict(name=5), dict(id=u'1', name=5)]
+        instances = _get_or_create_many(self.session, self.Computer,
+                                        dictionaries)
+        self.assertEqual([i.id for i in instances], [1, 1, 1])
+        self.assertEqual(self.session.query(self.Computer).count(), 1)
+
+    def test_get_or_create_many_unique(self):
+        """Tests that :func:`flask_restless.views._get_or_create_many` creates
+        instances of a model with a unique constraint with a single statement
+        which ignores conflicting rows.
+
+        """
+        class Tag(self.Base):
+            __tablename__ = 'tag'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode, unique=True)
+        self.Base.metadata.create_all()
+        # simulate a concurrent request which creates an instance after it has
+        # been looked up but before it is inserted
+        def insert(cursor, statement):
+            if 'ON CONFLICT' in statement:
+                cursor.execute('INSERT INTO tag (name) VALUES (?)', (u'b',))
+
+        dictionaries = [dict(name=u'a'), dict(name=u'b'), dict(name=u'a')]
+        with recorded_statements(self.Base.metadata.bind,
+                                 insert) as statements:
+            instances = _get_or_create_many(self.session, Tag, dictionaries)
+        inserts = [s for s in statements if s.startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual([i.name for i in instances], [u'a', u'b', u'a'])
+        self.assertIs(instances[0], instances[2])
+        self.assertEqual(self.session.query(Tag).count(), 2)
+
+    def test_coerce_primary_key(self):
+        """Test for converting primary key values from URLs to the type of the
+        primary key column.
+
+        """
+        self.assertEqual(_coerce_primary_key(self.Person, u'1'), 1)
+        self.assertIsInstance(_coerce_primary_key(self.Person, u'1'), int)
+        # values which are not strings are left alone
+        self.assertEqual(_coerce_primary_key(self.Person, 1), 1)
+        # string primary keys are not converted
+        self.assertEqual(_coerce_primary_key(self.Planet, u'01'), u'01')
+        self.assertRaises(ValueError, _coerce_primary_key, self.Person,
+                          u'foo')
+
 
 class FunctionEvaluationTest(TestSupportPrefilled):
     """Unit tests for the :func:`flask_restless.view._evaluate_functions`
@@ -508,6 +591,59 @@ class APITestCase(TestSupport):
         response = self.app.get('/api/person')
         self.assertEqual(len(loads(response.data)['objects']), 1)
 
+    def test_post_with_invalid_submodels(self):
+        """Tests that related instances which violate a ``NOT NULL``
+        constraint or fail validation are reported as errors instead of being
+        skipped.
+
+        """
+        class ValidationError(Exception):
+            pass
+
+        class Tag(self.Base):
+            __tablename__ = 'tag'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode, unique=True)
+            kind = Column(Unicode, nullable=False)
+            article_id = Column(Integer, ForeignKey('article.id'))
+
+        class Label(self.Base):
+            __tablename__ = 'label'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode, unique=True)
+            article_id = Column(Integer, ForeignKey('article.id'))
+
+            @validates('name')
+            def validate_name(self, key, name):
+                if name == u'bad':
+                    raise ValidationError()
+                return name
+
+        class Article(self.Base):
+            __tablename__ = 'article'
+            id = Column(Integer, primary_key=True)
+            tags = rel(Tag)
+            labels = rel(Label)
+
+        self.Base.metadata.create_all()
+        self.manager.create_api(Article, methods=['POST'],
+                                validation_exceptions=[ValidationError])
+        data = dict(tags=[dict(name=u'a', kind=u'x'), dict(name=u'b')])
+        with recorded_statements(self.Base.metadata.bind) as statements:
+            response = self.app.post('/api/article', data=dumps(data))
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(any('ON CONFLICT' in s for s in statements))
+        # the validator is not skipped by inserting the rows directly
+        data = dict(labels=[dict(name=u'bad')])
+        with recorded_statements(self.Base.metadata.bind) as statements:
+            response = self.app.post('/api/article', data=dumps(data))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('validation_errors', loads(response.data))
+        self.assertFalse(any('ON CONFLICT' in s for s in statements))
+        self.assertEqual(self.session.query(Tag).count(), 0)
+        self.assertEqual(self.session.query(Label).count(), 0)
+        self.assertEqual(self.session.query(Article).count(), 0)
+
     def test_post_with_single_submodel(self):
         data = {'vendor': u'Apple',  'name': u'iMac',
                 'owner': {'name': u'John', 'age': 2041}}
@@ -518,6 +654,87 @@ class APITestCase(TestSupport):
         response = self.app.get('/api/person')
         self.assertEqual(len(loads(response.data)['objects']), 1)
 
+    def test_post_many(self):
+        """Tests for creating many instances of the database model in a
+        single :http:method:`post` request.
+
+        """
+        def reject_baz(params):
+            if params.get('name') == u'baz':
+                raise ProcessingException(message='No baz', status_code=403)
+            params['other'] = 7
+            return params
+
+        self.manager.create_api(self.Person, methods=['POST'],
+                                url_prefix='/api/v2', allow_post_many=True,
+                                preprocessors=dict(POST=[reject_baz]))
+        data = [dict(name=u'foo'), dict(bogus=0), dict(name=u'bar', age=1)]
+        # the default API does not allow creating multiple instances
+        response = self.app.post('/api/person', data=dumps(data))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.session.query(self.Person).count(), 0)
+        data.append(dict(name=u'baz'))
+        response = self.app.post('/api/v2/person', data=dumps(data))
+        self.assertEqual(response.status_code, 201)
+        result = loads(response.data)
+        self.assertEqual(result['num_created'], 2)
+        self.assertEqual(sorted(result['ids']), [1, 2])
+        self.assertEqual([e['index'] for e in result['errors']], [1, 3])
+        self.assertEqual(result['errors'][1]['message'], 'No baz')
+        people = self.session.query(self.Person).order_by(self.Person.id)
+        self.assertEqual([p.name for p in people], [u'foo', u'bar'])
+        self.assertEqual([p.other for p in people], [7, 7])
+
+        # a failed transaction creates no instances at all
+        data = [dict(name=u'qux'), dict(name=u'foo')]
+        response = self.app.post('/api/v2/person', data=dumps(data))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.session.query(self.Person).count(), 2)
+
+    def test_return_minimal(self):
+        """Tests that a request with the header ``Prefer: return=minimal``
+        receives only the primary key of the created or updated instance.
+
+        """
+        headers = {'Prefer': 'return=minimal'}
+        data = dict(name=u'Lincoln', computers=[dict(name=u'foo')])
+        response = self.app.post('/api/person', data=dumps(data),
+                                 headers=headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(loads(response.data), dict(id=1))
+        self.assertEqual(response.headers['Location'],
+                         'http://localhost/api/person/1')
+        self.assertEqual(response.headers['Preference-Applied'],
+                         'return=minimal')
+        data = dict(name=u'Washington')
+        response = self.app.patch('/api/person/1', data=dumps(data),
+                                  headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data), dict(id=1))
+        self.assertEqual(self.session.query(self.Person).get(1).name,
+                         u'Washington')
+        # without the header, the full representation is returned
+        response = self.app.patch('/api/person/1', data=dumps(data))
+        self.assertEqual(loads(response.data)['name'], u'Washington')
+        self.assertNotIn('Preference-Applied', response.headers)
+
+    def test_return_minimal_default(self):
+        """Tests that the ``return_minimal`` keyword argument makes minimal
+        responses the default, which clients may override.
+
+        """
+        self.manager.create_api(self.Computer, methods=['POST'],
+                                collection_name='minimal',
+                                return_minimal=True)
+        response = self.app.post('/api/minimal', data=dumps(dict(name=u'a')))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(loads(response.data), dict(id=1))
+        headers = {'Prefer': 'return=representation'}
+        response = self.app.post('/api/minimal', data=dumps(dict(name=u'b')),
+                                 headers=headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(loads(response.data)['name'], u'b')
+
     def test_delete(self):
         """Test for deleting an instance of the database using the
         :http:method:`delete` method.
@@ -555,6 +772,258 @@ class APITestCase(TestSupport):
         response = self.app.delete('/api/person/1')
         self.assertEqual(response.status_code, 204)
 
+    def test_get_nonnumeric_id(self):
+        """Tests that getting an instance using an identifier which is not a
+        valid value for an integer primary key responds with
+        :http:statuscode:`404`.
+
+        """
+        self.session.add(self.Person(id=1))
+        self.session.commit()
+        for instid in ('foo', '1.5', '1foo'):
+            response = self.app.get('/api/person/' + instid)
+            self.assertEqual(response.status_code, 404)
+            response = self.app.patch('/api/person/' + instid,
+                                      data=dumps(dict(name=u'bar')))
+            self.assertEqual(response.status_code, 404)
+
+    def test_get_from_identity_map(self):
+        """Tests that getting an instance which is already present in the
+        session does not query the database for that instance.
+
+        """
+        person = self.Person(id=1, name=u'foo')
+        self.session.add(person)
+        self.session.commit()
+        # load the instance into the identity map of the session
+        self.assertEqual(person.name, u'foo')
+        with recorded_statements(self.Base.metadata.bind) as statements:
+            response = self.app.get('/api/person/1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data)['name'], u'foo')
+        self.assertFalse(any(s.lstrip().startswith('SELECT person.')
+                             for s in statements))
+
+    def test_composite_primary_key(self):
+        """Tests for getting, updating, and deleting instances of a model
+        with a composite primary key.
+
+        """
+        class Membership(self.Base):
+            __tablename__ = 'membership'
+            person_id = Column(Integer, primary_key=True)
+            club = Column(Unicode, primary_key=True)
+            role = Column(Unicode)
+        self.Base.metadata.create_all()
+        self.manager.create_api(Membership,
+                                methods=['GET', 'PATCH', 'DELETE'])
+        self.session.add(Membership(person_id=1, club=u'chess', role=u'a'))
+        self.session.add(Membership(person_id=1, club=u'go', role=u'b'))
+        self.session.commit()
+        response = self.app.get('/api/membership/1,chess')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data)['role'], u'a')
+        for instid in ('1', '1,chess,go', 'foo,chess', '2,chess'):
+            response = self.app.get('/api/membership/' + instid)
+            self.assertEqual(response.status_code, 404)
+        response = self.app.patch('/api/membership/1,go',
+                                  data=dumps(dict(role=u'c')))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data)['role'], u'c')
+        response = self.app.delete('/api/membership/1,chess')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.session.query(Membership).count(), 1)
+
+    def test_version_etag(self):
+        """Tests that the version of an instance of a versioned model is its
+        entity tag, and that :http:method:`patch` and :http:method:`delete`
+        requests with an ``If-Match`` header fail with
+        :http:statuscode:`412` if the instance has been modified.
+
+        """
+        class Document(self.Base):
+            __tablename__ = 'document'
+            id = Column(Integer, primary_key=True)
+            title = Column(Unicode)
+            version = Column(Integer, nullable=False)
+            __mapper_args__ = {'version_id_col': version}
+        self.Base.metadata.create_all()
+        self.manager.create_api(Document, methods=['GET', 'PATCH', 'DELETE'])
+        self.session.add(Document(title=u'a'))
+        self.session.commit()
+        response = self.app.get('/api/document/1')
+        self.assertEqual(response.headers['ETag'], '"1"')
+        data = dumps(dict(title=u'b'))
+        response = self.app.patch('/api/document/1', data=data,
+                                  headers={'If-Match': '"1"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['ETag'], '"2"')
+        # the instance has changed since version 1
+        data = dumps(dict(title=u'c'))
+        response = self.app.patch('/api/document/1', data=data,
+                                  headers={'If-Match': '"1"'})
+        self.assertEqual(response.status_code, 412)
+        response = self.app.delete('/api/document/1',
+                                   headers={'If-Match': '"1"'})
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(self.session.query(Document).get(1).title, u'b')
+        response = self.app.patch('/api/document/1', data=data,
+                                  headers={'If-Match': '*'})
+        self.assertEqual(response.status_code, 200)
+        self.session.remove()
+
+        # simulate a concurrent request which modifies the instance after it
+        # has been loaded but before it is updated
+        def update(cursor, statement):
+            if statement.startswith('UPDATE document'):
+                cursor.execute('UPDATE document SET version = version + 1')
+
+        data = dumps(dict(title=u'd'))
+        with recorded_statements(self.Base.metadata.bind, update):
+            response = self.app.patch('/api/document/1', data=data,
+                                      headers={'If-Match': '"3"'})
+        self.assertEqual(response.status_code, 412)
+        # the simulated change is rolled back along with the failed request
+        self.assertEqual(self.session.query(Document).get(1).title, u'c')
+        response = self.app.delete('/api/document/1',
+                                   headers={'If-Match': '"3"'})
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.session.query(Document).count(), 0)
+
+    def test_version_patch_many(self):
+        """Tests that updating a collection of instances of a versioned model
+        increments their versions, so that requests conditional on the old
+        versions fail.
+
+        """
+        class Document(self.Base):
+            __tablename__ = 'document'
+            id = Column(Integer, primary_key=True)
+            title = Column(Unicode)
+            version = Column(Integer, nullable=False)
+            __mapper_args__ = {'version_id_col': version}
+        self.Base.metadata.create_all()
+        self.manager.create_api(Document, methods=['GET', 'PATCH'],
+                                allow_patch_many=True)
+        self.session.add(Document(title=u'a'))
+        self.session.commit()
+        response = self.app.patch('/api/document',
+                                  data=dumps(dict(title=u'b')))
+        self.assertEqual(loads(response.data)['num_modified'], 1)
+        response = self.app.get('/api/document/1')
+        self.assertEqual(response.headers['ETag'], '"2"')
+        response = self.app.patch('/api/document/1',
+                                  data=dumps(dict(title=u'c')),
+                                  headers={'If-Match': '"1"'})
+        self.assertEqual(response.status_code, 412)
+
+    def test_missing_cache(self):
+        """Tests that requests for missing instances are answered from the
+        cache of missing instances, and that creating an instance removes it
+        from the cache.
+
+        """
+        self.manager.create_api(self.Person, methods=['GET', 'POST'],
+                                url_prefix='/api/v2', missing_cache_size=10)
+        response = self.app.get('/api/v2/person/1')
+        self.assertEqual(response.status_code, 404)
+        # an instance created outside of the API is not seen, since the miss
+        # has been cached
+        self.session.add(self.Person(id=1, name=u'foo'))
+        self.session.commit()
+        response = self.app.get('/api/v2/person/1')
+        self.assertEqual(response.status_code, 404)
+        # an instance created through the API invalidates the cached miss
+        response = self.app.get('/api/v2/person/2')
+        self.assertEqual(response.status_code, 404)
+        response = self.app.post('/api/v2/person', data=dumps(dict(id=2)))
+        self.assertEqual(response.status_code, 201)
+        response = self.app.get('/api/v2/person/2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data)['id'], 2)
+
+    def test_delete_many(self):
+        """Tests for deleting all instances matching a search query."""
+        self.manager.create_api(self.Person, methods=['DELETE'],
+                                allow_delete_many=True, url_prefix='/api/v2')
+        self.session.add_all([self.Person(name=u'Lincoln', age=23),
+                              self.Person(name=u'Lucy', age=23),
+                              self.Person(name=u'Mary', age=25)])
+        self.session.commit()
+        # the default API does not allow deleting many instances
+        response = self.app.delete('/api/person')
+        self.assertEqual(response.status_code, 405)
+        search = dumps({'filters': [{'name': 'age', 'op': 'eq', 'val': 23}]})
+        response = self.app.delete('/api/v2/person?dry_run=true&q=' + search)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data), dict(num_matched=2))
+        self.assertEqual(self.session.query(self.Person).count(), 3)
+        response = self.app.delete('/api/v2/person?q=' + search)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data), dict(num_deleted=2))
+        self.assertEqual([p.name for p in self.session.query(self.Person)],
+                         [u'Mary'])
+        response = self.app.delete('/api/v2/person?q=bogus')
+        self.assertEqual(response.status_code, 400)
+        # a search query is required, so that nothing is deleted by accident
+        response = self.app.delete('/api/v2/person')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.session.query(self.Person).count(), 1)
+
+    def test_delete_many_cascade(self):
+        """Tests that instances of a model whose deletes cascade are deleted
+        by the ORM one at a time, and that other instances are deleted by a
+        single statement and removed from the session.
+
+        """
+        self.manager.create_api(self.Person, methods=['DELETE'],
+                                allow_delete_many=True, url_prefix='/api/v2')
+        self.manager.create_api(self.Computer, methods=['DELETE'],
+                                allow_delete_many=True, url_prefix='/api/v2')
+        person = self.Person(name=u'Lincoln')
+        person.computers = [self.Computer(name=u'c1'),
+                            self.Computer(name=u'c2')]
+        self.session.add(person)
+        self.session.add(self.Computer(name=u'c3'))
+        self.session.commit()
+        search = dumps({'filters': [{'name': 'name', 'op': 'eq',
+                                     'val': u'Lincoln'}]})
+        response = self.app.delete('/api/v2/person?q=' + search)
+        self.assertEqual(loads(response.data), dict(num_deleted=1))
+        # the ORM set the foreign keys of the computers to NULL
+        computers = self.session.query(self.Computer).order_by('id').all()
+        self.assertEqual([c.owner_id for c in computers], [None] * 3)
+        # end the transaction, so that the next connection has the listener
+        self.session.commit()
+        search = dumps({'filters': [{'name': 'name', 'op': 'in',
+                                     'val': [u'c1', u'c3']}]})
+        with recorded_statements(self.Base.metadata.bind) as statements:
+            response = self.app.delete('/api/v2/computer?q=' + search)
+        self.assertEqual(loads(response.data), dict(num_deleted=2))
+        deletes = [st for st in statements if st.startswith('DELETE')]
+        self.assertEqual(len(deletes), 1)
+        self.assertNotIn(computers[0], self.session)
+        self.assertEqual([c.name for c in self.session.query(self.Computer)],
+                         [u'c2'])
+
+    def test_delete_many_limit(self):
+        """Tests that deleting many instances respects the ``limit`` of the
+        search query.
+
+        """
+        self.manager.create_api(self.Person, methods=['DELETE'],
+                                allow_delete_many=True, url_prefix='/api/v2')
+        self.session.add_all([self.Person(name=u'Lincoln', age=23),
+                              self.Person(name=u'Lucy', age=23),
+                              self.Person(name=u'Mary', age=25)])
+        self.session.commit()
+        search = dumps({'order_by': [{'field': 'age', 'direction': 'desc'}],
+                        'limit': 2})
+        response = self.app.delete('/api/v2/person?q=' + search)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data), dict(num_deleted=2))
+        self.assertEqual(self.session.query(self.Person).count(), 1)
+
     def test_disallow_patch_many(self):
         """Tests that disallowing "patch many" requests responds with a
         :http:statuscode:`405`.
@@ -688,6 +1157,76 @@ class APITestCase(TestSupport):
         num_modified = loads(response.data)['num_modified']
         self.assertEqual(num_modified, 1)
 
+    def test_patch_many_single_statement(self):
+        """Tests that updating a collection of instances which does not
+        change any relations issues a single ``UPDATE`` statement without
+        loading the instances.
+
+        """
+        self.manager.create_api(self.Person, methods=['PATCH'],
+                                allow_patch_many=True, url_prefix='/api/v2')
+        self.session.add_all([self.Person(name=u'Lincoln', age=23),
+                              self.Person(name=u'Lucy', age=23),
+                              self.Person(name=u'Mary', age=25)])
+        self.session.commit()
+        search = {'filters': [{'name': 'age', 'op': 'eq', 'val': 23}],
+                  'order_by': [{'field': 'name'}]}
+        data = dict(other=5, q=search)
+        with recorded_statements(self.Base.metadata.bind) as statements:
+            response = self.app.patch('/api/v2/person', data=dumps(data))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data)['num_modified'], 2)
+        updates = [s for s in statements if s.startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertFalse(any(s.startswith('SELECT person.')
+                             for s in statements))
+        people = self.session.query(self.Person).order_by(self.Person.id)
+        self.assertEqual([p.other for p in people], [5, 5, None])
+
+    def test_patch_many_renamed_column(self):
+        """Tests that a single ``UPDATE`` statement updates an attribute whose
+        name differs from the name of its column.
+
+        """
+        class Renamed(self.Base):
+            __tablename__ = 'renamed'
+            id = Column(Integer, primary_key=True)
+            name = Column('full_name', Unicode)
+
+        self.Base.metadata.create_all()
+        self.manager.create_api(Renamed, methods=['PATCH'],
+                                allow_patch_many=True)
+        self.session.add_all([Renamed(name=u'a'), Renamed(name=u'b')])
+        self.session.commit()
+        with recorded_statements(self.Base.metadata.bind) as statements:
+            response = self.app.patch('/api/renamed',
+                                      data=dumps(dict(name=u'c')))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data)['num_modified'], 2)
+        updates = [s for s in statements if s.startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('full_name', updates[0])
+        names = [r.name for r in self.session.query(Renamed)]
+        self.assertEqual(names, [u'c', u'c'])
+
+    def test_patch_many_dates_with_limit(self):
+        """Tests that date strings are converted when updating a collection
+        of instances one at a time, as with a limit in the search parameters.
+
+        """
+        self.manager.create_api(self.Person, methods=['PATCH'],
+                                allow_patch_many=True, url_prefix='/api/v2')
+        self.session.add_all([self.Person(name=u'Lincoln', age=23),
+                              self.Person(name=u'Lucy', age=23)])
+        self.session.commit()
+        data = dict(birth_date='1999-01-01', q=dict(limit=5))
+        response = self.app.patch('/api/v2/person', data=dumps(data))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data)['num_modified'], 2)
+        people = self.session.query(self.Person)
+        self.assertEqual([p.birth_date for p in people],
+                         [date(1999, 1, 1), date(1999, 1, 1)])
+
     def test_single_update(self):
         """Test for updating a single instance of the model using the
         :http:method:`patch` method.
@@ -710,6 +1249,125 @@ class APITestCase(TestSupport):
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(loads(resp.data)['age'], 24)
 
+    def test_patch_single_statements(self):
+        """Tests that updating a single instance with the :http:method:`patch`
+        method issues a single ``SELECT`` and a single ``UPDATE`` statement.
+
+        """
+        self.session.add(self.Person(name=u'Lincoln', age=23))
+        self.session.commit()
+        with recorded_statements(self.Base.metadata.bind) as statements:
+            response = self.app.patch('/api/person/1',
+                                      data=dumps(dict(age=24)),
+                                      headers={'Prefer': 'return=minimal'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([s.lstrip().split()[0] for s in statements],
+                         ['SELECT', 'UPDATE'])
+        self.assertEqual(self.session.query(self.Person).get(1).age, 24)
+
+    def test_patch_select_for_update(self):
+        """Tests that the ``select_for_update`` keyword argument does not
+        change the result of a :http:method:`patch` request.
+
+        """
+        self.manager.create_api(self.Person, methods=['PATCH'],
+                                collection_name='locked',
+                                select_for_update=True)
+        self.session.add(self.Person(name=u'Lincoln', age=23))
+        self.session.commit()
+        response = self.app.patch('/api/locked/1', data=dumps(dict(age=24)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data)['age'], 24)
+        response = self.app.patch('/api/locked/2', data=dumps(dict(age=24)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_patch_unchanged_fields(self):
+        """Tests that fields whose values do not change are not updated, and
+        that nothing is committed if no field changes.
+
+        """
+        self.session.add(self.Person(name=u'Lincoln', age=23,
+                                     birth_date=date(1900, 1, 2)))
+        self.session.commit()
+        commits = []
+        event.listen(self.Base.metadata.bind, 'commit',
+                     lambda conn: commits.append(conn))
+        headers = {'Prefer': 'return=minimal'}
+        with recorded_statements(self.Base.metadata.bind) as statements:
+            data = dumps(dict(name=u'Lincoln', age=23))
+            response = self.app.patch('/api/person/1', data=data,
+                                      headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(commits, [])
+            # values are compared as the database would store them
+            data = dumps(dict(age='23', birth_date='1900-01-02'))
+            response = self.app.patch('/api/person/1', data=data,
+                                      headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(commits, [])
+            data = dumps(dict(name=u'Lincoln', age=24))
+            response = self.app.patch('/api/person/1', data=data,
+                                      headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([s.lstrip().split()[0] for s in statements],
+                         ['SELECT', 'SELECT', 'SELECT', 'UPDATE'])
+        self.assertEqual(len(commits), 1)
+        self.assertEqual(self.session.query(self.Person).get(1).age, 24)
+
+    def test_patch_json_patch(self):
+        """Tests that a JSON Patch document in the body of a
+        :http:method:`patch` request is applied to the instance.
+
+        """
+        self.manager.create_api(self.Person, methods=['PATCH'],
+                                allow_patch_many=True, collection_name='many')
+        self.session.add(self.Person(name=u'Lincoln', age=23))
+        self.session.add(self.Computer(name=u'c1'))
+        self.session.add(self.Computer(name=u'c2'))
+        self.session.commit()
+        content_type = 'application/json-patch+json'
+
+        def patch(operations, url='/api/person/1'):
+            return self.app.patch(url, data=dumps(operations),
+                                  content_type=content_type)
+
+        response = patch([{'op': 'test', 'path': '/age', 'value': 23},
+                          {'op': 'replace', 'path': '/age', 'value': 24},
+                          {'op': 'remove', 'path': '/other'},
+                          {'op': 'add', 'path': '/computers/-',
+                           'value': {'id': 2}},
+                          {'op': 'add', 'path': '/computers/0',
+                           'value': {'name': u'c3'}}])
+        self.assertEqual(response.status_code, 200)
+        result = loads(response.data)
+        self.assertEqual(result['age'], 24)
+        self.assertEqual([c['name'] for c in result['computers']],
+                         [u'c3', u'c2'])
+        # the computers are loaded again in the order of their primary keys
+        response = patch([{'op': 'remove', 'path': '/computers/0'},
+                          {'op': 'test', 'path': '/age', 'value': 24}])
+        self.assertEqual(response.status_code, 200)
+        computers = self.session.query(self.Person).get(1).computers
+        self.assertEqual([c.name for c in computers], [u'c3'])
+
+        # a failed test leaves the instance unchanged
+        response = patch([{'op': 'replace', 'path': '/age', 'value': 30},
+                          {'op': 'test', 'path': '/name', 'value': u'foo'}])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.session.query(self.Person).get(1).age, 24)
+
+        # invalid documents
+        response = patch({'op': 'remove', 'path': '/age'})
+        self.assertEqual(response.status_code, 400)
+        response = patch([{'op': 'move', 'from': '/age', 'path': '/other'}])
+        self.assertEqual(response.status_code, 400)
+        response = patch([{'op': 'replace', 'path': '/bogus', 'value': 1}])
+        self.assertEqual(response.status_code, 400)
+        response = patch([{'op': 'remove', 'path': '/computers/5'}])
+        self.assertEqual(response.status_code, 400)
+        response = patch([{'op': 'remove', 'path': '/age'}], '/api/many')
+        self.assertEqual(response.status_code, 400)
+
     def test_patch_404(self):
         """Tests that making a :http:method:`patch` request to an instance
         which does not exist results in a :http:statuscode:`404`.
@@ -840,6 +1498,30 @@ class APITestCase(TestSupport):
         self.assertEqual(u'foo', computer.name)
         self.assertEqual(u'bar', computer.vendor)
 
+    def test_patch_add_submodels_batched(self):
+        """Tests that adding many related models using the
+        :http:method:`patch` method looks up the related models with a single
+        query.
+
+        """
+        person = self.Person(name=u'Lincoln')
+        self.session.add(person)
+        for i in range(10):
+            self.session.add(self.Computer(name=u'c%d' % i))
+        self.session.commit()
+        toadd = [dict(id=i) for i in range(1, 6)]
+        toadd += [dict(name=u'c%d' % i) for i in range(5, 10)]
+        data = dict(computers=dict(add=toadd))
+        with recorded_statements(self.Base.metadata.bind) as statements:
+            response = self.app.patch('/api/person/1', data=dumps(data))
+        self.assertEqual(response.status_code, 200)
+        # ignore the queries which load the relation itself
+        lookups = [s for s in statements
+                   if s.lstrip().startswith('SELECT computer.')
+                   and 'owner_id' not in s.split('WHERE')[-1]]
+        self.assertEqual(len(lookups), 2)
+        self.assertEqual(len(loads(response.data)['computers']), 10)
+
     def test_patch_remove_submodel(self):
         """Test for updating a single instance of the model by removing a
         related model using the :http:method:`patch` method.
@@ -1119,6 +1801,14 @@ class APITestCase(TestSupport):
         self.assertEqual(len(loads(response.data)['objects']), 5)
         self.assertEqual(loads(response.data)['total_pages'], 3)
 
+        # pages before the first are the first page
+        for page in (0, -1):
+            response = self.app.get('/api/person?page=%d' % page)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(loads(response.data)['page'], 1)
+            self.assertEqual(loads(response.data)['objects'][0]['id'], 1)
+            self.assertEqual(len(loads(response.data)['objects']), 10)
+
         response = self.app.get('/api/v2/person?page=3')
         self.assertEqual(response.status_code, 200)
         self.assertEqual(loads(response.data)['page'], 3)
@@ -1285,6 +1975,255 @@ class APITestCase(TestSupport):
         response = self.app.post('/api/person', data=dumps(data))
         self.assertEqual(400, response.status_code)
 
+    def test_pagination_queries(self):
+        """Tests that only the requested page of the results of a search is
+        loaded, and that the results are counted only when necessary.
+
+        """
+        for i in range(15):
+            self.session.add(self.Person(name=u'%d' % i, age=i % 2))
+        self.session.commit()
+        engine = self.Base.metadata.bind
+        with recorded_statements(engine) as statements:
+            response = self.app.get('/api/person?page=2')
+        data = loads(response.data)
+        self.assertEqual(data['num_results'], 15)
+        self.assertEqual(data['total_pages'], 2)
+        self.assertEqual([p['name'] for p in data['objects']],
+                         [u'%d' % i for i in range(10, 15)])
+        self.assertTrue(any('LIMIT' in s for s in statements))
+        self.assertTrue(any('count(' in s for s in statements))
+        search = dict(filters=[dict(name='age', op='eq', val=1)], limit=4)
+        with recorded_statements(engine) as statements:
+            response = self.app.search('/api/person', dumps(search))
+        data = loads(response.data)
+        self.assertEqual(data['num_results'], 4)
+        self.assertEqual(len(data['objects']), 4)
+        self.assertFalse(any('count(' in s for s in statements))
+
+    def test_timing(self):
+        """Tests that the phases of handling :http:method:`get` requests are
+        timed, reported to the timing hook, and included in the
+        ``Server-Timing`` header.
+
+        """
+        reports = []
+        hook = lambda model, method, phases: reports.append((model, method,
+                                                             phases))
+        self.manager.create_api(self.Person, collection_name='people',
+                                methods=['GET', 'POST'], timing_hook=hook,
+                                server_timing=True)
+        response = self.app.post('/api/people', data=dumps(dict(name=u'a')))
+        self.assertNotIn('Server-Timing', response.headers)
+        self.assertEqual(reports, [])
+        response = self.app.get('/api/people')
+        header = response.headers['Server-Timing']
+        self.assertTrue(header.startswith('parse;dur='))
+        self.assertIn('total;dur=', header)
+        model, method, phases = reports.pop()
+        self.assertIs(model, self.Person)
+        self.assertEqual(method, 'GET')
+        self.assertEqual([name for name, duration in phases],
+                         ['parse', 'preprocess', 'build', 'execute',
+                          'serialize', 'postprocess', 'encode'])
+        self.assertTrue(all(duration >= 0 for name, duration in phases))
+        response = self.app.get('/api/people/1')
+        self.assertIn('Server-Timing', response.headers)
+        model, method, phases = reports.pop()
+        self.assertEqual([name for name, duration in phases],
+                         ['preprocess', 'execute', 'serialize', 'postprocess',
+                          'encode'])
+
+    @skipUnless(signals_available, 'blinker is not installed')
+    def test_timing_signal(self):
+        """Tests that the :data:`request_timed` signal is sent after each
+        :http:method:`get` request.
+
+        """
+        reports = []
+
+        def receiver(sender, model, method, phases):
+            reports.append(model)
+
+        request_timed.connect(receiver, self.flaskapp)
+        try:
+            self.app.get('/api/person')
+        finally:
+            request_timed.disconnect(receiver, self.flaskapp)
+        self.assertEqual(reports, [self.Person])
+
+    def test_read_only_transactions(self):
+        """Tests that :http:method:`get` requests are handled in read-only
+        transactions which end before the response is postprocessed.
+
+        """
+        def write(data):
+            self.session.execute(self.Person.__table__.insert(), dict(age=1))
+
+        def check(result):
+            self.assertFalse(self.session.dirty)
+            self.assertEqual(statements[-1], 'PRAGMA query_only = OFF')
+            return result
+
+        self.manager.create_api(self.Person, collection_name='people',
+                                allow_functions=True,
+                                read_only_transactions=True,
+                                preprocessors=dict(GET_MANY=[write]),
+                                postprocessors=dict(GET_SINGLE=[check]))
+        self.session.add(self.Person(name=u'foo'))
+        self.session.commit()
+        engine = self.Base.metadata.bind
+        with recorded_statements(engine) as statements:
+            response = self.app.get('/api/people/1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data)['name'], u'foo')
+        self.assertEqual(statements[0], 'PRAGMA query_only = ON')
+        self.assertTrue(statements[1].lstrip().startswith('SELECT'))
+        # the preprocessor cannot write, and the transaction is still ended
+        with recorded_statements(engine) as statements:
+            self.assertRaises(OperationalError, self.app.get, '/api/people')
+        self.assertEqual(statements[-1], 'PRAGMA query_only = OFF')
+        query = dumps(dict(functions=[dict(name='count', field='id')]))
+        with recorded_statements(engine) as statements:
+            response = self.app.get('/api/eval/people?q=' + query)
+        self.assertEqual(loads(response.data)['count__id'], 1)
+        self.assertEqual(statements[0], 'PRAGMA query_only = ON')
+        self.assertEqual(statements[-1], 'PRAGMA query_only = OFF')
+        # requests on the ordinary endpoints can still write
+        response = self.app.post('/api/person', data=dumps(dict(name=u'bar')))
+        self.assertEqual(response.status_code, 201)
+
+
+class ImportAPITestCase(TestSupport):
+    """Unit tests for the :class:`flask_restless.views.ImportAPI` class."""
+
+    def setUp(self):
+        """Creates the database, the :class:`~flask.Flask` object, the
+        :class:`~flask_restless.manager.APIManager` for that application, and
+        creates the import endpoint for the :class:`testapp.Person` model,
+        which commits every two rows.
+
+        """
+        super(ImportAPITestCase, self).setUp()
+        self.manager.create_api(self.Person, methods=['GET', 'POST'],
+                                allow_import=True, import_chunk_size=2)
+
+    def test_import_ndjson(self):
+        """Tests for importing instances from newline-delimited JSON."""
+        lines = [dumps(dict(name=u'a', age=1)),
+                 '',
+                 dumps(dict(name=u'b', birth_date='2000-01-02')),
+                 'bogus',
+                 dumps(dict(name=u'a')),
+                 dumps(dict(name=u'c', age='x')),
+                 dumps(dict(bogus=u'd')),
+                 dumps(dict(name=u'e', age='5'))]
+        response = self.app.post('/api/person/import', data='\n'.join(lines),
+                                 content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        result = loads(response.data)
+        self.assertEqual(result['num_inserted'], 3)
+        self.assertEqual(result['num_rejected'], 4)
+        self.assertEqual([r['line'] for r in result['rejected']],
+                         [4, 6, 7, 5])
+        people = self.session.query(self.Person).order_by(self.Person.id)
+        self.assertEqual([p.name for p in people], [u'a', u'b', u'e'])
+        self.assertEqual(people[1].birth_date, date(2000, 1, 2))
+        self.assertEqual(people[2].age, 5)
+
+    def test_import_csv(self):
+        """Tests for importing instances from a CSV file, and for streaming
+        the progress of the import.
+
+        """
+        data = 'name,age\na,1\n"b, c",\nd,2\ne,3\nf\n'
+        response = self.app.post('/api/person/import', data=data,
+                                 content_type='text/csv',
+                                 headers={'Accept': 'application/x-ndjson'})
+        self.assertEqual(response.status_code, 200)
+        lines = [loads(line) for line in response.data.splitlines()]
+        self.assertEqual([line['num_inserted'] for line in lines], [2, 4, 4])
+        self.assertEqual(lines[-1]['rejected'][0]['line'], 6)
+        people = self.session.query(self.Person).order_by(self.Person.id)
+        self.assertEqual([p.name for p in people], [u'a', u'b, c', u'd', u'e'])
+        self.assertIsNone(people[1].age)
+        response = self.app.post('/api/person/import', data=data,
+                                 content_type='application/json')
+        self.assertEqual(response.status_code, 415)
+
+    def test_import_requires_post(self):
+        """Tests that the import endpoint is created only if
+        :http:method:`post` requests are allowed.
+
+        """
+        self.manager.create_api(self.Person, methods=['GET'],
+                                url_prefix='/api/v2', allow_import=True)
+        response = self.app.post('/api/v2/person/import',
+                                 data=dumps(dict(name=u'a')),
+                                 content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(self.session.query(self.Person).count(), 0)
+
+    def test_import_preprocessors(self):
+        """Tests that each line is passed through the ``POST``
+        preprocessors, and that lines which they refuse are rejected.
+
+        """
+        def check(data):
+            if data.get('name') == u'b':
+                raise ProcessingException(message='Forbidden', status_code=403)
+            return dict(data, age=42)
+
+        self.manager.create_api(self.Person, methods=['POST'],
+                                url_prefix='/api/v2', allow_import=True,
+                                preprocessors=dict(POST=[check]))
+        lines = [dumps(dict(name=u'a')), dumps(dict(name=u'b'))]
+        response = self.app.post('/api/v2/person/import',
+                                 data='\n'.join(lines),
+                                 content_type='application/x-ndjson')
+        result = loads(response.data)
+        self.assertEqual(result['num_inserted'], 1)
+        self.assertEqual(result['rejected'],
+                         [dict(line=2, message='Forbidden')])
+        people = self.session.query(self.Person).all()
+        self.assertEqual([(p.name, p.age) for p in people], [(u'a', 42)])
+
+    def test_import_validation(self):
+        """Tests that lines which fail validation by the model are rejected
+        with the extracted validation errors.
+
+        """
+        class ValidationError(Exception):
+            pass
+
+        class Label(self.Base):
+            __tablename__ = 'label'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode)
+
+            @validates('name')
+            def validate_name(self, key, name):
+                if name == u'bad':
+                    exception = ValidationError()
+                    exception.errors = dict(name='Must not be bad')
+                    raise exception
+                return name
+
+        self.Base.metadata.create_all()
+        self.manager.create_api(Label, methods=['POST'], allow_import=True,
+                                validation_exceptions=[ValidationError])
+        data = 'name\ngood\nbad\nfine\n'
+        response = self.app.post('/api/label/import', data=data,
+                                 content_type='text/csv')
+        self.assertEqual(response.status_code, 200)
+        result = loads(response.data)
+        self.assertEqual(result['num_inserted'], 2)
+        self.assertEqual(result['rejected'],
+                         [dict(line=3,
+                               validation_errors=dict(name='Must not be bad'))])
+        names = [label.name for label in self.session.query(Label)]
+        self.assertEqual(names, [u'good', u'fine'])
+
 
 class AssociationProxyTest(DatabaseTestBase):
     """Unit tests for models which have a relationship involving an association
@@ -1520,5 +2459,6 @@ def load_tests(loader, standard_tests, pattern):
     suite.addTest(loader.loadTestsFromTestCase(FunctionAPITestCase))
     suite.addTest(loader.loadTestsFromTestCase(FunctionEvaluationTest))
     suite.addTest(loader.loadTestsFromTestCase(APITestCase))
+    suite.addTest(loader.loadTestsFromTestCase(ImportAPITestCase))
     suite.addTest(loader.loadTestsFromTestCase(AssociationProxyTest))
     return suite
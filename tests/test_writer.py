@@ -0,0 +1,286 @@
+"""
+    tests.test_writer
+    ~~~~~~~~~~~~~~~~~
+
+    Provides unit tests for the :mod:`flask_restless.writer` module.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+from __future__ import with_statement
+
+from Queue import Full
+from Queue import Queue
+import threading
+import time
+from urlparse import urlparse
+
+from unittest2 import TestSuite
+
+from flask import json
+from sqlalchemy import create_engine
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+
+from flask.ext.restless.manager import IllegalArgumentError
+from flask.ext.restless.views import CommitTimeout
+from flask.ext.restless.writer import CommitCoordinator
+
+from .helpers import recorded_statements
+from .helpers import TestSupport
+
+
+__all__ = ['WriteBehindTest']
+
+
+dumps = json.dumps
+loads = json.loads
+
+
+class FullQueue(object):
+    """A queue which is always full."""
+
+    def put_nowait(self, item):
+        raise Full
+
+
+class WriteBehindTest(TestSupport):
+    """Unit tests for the write-behind mode and the group commit mode of the
+    API, provided by the :class:`flask_restless.writer.BatchWriter` and
+    :class:`flask_restless.writer.CommitCoordinator` classes.
+
+    """
+
+    def setUp(self):
+        """Binds the session to an in-memory database which is shared by all
+        threads, so that the background writer sees the same tables.
+
+        """
+        super(WriteBehindTest, self).setUp()
+        engine = create_engine('sqlite://', poolclass=StaticPool,
+                               connect_args=dict(check_same_thread=False),
+                               convert_unicode=True)
+
+        # pysqlite needs this for the savepoints of the commit coordinator
+        def connect(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        def begin(conn):
+            conn.execute('BEGIN')
+
+        event.listen(engine, 'connect', connect)
+        event.listen(engine, 'begin', begin)
+        self.session.remove()
+        self.Session.configure(bind=engine)
+        self.Base.metadata.bind = engine
+        self.Base.metadata.create_all()
+
+    def wait_for(self, url, timeout=5):
+        """Returns the status of the job at `url` once it is no longer pending.
+        """
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            status = loads(self.app.get(url).data)
+            if status['status'] != 'pending':
+                return status
+            time.sleep(0.01)
+        self.fail('Job at %s did not finish' % url)
+
+    def test_write_behind(self):
+        """Tests that :http:method:`post` requests are accepted immediately
+        and the instances are created in the background.
+
+        """
+        self.manager.create_api(self.Person, methods=['GET', 'POST'],
+                                write_behind_queue_size=10)
+        urls = []
+        for name in (u'foo', u'bar', u'foo'):
+            response = self.app.post('/api/person', data=dumps(dict(name=name)))
+            self.assertEqual(response.status_code, 202)
+            jobid = loads(response.data)['job']
+            url = urlparse(response.headers['Location']).path
+            self.assertEqual(url, '/api/person/jobs/%s' % jobid)
+            urls.append(url)
+        statuses = [self.wait_for(url) for url in urls]
+        self.assertEqual(statuses[0]['status'], 'completed')
+        self.assertEqual(statuses[1]['status'], 'completed')
+        # the duplicate name violates a unique constraint, but only this job
+        # fails
+        self.assertEqual(statuses[2]['status'], 'failed')
+        self.assertIn('message', statuses[2])
+        response = self.app.get('/api/person/%s' % statuses[1]['id'])
+        self.assertEqual(loads(response.data)['name'], u'bar')
+        self.assertEqual(self.session.query(self.Person).count(), 2)
+        response = self.app.get('/api/person/jobs/bogus')
+        self.assertEqual(response.status_code, 404)
+
+    def test_backpressure(self):
+        """Tests that :http:method:`post` requests are rejected when the queue
+        is full.
+
+        """
+        self.manager.create_api(self.Person, methods=['POST'],
+                                write_behind_queue=FullQueue(),
+                                write_behind_jobs={})
+        response = self.app.post('/api/person', data=dumps(dict(name=u'foo')))
+        self.assertEqual(response.status_code, 429)
+        # requests are still validated before being enqueued
+        response = self.app.post('/api/person', data=dumps(dict(bogus=u'foo')))
+        self.assertEqual(response.status_code, 400)
+
+    def test_shared_queue(self):
+        """Tests that the statuses of the jobs of a queue shared by several
+        writers are stored in a shared mapping, so that each writer knows the
+        statuses of the jobs written by the others.
+
+        """
+        queue = Queue(10)
+        jobs = {}
+        self.manager.create_api(self.Person, methods=['POST'],
+                                write_behind_queue=queue,
+                                write_behind_jobs=jobs)
+        self.manager.create_api(self.Person, methods=['GET'],
+                                collection_name='people',
+                                write_behind_queue=queue,
+                                write_behind_jobs=jobs)
+        response = self.app.post('/api/person', data=dumps(dict(name=u'foo')))
+        jobid = loads(response.data)['job']
+        status = self.wait_for('/api/people/jobs/%s' % jobid)
+        self.assertEqual(status['status'], 'completed')
+        self.assertIn(jobid, jobs)
+        # a queue without a shared store for the statuses is rejected
+        self.assertRaises(IllegalArgumentError, self.manager.create_api,
+                          self.Person, collection_name='others',
+                          write_behind_queue=queue)
+
+    def test_write_behind_batch(self):
+        """Tests that operations of a batch request are not written behind, so
+        that they are rolled back if a later operation fails.
+
+        """
+        self.manager.create_api(self.Person, methods=['GET', 'POST', 'PATCH'],
+                                write_behind_queue_size=10)
+        self.manager.create_batch_api()
+        operations = [
+            dict(method='POST', url='/api/person', data=dict(name=u'foo')),
+            dict(method='PATCH', url='/api/person/1', data=dict(bogus=0))
+        ]
+        response = self.app.post('/api/batch', data=dumps(operations))
+        self.assertEqual(response.status_code, 400)
+        results = loads(response.data)['results']
+        self.assertEqual(results[0]['status'], 201)
+        self.session.remove()
+        self.assertEqual(self.session.query(self.Person).count(), 0)
+
+    def test_group_commit(self):
+        """Tests that concurrent write requests are committed in shared
+        transactions, and that a request which fails does not cause the others
+        to fail.
+
+        """
+        self.manager.create_api(self.Person,
+                                methods=['GET', 'POST', 'PATCH', 'DELETE'],
+                                group_commit_window=0.1)
+        commits = []
+        event.listen(self.Base.metadata.bind, 'commit',
+                     lambda conn: commits.append(conn))
+        names = [u'a', u'b', u'c', u'd', u'a']
+        statuses = {}
+        headers = {'Prefer': 'return=minimal'}
+
+        def post(index):
+            data = dumps(dict(name=names[index]))
+            response = self.app.post('/api/person', data=data,
+                                     headers=headers)
+            statuses[index] = response.status_code
+
+        threads = [threading.Thread(target=post, args=(i, ))
+                   for i in range(len(names))]
+        with recorded_statements(self.Base.metadata.bind) as statements:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(sorted(statuses.values()), [201, 201, 201, 201, 400])
+        self.assertTrue(len(commits) < len(names))
+        # the changes of each request are applied only once
+        inserts = [s for s in statements if s.startswith('INSERT')]
+        self.assertEqual(len(inserts), len(names))
+        self.assertEqual(self.session.query(self.Person).count(), 4)
+        self.session.remove()
+
+        # single-instance requests which are not concurrent also work
+        response = self.app.patch('/api/person/1', data=dumps(dict(age=10)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data)['age'], 10)
+        # all threads share a single connection in this test, so the request
+        # thread must end the transaction in which it read the instance
+        self.session.remove()
+        response = self.app.patch('/api/person/10', data=dumps(dict(age=10)))
+        self.assertEqual(response.status_code, 404)
+        # a request which changes nothing commits nothing
+        del commits[:]
+        response = self.app.patch('/api/person/1', data=dumps(dict(age=10)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data)['age'], 10)
+        self.assertEqual(commits, [])
+        self.session.remove()
+        response = self.app.delete('/api/person/1')
+        self.assertEqual(response.status_code, 204)
+        response = self.app.get('/api/person/1')
+        self.assertEqual(response.status_code, 404)
+
+    def test_group_commit_timeout(self):
+        """Tests that a request whose changes are not committed within the
+        timeout receives a :http:statuscode:`503` response.
+
+        """
+        self.manager.create_api(self.Person, methods=['POST'],
+                                group_commit_window=0,
+                                group_commit_timeout=0.1)
+        stalled = threading.Event()
+        released = threading.Event()
+
+        def stall(mapper, connection, instance):
+            if instance.name == u'foo':
+                stalled.set()
+                released.wait(5)
+
+        event.listen(self.Person, 'before_insert', stall)
+        response = self.app.post('/api/person', data=dumps(dict(name=u'foo')))
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue(stalled.isSet())
+        released.set()
+        response = self.app.post('/api/person', data=dumps(dict(name=u'bar')))
+        self.assertEqual(response.status_code, 201)
+
+    def test_dead_coordinator(self):
+        """Tests that the background thread of a commit coordinator is
+        restarted if it has died.
+
+        """
+        coordinator = CommitCoordinator(self.session, self.Person,
+                                        window=0, timeout=0.5)
+        next_batch = coordinator._next_batch
+
+        def die():
+            coordinator._next_batch = next_batch
+            raise SystemExit
+
+        coordinator._next_batch = die
+        create = lambda name: lambda api: api._create_instance(dict(name=name))
+        with self.flaskapp.app_context():
+            self.assertRaises(CommitTimeout, coordinator.execute,
+                              create(u'foo'))
+            self.assertEqual(coordinator.execute(create(u'bar')), 1)
+        # the changes of the request which timed out were never applied
+        names = [person.name for person in self.session.query(self.Person)]
+        self.assertEqual(names, [u'bar'])
+
+
+def load_tests(loader, standard_tests, pattern):
+    """Returns the test suite for this module."""
+    suite = TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(WriteBehindTest))
+    return suite